@@ -1,15 +1,37 @@
 '''Written by Cael Shoop.'''
 
 import os
-import json
+import re
+import sys
 import random
-import pytz
+import asyncio
+from functools import partial
+from time import perf_counter
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from discord import (app_commands, Intents, Client, File, Message,
-                     Interaction, TextChannel, SelectOption, utils)
+from discord import (app_commands, Client, HTTPException, Member, Message,
+                     Interaction, TextChannel, SelectOption)
 from discord.ui import Select, View
-from discord.ext import tasks
+
+from persistence import WriteBehind
+from snapshot import SnapshotPersistence, capture
+from registry import PlayerRegistry
+from actor import Actor, serialized
+from scheduler import Scheduler
+from notifier import Notifier
+from users import MemberCache, UserCache, client_options
+from parsing import ParseError, WordleResult, parse_result
+from history import GameRecord, HistoryStore, format_stats
+from leaderboard import Leaderboard
+from grid import pack, render
+from analytics import FAILED, GameMatrix, format_head_to_head, format_rankings
+from rating import Ratings, format_rating
+from ingest import IMAGE_TYPES, IngestedImage, IngestError, ScreenshotIngestor
+from screenshots import ScreenshotStore
+from publisher import Screenshot, ScoreboardPublisher
+from imaging import KEEP_ORIGINALS, PREPARED_EXTENSION, ImagePipeline
+from data import DayResult, PlayerState
+from timezones import TimezoneBuckets, get_timezone, moved_reset, next_midnight
 
 load_dotenv()
 
@@ -29,12 +51,8 @@ def get_log_time():
     return output
 
 
-def get_guesses(player):
-    return player.guesses
-
-
 def is_dst(dt=None, timezone="America/New_York"):
-    timezone = pytz.timezone(timezone)
+    timezone = get_timezone(timezone)
     if dt is None:
         dt = datetime.now().astimezone(tz=timezone)
     timezone_aware_date = timezone.localize(dt, is_dst=False)
@@ -54,16 +72,18 @@ class TimezoneMenu(Select):
         super().__init__(placeholder='Select a timezone...', options=options)
 
     async def callback(self, interaction: Interaction):
-        content = 'Failed to find you in the players list. Are you registered?'
-        for player in client.players:
-            if player.name == interaction.user.name:
-                timezone = pytz.timezone(self.values[0])
-                player.resetTime = datetime.now().astimezone(tz=timezone).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-                print(f'{get_log_time()}> reset time for {player.name} is now {player.resetTime.isoformat()}')
-                content = f'Successfully set timezone to {self.values[0]}!'
-                break
+        content = await client.actor.ask(self.set_timezone, interaction)
         await interaction.response.send_message(content=content, ephemeral=True)
 
+    async def set_timezone(self, interaction: Interaction) -> str:
+        player = client.players.find(interaction.user)
+        if player is None:
+            return 'Failed to find you in the players list. Are you registered?'
+        set_timezone(player, self.values[0])
+        print(f'{get_log_time()}> reset time for {player.name} is now {player.resetTime.isoformat()}')
+        client.save_state()
+        return f'Successfully set timezone to {self.values[0]}!'
+
 
 class TimezoneMenuView(View):
     def __init__(self):
@@ -73,29 +93,22 @@ class TimezoneMenuView(View):
 
 class WordleTrackerClient(Client):
     FILENAME = 'info.json'
+    SNAPSHOT_FILENAME = 'info.snapshot'
 
-    class Player():
-        def __init__(self, name):
-            self.name = name
-            self.guesses = 0
-            self.newGuesses = 0
-            self.winCount = 0
-            self.registered = True
-            self.completedToday = False
-            self.completedYesterday = False
-            self.succeededToday = False
-            self.succeededYesterday = False
-            self.filePath = ''
-            self.newFilePath = ''
-            self.messageContent = ''
-            self.newMessageContent = ''
-            self.resetTime: datetime = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-            self.sentWarning = False
+    class Player(PlayerState):
+        __slots__ = ()
+
+        def send_warning(self, curTime: datetime) -> None:
+            if self.registered and not self.today and not self.sentWarning and curTime + timedelta(hours=1) >= self.resetTime:
+                content = f'You have one hour left to do (or skip) Wordle #{client.game_number}!'
+                client.notifier.send(self.id, self.resolve, content, f'warning for {self.name}')
+                self.sentWarning = True
 
-        async def send_warning(self, curTime: datetime) -> None:
-            if self.registered and not self.completedToday and not self.sentWarning and curTime + timedelta(hours=1) >= self.resetTime:
-                user = utils.get(client.users, name=self.name)
-                await user.send(f'You have one hour left to do (or skip) Wordle #{client.game_number}!')
+        def resolve(self):
+            '''Returns an awaitable of this player's Discord user, or None if their id is unknown'''
+            if self.id is None:
+                return None
+            return client.resolve_user(self.id)
 
         def past_reset_time(self, curTime: datetime) -> bool:
             if curTime >= self.resetTime:
@@ -105,167 +118,142 @@ class WordleTrackerClient(Client):
         def shift_data(self) -> None:
             self.guesses = self.newGuesses
             self.newGuesses = 0
-            self.completedYesterday = self.completedToday
-            self.completedToday = False
-            self.succeededYesterday = self.succeededToday
-            self.succeededToday = False
+            self.yesterday = self.today
+            self.today = DayResult.NONE
             self.filePath = self.newFilePath
             self.newFilePath = ''
+            self.imageKey = self.newImageKey
+            self.newImageKey = None
             self.messageContent = self.newMessageContent
             self.newMessageContent = ''
-            self.resetTime += timedelta(days=1)
+            self.grid = self.newGrid
+            self.newGrid = 0
             self.sentWarning = False
+            client.players.refresh(self)
 
-        async def notify_of_wordle(self) -> None:
-            user = utils.get(client.users, name=self.name)
+        def caption(self) -> str:
+            '''Yesterday's screenshot caption, with the grid rendered back from its packed form'''
+            if self.grid and not self.messageContent:
+                return f'__{self.name}:__\n{render(self.grid)}'
+            return f'__{self.name}:__\n{self.messageContent}'
+
+        def notify_of_wordle(self) -> None:
             content = f'It\'s time to do Wordle #{client.game_number}!\n'
             content += 'https://www.nytimes.com/games/wordle/index.html\n'
-            await user.send(content=content)
             if client.random_letter_starting:
-                content = f'__**Your first word must start with the letter "{client.letter}"**__'
-                await user.send(content=content)
+                content += f'__**Your first word must start with the letter "{client.current_letter}"**__'
+            client.notifier.send(self.id, self.resolve, content, f'notification for {self.name}')
 
-    def __init__(self, intents):
-        super().__init__(intents=intents)
+    def __init__(self, intents, **options):
+        super().__init__(intents=intents, **options)
         self.tree = app_commands.CommandTree(self)
         self.text_channel: TextChannel = None
+        self.text_channel_id: int = None
         self.random_letter_starting = False
         self.current_letter = ''
         self.last_letters = ['K', 'B', 'C', 'D', 'Z', 'F']
         self.game_number: int = 0
         self.scored_today = False
         self.midnight_called = False
-        self.players = []
-
-    def read_json_file(self):
-        '''Reads player information from the json file and puts it in the players list'''
-        if os.path.exists(self.FILENAME):
-            with open(self.FILENAME, 'r', encoding='utf-8') as file:
-                print(f'{get_log_time()}> Reading {self.FILENAME}')
-                data = json.load(file)
-                for firstField, secondField in data.items():
-                    if firstField == 'text_channel':
-                        self.text_channel = self.get_channel(int(secondField['text_channel']))
-                        print(f'{get_log_time()}> Got text channel id of {self.text_channel.id}')
-                    elif firstField == 'game_number':
-                        self.game_number = int(secondField['game_number'])
-                    elif firstField == 'scored_today':
-                        self.scored_today = secondField['scored_today']
-                        print(f'{get_log_time()}> Scored today: {self.scored_today}')
-                    elif firstField == 'random_letter':
-                        self.random_letter_starting = secondField['random_letter']
-                        print(f'{get_log_time()}> Got random letter starting value of {self.random_letter_starting}')
-                    elif firstField == 'current_letter':
-                        self.current_letter = secondField['current_letter']
-                        print(f'{get_log_time()}> Got current letter as ')
-                    elif firstField == 'last_letters':
-                        self.last_letters.clear()
-                        self.last_letters.append(secondField['0'])
-                        self.last_letters.append(secondField['1'])
-                        self.last_letters.append(secondField['2'])
-                        self.last_letters.append(secondField['3'])
-                        self.last_letters.append(secondField['4'])
-                        self.last_letters.append(secondField['5'])
-                        print(f'{get_log_time()}> Got last letters of {self.last_letters[0]}, {self.last_letters[1]}, {self.last_letters[2]}, {self.last_letters[3]}, {self.last_letters[4]}, {self.last_letters[5]}')
-                    else:
-                        player_exists = False
-                        for player in self.players:
-                            if firstField == player.name:
-                                player_exists = True
-                                break
-                        if not player_exists:
-                            load_player = self.Player(firstField)
-                            load_player.winCount = secondField['winCount']
-                            load_player.guesses = secondField['guesses']
-                            try:
-                                load_player.newGuesses = secondField['newGuesses']
-                            except Exception as e:
-                                print(f"{load_player.name} had no newGuesses, setting to 0: {e}")
-                                load_player.newGuesses = 0
-                            load_player.registered = secondField['registered']
-                            load_player.completedToday = secondField['completedToday']
-                            try:
-                                load_player.completedYesterday = secondField['completedYesterday']
-                            except:
-                                load_player.completedYesterday = load_player.completedToday
-                            load_player.succeededToday = secondField['succeededToday']
-                            try:
-                                load_player.succeededYesterday = secondField['succeededYesterday']
-                            except:
-                                load_player.succeededYesterday = load_player.succeededToday
-                            try:
-                                load_player.messageContent = secondField['messageContent']
-                            except:
-                                load_player.messageContent = ''
-                            try:
-                                load_player.newMessageContent = secondField['newMessageContent']
-                            except:
-                                load_player.newMessageContent = load_player.messageContent
-                            try:
-                                load_player.resetTime = datetime.fromisoformat(secondField['resetTime'])
-                            except Exception as e:
-                                print(f'{load_player.name} had no resetTime, defaulting to ET: {e}')
-                                load_player.resetTime = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-                            try:
-                                load_player.sentWarning = secondField['sentWarning']
-                            except Exception as e:
-                                print(f'{load_player.name} had no sentWarning, defaulting to False: {e}')
-                            self.players.append(load_player)
-                            print(f'{get_log_time()}> Loaded player {load_player.name}\n'
-                                  f'\twins: {load_player.winCount}\n'
-                                  f'\tguesses: {load_player.guesses}\n'
-                                  f'\tnew guesses: {load_player.newGuesses}\n'
-                                  f'\tregistered: {load_player.registered}\n'
-                                  f'\tcompleted today: {load_player.completedToday}\n'
-                                  f'\tcompleted yesterday: {load_player.completedYesterday}\n'
-                                  f'\tsucceeded today: {load_player.succeededToday}\n'
-                                  f'\tsucceeded yesterday: {load_player.succeededYesterday}\n'
-                                  f'\tmessage content: {load_player.messageContent}\n'
-                                  f'\tnew message content: {load_player.newMessageContent}\n'
-                                  f'\treset time: {load_player.resetTime.strftime("%d/%m %H:%M")}\n'
-                                  f'\tsent warning: {load_player.sentWarning}')
-                print(f'{get_log_time()}> Successfully loaded {self.FILENAME}')
-
-    def write_json_file(self):
-        '''Writes player information from the players list to the json file'''
-        data = {}
-        data['text_channel'] = {'text_channel': self.text_channel.id}
-        data['game_number'] = {'game_number': self.game_number}
-        data['scored_today'] = {'scored_today': self.scored_today}
-        data['random_letter'] = {'random_letter': self.random_letter_starting}
-        data['current_letter'] = {'current_letter': self.current_letter}
-        data['last_letters'] = {'0': self.last_letters[0],
-                                '1': self.last_letters[1],
-                                '2': self.last_letters[2],
-                                '3': self.last_letters[3],
-                                '4': self.last_letters[4],
-                                '5': self.last_letters[5]}
-        for player in self.players:
-            data[player.name] = {'winCount': player.winCount,
-                                 'guesses': player.guesses,
-                                 'newGuesses': player.newGuesses,
-                                 'registered': player.registered,
-                                 'completedToday': player.completedToday,
-                                 'completedYesterday': player.completedYesterday,
-                                 'succeededToday': player.succeededToday,
-                                 'succeededYesterday': player.succeededYesterday,
-                                 'messageContent': player.messageContent,
-                                 'newMessageContent': player.newMessageContent,
-                                 'resetTime': player.resetTime.isoformat(),
-                                 'sentWarning': player.sentWarning}
-        json_data = json.dumps(data, indent=4)
-        print(f'{get_log_time()}> Writing {self.FILENAME}')
-        with open(self.FILENAME, 'w+', encoding='utf-8') as file:
-            file.write(json_data)
+        self.reset_today = set()
+        self.buckets = TimezoneBuckets()
+        self.user_cache = UserCache(self)
+        self.members = MemberCache()
+        self.screenshots = ScreenshotStore()
+        self.ingestor = ScreenshotIngestor(directory=self.screenshots.tempDirectory)
+        self.images = ImagePipeline(workers=int(os.getenv('IMAGE_WORKERS', '0')) or None)
+        self.preparing = set()
+        self.history = HistoryStore()
+        self.leaderboards = {}
+        self.analytics_cache = {}
+        self.ratings = {}
+        self.rated_game: int = None
+        self.notifier = Notifier(concurrency=int(os.getenv('NOTIFY_CONCURRENCY', '4')),
+                                 log=lambda line: print(f'{get_log_time()}> {line}'))
+        self.publisher = ScoreboardPublisher(concurrency=int(os.getenv('UPLOAD_CONCURRENCY', '3')),
+                                             limiter=self.notifier.limiter,
+                                             log=lambda line: print(f'{get_log_time()}> {line}'))
+        # Every read-modify-write of players and game state runs on this actor
+        self.actor = Actor('wordle')
+        self.players = PlayerRegistry(views={
+            'registered': lambda player: player.registered,
+            'waiting': lambda player: player.registered and (not player.yesterday or player.filePath == '')
+        })
+        self.saver = WriteBehind(SnapshotPersistence(self.SNAPSHOT_FILENAME, self.Player, legacyFilename=self.FILENAME),
+                                 self.get_state,
+                                 delay=float(os.getenv('SAVE_DELAY_SECONDS', '2')),
+                                 log=lambda line: print(f'{get_log_time()}> {line}'))
+
+    async def resolve_user(self, id: int):
+        '''The member to DM, fetched in batches with other misses, falling back to the user'''
+        member = None
+        if self.text_channel is not None:
+            member = await self.members.fetch(self.text_channel.guild, id)
+        return member if member is not None else await self.user_cache.fetch(id)
+
+    def read_state(self):
+        '''Loads the tracker state and players from the snapshot, migrating info.json if there is no snapshot yet'''
+        start = perf_counter()
+        state = self.saver.persistence.read()
+        if state is None:
+            return
+        tracker, players = state
+        self.text_channel_id = tracker['text_channel']
+        if self.text_channel_id is not None:
+            self.text_channel = self.get_channel(self.text_channel_id)
+        self.game_number = tracker['game_number']
+        self.scored_today = tracker['scored_today']
+        self.rated_game = tracker['rated_game']
+        self.random_letter_starting = tracker['random_letter']
+        self.current_letter = tracker['current_letter']
+        self.last_letters = tracker['last_letters']
+        for player in players:
+            if self.players.get_by_name(player.name) is None:
+                self.players.add(player)
+                self.buckets.add(player, player.timezone, player.resetTime)
+        source = self.FILENAME if self.saver.persistence.migrated else self.SNAPSHOT_FILENAME
+        print(f'{get_log_time()}> Loaded Wordle #{self.game_number} and {len(players)} players from {source} '
+              f'in {(perf_counter() - start) * 1000:.0f} ms')
+
+    def save_state(self):
+        '''Marks the state dirty; the snapshot is written once per save window'''
+        self.saver.mark_dirty()
+
+    def get_state(self) -> tuple:
+        '''Captures the tracker state and players for the snapshot'''
+        return capture({'text_channel': self.text_channel.id if self.text_channel is not None else self.text_channel_id,
+                        'game_number': self.game_number,
+                        'scored_today': self.scored_today,
+                        'rated_game': self.rated_game,
+                        'random_letter': self.random_letter_starting,
+                        'current_letter': self.current_letter,
+                        'last_letters': self.last_letters},
+                       self.players)
 
     def get_previous_answers(self) -> None:
+        '''Loads the screenshot store and points players at their stored screenshots.
+
+        Screenshots saved next to the script by older versions are moved into the store.
+        '''
+        self.screenshots.load()
         for player in self.players:
-            if os.path.exists(f'{player.name}.png'):
-                player.filePath = f'{player.name}.png'
+            member = player.id if player.id is not None else player.name
+            for extension, _ in IMAGE_TYPES.values():
+                if os.path.exists(f'{player.name}{extension}'):
+                    player.imageKey = (0, self.game_number - 1, member)
+                    self.screenshots.import_file(player.imageKey, f'{player.name}{extension}')
+                    os.remove(f'{player.name}{extension}')
+                if os.path.exists(f'{player.name}_new{extension}'):
+                    player.newImageKey = (0, self.game_number, member)
+                    self.screenshots.import_file(player.newImageKey, f'{player.name}_new{extension}')
+                    os.remove(f'{player.name}_new{extension}')
+            player.filePath = self.screenshots.get(player.imageKey) or ''
+            player.newFilePath = self.screenshots.get(player.newImageKey) or ''
+            if player.filePath:
                 print(f'{get_log_time()}> Found {player.name}\'s answers as file {player.filePath}')
-            if os.path.exists(f'{player.name}_new.png'):
-                player.newFilePath = f'{player.name}_new.png'
+            if player.newFilePath:
                 print(f'{get_log_time()}> Found {player.name}\'s new answers as file {player.newFilePath}')
+            self.players.refresh(player)
 
     def get_new_letter(self) -> None:
         letter = chr(random.randint(ord("A"), ord("Z")))
@@ -283,126 +271,267 @@ class WordleTrackerClient(Client):
         if found:
             client.last_letters[0] = 'X'
         self.current_letter = letter
-        client.write_json_file()
-
-    async def process(self, message: Message, player: Player):
-        try:
-            parseGuesses = message.content.split('/')
-            parseGuesses[0] = parseGuesses[0].replace(' 🎉', '').replace(',', '')
-            parseGuesses = parseGuesses[0].split(' ', -1)
-            if int(parseGuesses[1]) != self.game_number:
-                message.channel.send(f'You sent results for Wordle #{parseGuesses[1]}; I\'m currently only accepting results for Wordle #{self.game_number}.')
-                return
-            if parseGuesses[2] == 'X':
-                player.newGuesses = 6
-                player.succeededToday = False
-            else:
-                player.newGuesses = int(parseGuesses[2])
-                player.succeededToday = True
-            print(f'{get_log_time()}> Player {player.name} - newGuesses: {player.newGuesses}, succeeded: {player.succeededToday}')
-
-            player.completedToday = True
-            client.write_json_file()
-            response = ''
-            if player.succeededToday:
-                response += f'{message.author.name} guessed the word in {player.newGuesses} guesses.\n'
-            else:
-                response += f'{message.author.name} did not guess the word.\n'
-            if player.newFilePath == '' and not message.attachments:
-                response += 'Please send a screenshot of your guesses as a spoiler attachment, **NOT** a link.'
-            await message.channel.send(response)
-        except:
-            print(f'{get_log_time()}> User {player.name} submitted invalid result message')
-            await message.channel.send(f'{player.name}, you sent a Wordle results message with invalid syntax. Please try again.')
-
-    def tally_scores(self):
-        '''Sorts players and returns a list of strings to send as Discord messages'''
-        if not self.players:
-            print('No players to score')
-            return
-
-        print(f'{get_log_time()}> Tallying guesses')
-        winners = []  # list of winners - the one/those with the lowest score
-        losers = []  # list of losers - people who didn't successfully guess the word
-        results = []  # list of strings - the scoreboard to print out
-        results.append(f'WORDLE #{self.game_number} COMPLETE!\n\n**SCOREBOARD:**\n')
-
-        # sort the players
-        wordle_players = []
-        for player in self.players:
-            if player.registered and player.completedYesterday:
-                wordle_players.append(player)
-        wordle_players.sort(key=get_guesses)
-        if wordle_players[0].guesses == 6:
-            for wordle_player in wordle_players:
-                if wordle_player.succeededToday:
-                    winners.append(wordle_player)
+        client.save_state()
+
+    def process(self, message: Message, player: Player, result: WordleResult) -> str:
+        '''Records a player's result and returns the reply to send'''
+        if result.gameNumber != self.game_number:
+            return f'You sent results for Wordle #{result.gameNumber}; I\'m currently only accepting results for Wordle #{self.game_number}.'
+        player.newGuesses = result.guesses
+        player.today = DayResult.SUCCEEDED if result.succeeded else DayResult.FAILED
+        player.newGrid = pack(result.rows)
+        print(f'{get_log_time()}> Player {player.name} - newGuesses: {player.newGuesses}, succeeded: {player.succeededToday}')
+        self.history.record(GameRecord.from_result(message.guild.id if message.guild else 0,
+                                                   message.author.id,
+                                                   result,
+                                                   message.created_at.astimezone()))
+
+        self.get_leaderboard(result.gameNumber).submit(player, result.succeeded, result.guesses, message.created_at.timestamp())
+        client.players.refresh(player)
+        client.save_state()
+        response = ''
+        if player.succeededToday:
+            response += f'{message.author.name} guessed the word in {player.newGuesses} guesses.\n'
         else:
-            if wordle_players[0].succeededToday:
-                # if the player(s) with the lowest score successfully
-                # guessed the game, they are the first winner
-                first_winner = wordle_players[0]
-                winners.append(first_winner)
-                # for the rest of the players, check if they're tied
-                for player_it in wordle_players[1:]:
-                    if player_it.guesses == first_winner.guesses and player_it.succeededToday:
-                        winners.append(player_it)
-                    else:
-                        break
+            response += f'{message.author.name} did not guess the word.\n'
+        if player.newFilePath == '' and not message.attachments:
+            response += 'Please send a screenshot of your guesses as a spoiler attachment, **NOT** a link.'
+        return response
+
+    def tally_scores(self, ratings: Ratings = None):
+        '''Reads yesterday's leaderboard, applies it to ratings and returns a list of strings to send as Discord messages'''
+        gameNumber = self.game_number - 1
+        print(f'{get_log_time()}> Tallying guesses')
+        results = [f'WORDLE #{gameNumber} COMPLETE!\n\n**SCOREBOARD:**\n']
+        losers = []
         self.scored_today = True
-
-        place_counter = 1
-        prev_guesses = 0
-        for player in wordle_players:
-            if not player.registered:
-                continue
-            print(f'{get_log_time()}> {place_counter}. {player.name} ({player.winCount} wins) with {player.guesses} guesses')
-            if player in winners:
+        board = self.leaderboards.get(gameNumber)
+        if board is None:
+            print(f'{get_log_time()}> Nobody played Wordle #{gameNumber}')
+            return results
+        deltas = {}
+        if ratings is not None:
+            deltas = ratings.update(gameNumber, [(standing.player.id, standing.guesses if standing.succeeded else FAILED)
+                                                 for standing in board.standings() if standing.player.id is not None])
+            self.rated_game = max(self.rated_game or 0, gameNumber)
+        for standing in board.standings(lambda player: player.registered and player.yesterday):
+            player = standing.player
+            if standing.place == 1 and standing.succeeded:
                 player.winCount += 1
-                if player.winCount == 1:
-                    if player.guesses == 1:
-                        results.append(f'1. {player.name} (1 win) wins by guessing the word in one guess! WOW!\n')
-                    else:
-                        results.append(f'1. {player.name} (1 win) wins by guessing the word in {player.guesses} guesses!\n')
+            print(f'{get_log_time()}> {standing.place}. {player.name} ({player.winCount} wins) with {standing.guesses} guesses')
+            wins = '1 win' if player.winCount == 1 else f'{player.winCount} wins'
+            if player.id in deltas:
+                wins += f', {ratings.get(player.id):.0f} rating {deltas[player.id]:+.0f}'
+            if not standing.succeeded:
+                losers.append(f'{player.name} ({wins}) did not successfully guess the word.\n')
+            elif standing.place == 1:
+                if standing.guesses == 1:
+                    results.append(f'1. {player.name} ({wins}) wins by guessing the word in one guess! WOW!\n')
                 else:
-                    if player.guesses == 1:
-                        results.append(f'1. {player.name} ({player.winCount} wins) wins by guessing the word in one guess! WOW!\n')
-                    else:
-                        results.append(f'1. {player.name} ({player.winCount} wins) wins by guessing the word in {player.guesses} guesses!\n')
-            elif player.succeededToday:
-                if player.winCount == 1:
-                    results.append(f'{place_counter}. {player.name} (1 win) guessed the word in {player.guesses} guesses.\n')
-                else:
-                    results.append(f'{place_counter}. {player.name} ({player.winCount} wins) guessed the word in {player.guesses} guesses.\n')
+                    results.append(f'1. {player.name} ({wins}) wins by guessing the word in {standing.guesses} guesses!\n')
             else:
-                if player.winCount == 1:
-                    losers.append(f'{player.name} (1 win) did not successfully guess the word.\n')
-                else:
-                    losers.append(f'{player.name} ({player.winCount} wins) did not successfully guess the word.\n')
-            if prev_guesses != player.guesses:
-                place_counter += 1
-            prev_guesses = player.guesses
+                results.append(f'{standing.place}. {player.name} ({wins}) guessed the word in {standing.guesses} guesses.\n')
+        for number in [number for number in self.leaderboards if number < self.game_number]:
+            del self.leaderboards[number]
 
-        self.write_json_file()
+        self.save_state()
         return results + losers
 
+    def rebuild_leaderboards(self) -> None:
+        '''Fills today's and yesterday's leaderboards from saved player data after a restart'''
+        for player in self.players:
+            if player.yesterday:
+                self.get_leaderboard(self.game_number - 1).submit(player, player.yesterday.succeeded, player.guesses)
+            if player.today:
+                self.get_leaderboard(self.game_number).submit(player, player.today.succeeded, player.newGuesses)
+
+    def get_leaderboard(self, gameNumber: int) -> Leaderboard:
+        board = self.leaderboards.get(gameNumber)
+        if board is None:
+            board = self.leaderboards[gameNumber] = Leaderboard(gameNumber)
+        return board
+
+    async def get_analytics(self, scope: int) -> tuple:
+        '''Returns (GameMatrix, head-to-head wins) for a guild, rebuilt in an executor only when history has grown'''
+        end = self.history.offset
+        cached = self.analytics_cache.get(scope)
+        if cached is None or cached[0] != end:
+            def build():
+                matrix = GameMatrix.from_records(self.history.records(scope, end))
+                return end, matrix, matrix.head_to_head()
+            cached = await asyncio.get_running_loop().run_in_executor(None, build)
+            self.analytics_cache[scope] = cached
+        return cached[1], cached[2]
+
+    async def get_ratings(self, scope: int) -> Ratings:
+        '''Returns a guild's ratings, recomputed from history in an executor the first time they are needed'''
+        task = self.ratings.get(scope)
+        if task is None:
+            end = self.history.offset
+            through = self.rated_game if self.rated_game is not None else self.game_number - 1
+
+            def build():
+                return Ratings.recompute(GameMatrix.from_records(self.history.records(scope, end)), through=through)
+            task = self.ratings[scope] = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(None, build))
+        return await task
+
+    def prepare_screenshot(self, player: Player, key: tuple) -> None:
+        '''Crops, downscales and re-encodes the screenshot stored under key in the background'''
+        task = asyncio.create_task(self._prepare_screenshot(player, key))
+        self.preparing.add(task)
+        task.add_done_callback(self.preparing.discard)
+
+    async def _prepare_screenshot(self, player: Player, key: tuple) -> None:
+        original = self.screenshots.get(key)
+        if original is None:
+            return
+        name = os.path.splitext(os.path.basename(original))[0]
+        destination = os.path.join(self.screenshots.tempDirectory, f'{key[2]}-{name}{PREPARED_EXTENSION}')
+        originalSize = os.path.getsize(original)
+        try:
+            path, sha256, size = await self.images.normalize(original, destination)
+        except Exception as e:
+            print(f'{get_log_time()}> Could not prepare {player.name}\'s screenshot, keeping the original: {e}')
+            return
+        if await self.actor.ask(self.store_prepared, player, key, original, path, sha256):
+            print(f'{get_log_time()}> Prepared {player.name}\'s screenshot: {originalSize} -> {size} bytes')
+
+    async def store_prepared(self, player: Player, key: tuple, original: str, path: str, sha256: str) -> bool:
+        '''Files a prepared screenshot under key on the actor, unless key was replaced, scored or released meanwhile'''
+        if self.screenshots.get(key) != original:
+            await asyncio.to_thread(os.remove, path)
+            return False
+        if KEEP_ORIGINALS == 'until-scored':
+            await asyncio.to_thread(self.screenshots.link, key, original_key(key))
+        prepared = await asyncio.to_thread(self.screenshots.put, key, path, sha256)
+        if player.newImageKey is not None and tuple(player.newImageKey) == key:
+            player.newFilePath = prepared
+        elif player.imageKey is not None and tuple(player.imageKey) == key:
+            player.filePath = prepared
+        return True
+
+    async def release_screenshot(self, key) -> None:
+        if key is not None:
+            await asyncio.to_thread(self.screenshots.release, key, original_key(key))
+
+    async def snapshot_scoreboard(self, scope: int) -> tuple:
+        '''Tallies the scores and picks everyone's screenshots on the actor; returns (scoreboard, screenshots) to post'''
+        ratings = await self.get_ratings(scope)
+        scoreboard = ''
+        for line in self.tally_scores(ratings):
+            scoreboard += line
+        screenshots = []
+        for player in self.players:
+            if player.registered and player.filePath != '':
+                if self.screenshots.contains(player.filePath):
+                    name = re.sub(r'[^\w.-]', '_', player.name) + os.path.splitext(player.filePath)[1]
+                    key = tuple(player.imageKey) if player.imageKey is not None else None
+                    screenshots.append(Screenshot(player.caption(), player.filePath, name, player, key))
+                else:
+                    print(f'{get_log_time()}> {player.name}\'s screenshot was evicted before scoring')
+                    await self.release_screenshot(player.imageKey)
+                    self.clear_screenshot(player)
+        return scoreboard, screenshots
+
+    async def post_scoreboard(self, channel: TextChannel, scoreboard: str, screenshots: list) -> None:
+        '''Posts a scoreboard snapshot off the actor, then releases only the screenshots that were posted'''
+        posted = await self.publisher.publish(channel, scoreboard, screenshots)
+        print(f'{get_log_time()}> Posted {len(posted)}/{len(screenshots)} screenshots')
+        await self.actor.ask(self.release_posted, posted)
+
+    async def release_posted(self, posted: list) -> None:
+        for screenshot in posted:
+            player = screenshot.owner
+            key = tuple(player.imageKey) if player.imageKey is not None else None
+            # A reset while posting has already shifted the screenshot out and released it
+            if key != screenshot.key or (key is None and player.filePath != screenshot.path):
+                continue
+            await self.release_screenshot(key)
+            self.clear_screenshot(player)
+
+    def clear_screenshot(self, player: Player) -> None:
+        player.filePath = ''
+        player.imageKey = None
+        player.messageContent = ''
+        player.grid = 0
+        self.players.refresh(player)
+
     async def setup_hook(self):
         await self.tree.sync()
 
+    async def close(self):
+        await self.actor.stop()
+        await self.notifier.stop()
+        await self.ingestor.close()
+        self.images.close()
+        await self.saver.flush()
+        self.history.checkpoint()
+        await super().close()
+
+
+def remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def original_key(key) -> tuple:
+    '''Store key that keeps an original screenshot alive after it is prepared'''
+    return (*key, 'original')
+
 
 discord_token = os.getenv('DISCORD_TOKEN')
-client = WordleTrackerClient(intents=Intents.all())
-client.read_json_file()
-client.get_previous_answers()
+client = WordleTrackerClient(**client_options())
+
+
+def load() -> None:
+    '''Reads the saved state; only the bot process calls this, since image workers import this script too'''
+    client.read_state()
+    client.get_previous_answers()
+    client.history.load()
+    client.rebuild_leaderboards()
 
 
 @client.event
 async def on_ready():
-    if not midnight_call.is_running():
-        midnight_call.start()
+    named = client.user_cache.warm([player.id for player in client.players if player.id is not None],
+                                   [player.name for player in client.players if player.id is None])
+    for user in named.values():
+        client.players.find(user)
+        print(f'{get_log_time()}> Bound {user.name} to user id {user.id}')
+    if named:
+        client.save_state()
+    for bucket in client.buckets:
+        schedule_deadlines(bucket)
+    scheduler.start()
+    client.notifier.start()
+    if client.text_channel is None and client.text_channel_id is not None:
+        # The channel cache is empty when the state is loaded, before login
+        client.text_channel = client.get_channel(client.text_channel_id)
+    if client.text_channel is not None:
+        # Recompute ratings from history in the background before anyone asks for them
+        asyncio.create_task(client.get_ratings(client.text_channel.guild.id))
     print(f'{get_log_time()}> {client.user} has connected to Discord!')
 
 
+@client.event
+async def on_member_update(before, after):
+    client.user_cache.invalidate(after.id)
+    client.members.invalidate(after.guild.id, after.id)
+
+
+@client.event
+async def on_user_update(before, after):
+    client.user_cache.invalidate(after.id)
+
+
+@client.event
+async def on_member_remove(member):
+    client.user_cache.invalidate(member.id)
+    client.members.invalidate(member.guild.id, member.id)
+
+
 @client.event
 async def on_message(message: Message):
     '''Client on_message event'''
@@ -415,123 +544,181 @@ async def on_message(message: Message):
         print(f'{get_log_time()}> could not check, no text_channel was set: {e}')
         client.text_channel = message.channel
 
-    if 'Wordle' in message.content and '/' in message.content and ('⬛' in message.content or '🟨' in message.content or '🟩' in message.content):
-        await message.delete()
+    try:
+        result = parse_result(message.content)
+    except ParseError as e:
+        result = e
+    # Download screenshots before queueing so a slow upload doesn't hold up everyone else
+    image = None
+    if message.attachments and message.attachments[0].is_spoiler() and client.players.find(message.author) is not None:
+        try:
+            image = await client.ingestor.ingest(message.attachments[0], f'{message.author.id}')
+        except IngestError as e:
+            # The message's result, if it has one, still counts
+            print(f'{get_log_time()}> Rejected image from {message.author.name}: {e}')
+            await message.channel.send(f'{message.author.name}, your screenshot was not accepted: {e}.')
+    try:
+        replies, scoreboard = await client.actor.ask(handle_message, message, result, image)
+    finally:
+        if image is not None:
+            # Left behind unless the screenshot store took it
+            await asyncio.to_thread(remove_file, image.path)
+    # The Discord round trips run once the actor is free for the next message
+    try:
+        await make_replies(replies)
+    finally:
+        # The scores are already tallied, so the snapshot must go out
+        if scoreboard is not None:
+            await client.post_scoreboard(message.channel, *scoreboard)
+
+
+async def make_replies(replies: list) -> None:
+    '''Makes each Discord call in order; one that fails is logged and the rest still run'''
+    for reply in replies:
+        try:
+            await reply()
+        except HTTPException as e:
+            print(f'{get_log_time()}> {getattr(reply, "func", reply).__name__} failed: {e}')
+
+
+async def handle_message(message: Message, result, image: IngestedImage) -> tuple:
+    '''Applies a message's result and screenshot to the player and snapshots the scoreboard if nobody is left waiting.
+
+    Returns (replies, scoreboard): the Discord calls to make, in order, and the
+    scoreboard snapshot to post or None; the caller makes them off the actor.
+    '''
+    replies = []
+    shared = isinstance(result, ParseError) or (result is not None and result.rows)
+    if shared:
+        replies.append(message.delete)
         # no registered players
         if not client.players:
-            await message.channel.send(f'{message.author.mention}, there are no registered players! Please register and resend your results to be the first.')
-            return
+            replies.append(partial(message.channel.send, f'{message.author.mention}, there are no registered players! Please register and resend your results to be the first.'))
+            return replies, None
         # find player in memory
-        player: client.Player
-        foundPlayer = False
-        for player_it in client.players:
-            if message.author.name == player_it.name:
-                foundPlayer = True
-                player = player_it
+        player = client.players.find(message.author)
         # player is not registered
-        if not foundPlayer:
-            await message.channel.send(f'{message.author.name}, you are not registered! Please register and resend your results.')
-            return
+        if player is None:
+            replies.append(partial(message.channel.send, f'{message.author.name}, you are not registered! Please register and resend your results.'))
+            return replies, None
         # player has already sent results
         if player.completedToday:
             print(f'{get_log_time()}> {player.name} tried to resubmit results')
-            await message.channel.send(f'{player.name}, you have already submitted your results today.')
-            return
-
-        client.write_json_file()
+            replies.append(partial(message.channel.send, f'{player.name}, you have already submitted your results today.'))
+            return replies, None
+        # results message could not be parsed
+        if isinstance(result, ParseError):
+            print(f'{get_log_time()}> User {player.name} submitted invalid result message: {result}')
+            replies.append(partial(message.channel.send, f'{player.name}, you sent a Wordle results message with invalid syntax ({result}). Please try again.'))
+            return replies, None
 
         # process player's results
-        await client.process(message, player)
+        replies.append(partial(message.channel.send, client.process(message, player, result)))
 
-    if message.attachments and message.attachments[0].is_spoiler():
-        for player in client.players:
-            if message.author.name == player.name:
-                if player.newFilePath == '':
-                    response = f'Received image from {message.author.name}.\n'
-                else:
-                    response = f'Received replacement image from {message.author.name}.\n'
-                player.newFilePath = f'{message.author.name}_new.png'
-                with open(player.newFilePath, 'wb') as file:
-                    await message.attachments[0].save(file)
+    if image is not None:
+        player = client.players.find(message.author)
+        if player is not None:
+            if player.newFilePath == '':
+                response = f'Received image from {message.author.name}.\n'
+            else:
+                response = f'Received replacement image from {message.author.name}.\n'
+            key = (message.guild.id if message.guild else 0, client.game_number, message.author.id)
+            if player.newImageKey is not None and tuple(player.newImageKey) != key:
+                await client.release_screenshot(player.newImageKey)
+            player.newFilePath = await asyncio.to_thread(client.screenshots.put, key, image.path, image.sha256, image.extension)
+            player.newImageKey = key
+            client.prepare_screenshot(player, key)
+            try:
+                caption = parse_result(message.content)
+            except ParseError:
+                caption = None
+            if caption is not None and caption.rows:
+                # Keep the shared grid packed rather than as kilobytes of emoji
+                player.newGrid = pack(caption.rows)
+                player.newMessageContent = ''
+            else:
                 player.newMessageContent = message.content
-                if not player.completedToday:
-                    response += 'Please copy and send your Wordle-generated results.'
-                await message.channel.send(response)
-                await message.delete()
-                break
+            if not player.completedToday:
+                response += 'Please copy and send your Wordle-generated results.'
+            replies.append(partial(message.channel.send, response))
+            if not shared:
+                replies.append(message.delete)
 
     if client.scored_today:
-        return
-    for player in client.players:
-        if player.registered and (not player.completedYesterday or player.filePath == ''):
-            print(f'{get_log_time()}> Waiting for {player.name}')
-            return
-    await client.text_channel.edit(name=f'letter-{client.current_letter}-wordle')
-    scoreboard = ''
-    for line in client.tally_scores():
-        scoreboard += line
-    await message.channel.send(scoreboard)
-    for player in client.players:
-        if player.registered and player.filePath != '':
-            await message.channel.send(content=f'__{player.name}:__\n{player.messageContent}', file=File(player.filePath))
-            try:
-                os.remove(player.filePath)
-            except OSError as e:
-                print(f'{get_log_time()}> Error deleting {player.filePath}: {e}')
-            player.filePath = ''
-            player.messageContent = ''
+        return replies, None
+    waiting = client.players.view('waiting')
+    if waiting:
+        print(f'{get_log_time()}> Waiting for {len(waiting)} players')
+        return replies, None
+    replies.append(partial(client.text_channel.edit, name=f'letter-{client.current_letter}-wordle'))
+    return replies, await client.snapshot_scoreboard(message.guild.id if message.guild else 0)
 
 
 @client.tree.command(name='register', description='Register for Wordle tracking.')
 async def register_command(interaction: Interaction):
     '''Command to register a player'''
+    response, created = await register(interaction)
+    view = TimezoneMenuView() if created else None
+    await interaction.response.send_message(content=response, view=view, ephemeral=True)
+
+
+@serialized(lambda *args, **kwargs: client.actor)
+async def register(interaction: Interaction) -> tuple:
+    '''Registers the interaction's user; returns (response, whether a new player was created)'''
     client.text_channel = interaction.channel
     response = ''
-    playerFound = False
-    view = None
-    for player in client.players:
-        if interaction.user.name == player.name:
-            if player.registered:
-                print(f'{get_log_time()}> User {interaction.user.name} attempted to re-register for tracking')
-                response += 'You are already registered for Wordle tracking!\n'
-            else:
-                print(f'{get_log_time()}> Registering user {interaction.user.name} for tracking')
-                player.registered = True
-                response += 'You have been registered for Wordle tracking.\n'
-            playerFound = True
-    if not playerFound:
+    created = False
+    player = client.players.find(interaction.user)
+    if player is not None:
+        if player.registered:
+            print(f'{get_log_time()}> User {interaction.user.name} attempted to re-register for tracking')
+            response += 'You are already registered for Wordle tracking!\n'
+        else:
+            print(f'{get_log_time()}> Registering user {interaction.user.name} for tracking')
+            player.registered = True
+            client.players.refresh(player)
+            response += 'You have been registered for Wordle tracking.\n'
+    else:
         print(f'{get_log_time()}> Registering user {interaction.user.name} for tracking')
-        player_obj = client.Player(interaction.user.name)
-        client.players.append(player_obj)
+        player_obj = client.Player(interaction.user.name, interaction.user.id)
+        client.players.add(player_obj)
+        schedule_deadlines(client.buckets.add(player_obj, player_obj.timezone, player_obj.resetTime))
         response += 'You have been registered for Wordle tracking.\n'
-        view = TimezoneMenuView()
-    client.write_json_file()
-    await interaction.response.send_message(content=response, view=view, ephemeral=True)
+        created = True
+    client.save_state()
+    return response, created
 
 
 @client.tree.command(name='deregister', description='Deregister from Wordle tracking. Use twice to delete saved data.')
 async def deregister_command(interaction: Interaction):
     '''Command to deregister a player'''
+    response = await deregister(interaction)
+    await interaction.response.send_message(content=response, ephemeral=True)
+
+
+@serialized(lambda *args, **kwargs: client.actor)
+async def deregister(interaction: Interaction) -> str:
+    '''Deregisters the interaction's user, or deletes their data if already deregistered; returns the response'''
     client.text_channel = interaction.channel
-    players_copy = client.players.copy()
     response = ''
-    playerFound = False
-    for player in players_copy:
-        if player.name == interaction.user.name:
-            if player.registered:
-                player.registered = False
-                print(f'{get_log_time()}> Deregistered user {player.name}')
-                response += 'You have been deregistered for Wordle tracking.'
-            else:
-                client.players.remove(player)
-                print(f'{get_log_time()}> Deleted data for user {player.name}')
-                response += 'Your saved data has been deleted for Wordle tracking.'
-            playerFound = True
-    if not playerFound:
+    player = client.players.find(interaction.user)
+    if player is not None:
+        if player.registered:
+            player.registered = False
+            client.players.refresh(player)
+            print(f'{get_log_time()}> Deregistered user {player.name}')
+            response += 'You have been deregistered for Wordle tracking.'
+        else:
+            client.players.remove(player)
+            remove_from_bucket(player)
+            client.reset_today.discard(player)
+            print(f'{get_log_time()}> Deleted data for user {player.name}')
+            response += 'Your saved data has been deleted for Wordle tracking.'
+    else:
         print(f'{get_log_time()}> Non-existant user {interaction.user.name} attempted to deregister')
         response += 'You have no saved data for Wordle tracking.'
-    client.write_json_file()
-    await interaction.response.send_message(content=response, ephemeral=True)
+    client.save_state()
+    return response
 
 
 @client.tree.command(name='timezone', description='Change your timezone for scoring and notification purposes.')
@@ -543,102 +730,214 @@ async def timezone_command(interaction: Interaction):
     await interaction.response.send_message(content=content, view=view, ephemeral=True)
 
 
+@client.tree.command(name='stats', description='Show Wordle statistics for yourself or another player.')
+@app_commands.describe(member='The player to show statistics for. Defaults to you.')
+async def stats_command(interaction: Interaction, member: Member = None):
+    '''Command to show a player's statistics from the running aggregates'''
+    member = member or interaction.user
+    stats = client.history.get(interaction.guild.id if interaction.guild else 0, member.id)
+    await interaction.response.send_message(content=format_stats(member.name, stats, client.game_number), ephemeral=True)
+
+
+@client.tree.command(name='leaderboard', description='Show the standings for today\'s Wordle so far.')
+async def leaderboard_command(interaction: Interaction):
+    '''Command to show the live leaderboard'''
+    board = client.leaderboards.get(client.game_number)
+    standings = board.standings(lambda player: player.registered) if board is not None else []
+    if not standings:
+        await interaction.response.send_message(content=f'Nobody has submitted Wordle #{client.game_number} yet.', ephemeral=True)
+        return
+    content = f'**WORDLE #{client.game_number} SO FAR:**\n'
+    for standing in standings:
+        if standing.succeeded:
+            content += f'{standing.place}. {standing.player.name} - {standing.guesses}/6\n'
+        else:
+            content += f'{standing.place}. {standing.player.name} - X/6\n'
+    await interaction.response.send_message(content=content, ephemeral=True)
+
+
+@client.tree.command(name='rankings', description='Show the all-time Wordle rankings.')
+async def rankings_command(interaction: Interaction):
+    '''Command to show all-time rankings computed over the full history'''
+    await interaction.response.defer(ephemeral=True)
+    matrix, _ = await client.get_analytics(interaction.guild.id if interaction.guild else 0)
+    names = {player.id: player.name for player in client.players}
+    await interaction.followup.send(content=format_rankings(matrix.rankings(), names), ephemeral=True)
+
+
+@client.tree.command(name='headtohead', description='Compare your Wordle results against another player\'s.')
+@app_commands.describe(member='The player to compare against.')
+async def headtohead_command(interaction: Interaction, member: Member):
+    '''Command to show how two players' results compare in the games both played'''
+    await interaction.response.defer(ephemeral=True)
+    matrix, wins = await client.get_analytics(interaction.guild.id if interaction.guild else 0)
+    names = {interaction.user.id: interaction.user.name, member.id: member.name}
+    await interaction.followup.send(content=format_head_to_head(matrix, wins, interaction.user.id, member.id, names), ephemeral=True)
+
+
+@client.tree.command(name='rating', description='Show the skill rating for yourself or another player.')
+@app_commands.describe(member='The player to show the rating for. Defaults to you.')
+async def rating_command(interaction: Interaction, member: Member = None):
+    '''Command to show a player's rating'''
+    member = member or interaction.user
+    await interaction.response.defer(ephemeral=True)
+    ratings = await client.get_ratings(interaction.guild.id if interaction.guild else 0)
+    await interaction.followup.send(content=format_rating(member.name, ratings, member.id), ephemeral=True)
+
+
 @client.tree.command(name='randomletterstart', description='State a random letter to start the Wordle guessing with.')
 @app_commands.describe(random_letters='Whether you want forced starting with a random letter.')
 async def randomletterstart_command(interaction: Interaction, random_letters: bool = True):
     '''Command to enable random letter starts'''
+    content, channelName = await randomletterstart(interaction, random_letters)
+    await interaction.response.send_message(content=content)
+    await interaction.channel.edit(name=channelName)
+
+
+@serialized(lambda *args, **kwargs: client.actor)
+async def randomletterstart(interaction: Interaction, random_letters: bool) -> tuple:
+    '''Turns random letter starts on or off; returns (response, channel name)'''
     client.text_channel = interaction.channel
     client.random_letter_starting = random_letters
     client.get_new_letter()
-    client.write_json_file()
-    print(f'{get_log_time()}> Random letter starting set to {client.random_letter_starting}; letter is "{client.letter}"')
+    client.save_state()
+    print(f'{get_log_time()}> Random letter starting set to {client.random_letter_starting}; letter is "{client.current_letter}"')
     if client.random_letter_starting:
         content = f'Random letter starting has been enabled; the current letter is "{client.current_letter}".'
-        channelName = f'letter-{client.letter}-wordle'
+        channelName = f'letter-{client.current_letter}-wordle'
     else:
         content = 'Random letter starting has been disabled.'
         channelName = 'wordle'
-    await interaction.response.send_message(content=content)
-    await client.text_channel.edit(name=channelName)
+    return content, channelName
 
 
-@tasks.loop(seconds=1)
-async def midnight_call():
-    '''Midnight call loop task that is run every second with a midnight check.'''
-    if not client.players:
-        return
+def schedule_deadlines(bucket) -> None:
+    '''(Re)arms a timezone bucket's one hour warning and reset deadlines'''
+    scheduler.schedule(('warning', bucket.name), bucket.warningTime, partial(client.actor.ask, warning_call, bucket))
+    scheduler.schedule(('reset', bucket.name), bucket.resetTime, partial(reset_call, bucket))
 
-    curTime = datetime.now().astimezone().replace(microsecond=0)
 
-    # Warnings
-    for player in client.players:
-        await player.send_warning(curTime)
+def remove_from_bucket(player) -> None:
+    emptied = client.buckets.remove(player, player.timezone)
+    if emptied is not None:
+        scheduler.cancel(('warning', emptied.name))
+        scheduler.cancel(('reset', emptied.name))
+
+
+def set_timezone(player, timezone: str) -> None:
+    '''Moves a player to another timezone bucket, keeping a reset they have already had today'''
+    oldTimezone = player.timezone
+    remove_from_bucket(player)
+    player.timezone = sys.intern(timezone)
+    bucket = client.buckets.get(timezone)
+    if player in client.reset_today:
+        player.resetTime = moved_reset(timezone, oldTimezone, player.resetTime)
+    else:
+        player.resetTime = bucket.resetTime if bucket is not None else next_midnight(timezone)
+    schedule_deadlines(client.buckets.add(player, player.timezone, player.resetTime))
+
+
+async def warning_call(bucket) -> None:
+    '''Sends the one hour warning to every player in a timezone'''
+    curTime = datetime.now().astimezone()
+    for player in bucket.players:
+        player.send_warning(curTime)
+
+
+async def reset_call(bucket) -> None:
+    '''Midnight for a timezone: resets the bucket on the actor, then renames the channel if a new letter was drawn'''
+    channelName = await client.actor.ask(reset_bucket, bucket)
+    if channelName is not None:
+        await client.text_channel.edit(name=channelName)
+
+
+async def reset_bucket(bucket):
+    '''Rolls the game over on the first reset of the day and shifts the bucket's players' data; returns the new channel name, if any'''
+    curTime = datetime.now().astimezone()
+    channelName = None
+    if not client.midnight_called:
+        client.midnight_called = True
+        client.game_number += 1
+        if client.random_letter_starting:
+            oldLetter = client.text_channel.name.split('-')[1]
+            client.get_new_letter()
+            channelName = f'letter-{client.current_letter}-{oldLetter}-wordle'
+
+    due = [player for player in bucket.players if player.resetTime <= curTime]
+    bucket.advance(curTime)
+    for player in bucket.players:
+        player.resetTime = bucket.resetTime
+    # Screenshots still held from an earlier day were never posted; shifting drops their keys
+    unposted = [player.imageKey for player in due if player.imageKey is not None]
+    for player in due:
+        player.shift_data()
+        client.reset_today.add(player)
+    schedule_deadlines(bucket)
+    client.save_state()
+    for key in unposted:
+        await client.release_screenshot(key)
+    print(f'{get_log_time()}> Reset {len(due)} players in {bucket.name}, next reset at {bucket.resetTime.isoformat()}')
+    for player in due:
+        player.notify_of_wordle()
+    print(f'{get_log_time()}> Notifier: {client.notifier.metrics()}')
+
+    # Everyone is past midnight - ready for scoring
+    if client.players.view('registered') and client.players.view('registered') <= client.reset_today:
+        scheduler.schedule('score', datetime.now().astimezone(), scoring_call)
+    return channelName
+
+
+async def scoring_call() -> None:
+    '''Sends the daily scoreboard once every registered player is past midnight'''
+    day = await client.actor.ask(close_day)
+    if day is None:
+        return
+    shame, scoreboard = day
+    replies = [partial(client.text_channel.edit, name='wordle')]
+    if shame is not None:
+        replies.insert(0, partial(client.text_channel.send, shame))
+    try:
+        await make_replies(replies)
+    finally:
+        await client.post_scoreboard(client.text_channel, *scoreboard)
 
-    # Update wordle number and required letter to earliest user timezone
-    for player in client.players():
-        if not client.midnight_called and player.past_reset_time():
-            client.midnight_called = True
-            client.game_number += 1
-            if client.random_letter_starting:
-                oldLetter = client.text_channel.name.split('-')[1]
-                client.get_new_letter()
-                await client.text_channel.edit(name=f'letter-{client.letter}-{oldLetter}-wordle')
-
-    # Mention users when it passes midnight for them
-    for player in client.players:
-        if player.past_reset_time():
-            player.shift_data()
-            await player.notify_of_wordle()
-
-    # Midnight/All answered - Ready for scoring?
-    for player in client.players:
-        if not player.past_reset_time(curTime) and not player.completedToday:
-            return
+
+async def close_day():
+    '''Ends the day on the actor; returns (shame message or None, scoreboard snapshot), or None if already scored'''
+    client.midnight_called = False
+    client.reset_today.clear()
+    if client.scored_today:
+        client.scored_today = False
+        return None
 
     print(f'{get_log_time()}> Everyone is past midnight or has answered, sending daily scoreboard')
 
     # Score players
     shamed = ''
-    for player in client.players:
-        if player.registered and not player.completedToday:
-            user = utils.get(client.users, name=player.name)
-            if user:
-                shamed += f'{user.mention} '
+    for player in client.players.view('registered'):
+        if not player.completedYesterday:
+            if player.id is not None:
+                shamed += f'<@{player.id}> '
             else:
                 print(f'{get_log_time()}> Failed to mention user {player.name}')
+    shame = None
     if shamed != '':
-        await client.text_channel.send(f'SHAME ON {shamed} FOR NOT DOING WORDLE #{client.game_number}!')
-    await client.text_channel.edit(name='wordle')
-    scoreboard = ''
-    for line in client.tally_scores():
-        scoreboard += line
-    await client.text_channel.send(scoreboard)
-    for player in client.players:
-        if player.registered and player.filePath != '':
-            await client.text_channel.send(content=f'__{player.name}:__\n{player.messageContent}', file=File(player.filePath))
-            try:
-                os.remove(player.filePath)
-            except OSError as e:
-                print(f'Error deleting {player.filePath}: {e}')
-            player.filePath = ''
-            player.messageContent = ''
+        shame = f'SHAME ON {shamed} FOR NOT DOING WORDLE #{client.game_number - 1}!'
+    guild = client.text_channel.guild
+    scoreboard = await client.snapshot_scoreboard(guild.id if guild else 0)
 
-    # Reset resetTimes
     client.scored_today = False
-    everyone = ''
-    for player in client.players:
-        player.guesses = 0
-        player.completedToday = False
-        player.succeededToday = False
-        player.resetTime += timedelta(days=1)
-        player.sentWarning = False
-        user = utils.get(client.users, name=player.name)
-        if user:
-            if player.registered:
-                everyone += f'{user.mention} '
-        else:
-            print(f'{get_log_time()}> Failed to mention user {player.name}')
+    client.save_state()
+    client.history.checkpoint()
+    return shame, scoreboard
+
+
+def scheduler_error(key, error: Exception) -> None:
+    print(f'{get_log_time()}> Scheduled {key} failed: {error}')
+
 
-    client.write_json_file()
+scheduler = Scheduler(on_error=scheduler_error)
 
-client.run(discord_token)
+if __name__ == '__main__':
+    load()
+    client.run(discord_token)
@@ -0,0 +1,82 @@
+'''Written by Cael Shoop.'''
+
+import asyncio
+import functools
+
+
+class Actor():
+    '''Serializes work on one piece of state through a mailbox drained by a single task.
+
+    Everything that reads and then writes a tracker's state is sent here, so
+    handlers that await partway through (a Discord send, a file write) cannot
+    interleave with each other. Separate actors run independently. The lock is
+    held while each job runs; code outside the mailbox can take it to get the
+    same exclusive view of the state.
+    '''
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.lock = asyncio.Lock()
+        self.mailbox = asyncio.Queue()
+        self.task = None
+        self.processed = 0
+
+    def tell(self, function, *args, **kwargs) -> asyncio.Future:
+        '''Queues function(*args, **kwargs) and returns a future of its result'''
+        future = asyncio.get_running_loop().create_future()
+        self.mailbox.put_nowait((function, args, kwargs, future))
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return future
+
+    async def ask(self, function, *args, **kwargs):
+        '''Runs function on the actor and returns its result.
+
+        Called from a job already running on this actor it runs inline, since
+        waiting on the mailbox from inside it would deadlock.
+        '''
+        if self.task is not None and asyncio.current_task() is self.task:
+            return await function(*args, **kwargs)
+        return await self.tell(function, *args, **kwargs)
+
+    async def stop(self) -> None:
+        '''Finishes the queued jobs, then ends the mailbox task'''
+        if self.task is None:
+            return
+        await self.mailbox.join()
+        self.task.cancel()
+        self.task = None
+
+    async def _run(self) -> None:
+        while True:
+            function, args, kwargs, future = await self.mailbox.get()
+            try:
+                if future.cancelled():
+                    continue
+                async with self.lock:
+                    try:
+                        result = await function(*args, **kwargs)
+                    except Exception as e:
+                        if not future.cancelled():
+                            future.set_exception(e)
+                    else:
+                        if not future.cancelled():
+                            future.set_result(result)
+                self.processed += 1
+            finally:
+                self.mailbox.task_done()
+
+
+def serialized(getActor):
+    '''Decorator running a coroutine function on the actor getActor(*args, **kwargs) returns.
+
+    If getActor returns None the function runs directly.
+    '''
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            actor = getActor(*args, **kwargs)
+            if actor is None:
+                return await function(*args, **kwargs)
+            return await actor.ask(function, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,123 @@
+'''Written by Cael Shoop.'''
+
+import warnings
+
+import numpy
+
+MISSING = 0
+FAILED = 7
+
+
+class GameMatrix():
+    '''Every player's result in every game, as an int8 (players x games) matrix.
+
+    Cells hold the guess count 1-6, FAILED for a failed game and MISSING when
+    the player did not play. All statistics are vectorized over the matrix; none
+    loop over players or games in Python.
+    '''
+    def __init__(self, memberIds: list, firstGame: int, scores: numpy.ndarray):
+        self.memberIds = memberIds
+        self.rows = {memberId: row for row, memberId in enumerate(memberIds)}
+        self.firstGame = firstGame
+        self.scores = scores
+        self.played = scores != MISSING
+
+    @classmethod
+    def from_records(cls, records):
+        '''Builds the matrix from history.GameRecords (or anything with memberId, gameNumber, guesses, succeeded)'''
+        memberIds, rows, columns, values = [], [], [], []
+        seen = {}
+        for record in records:
+            row = seen.get(record.memberId)
+            if row is None:
+                row = seen[record.memberId] = len(memberIds)
+                memberIds.append(record.memberId)
+            rows.append(row)
+            columns.append(record.gameNumber)
+            values.append(record.guesses if record.succeeded else FAILED)
+        if not values:
+            return cls([], 0, numpy.zeros((0, 0), dtype=numpy.int8))
+        columns = numpy.asarray(columns)
+        firstGame = int(columns.min())
+        scores = numpy.zeros((len(memberIds), int(columns.max()) - firstGame + 1), dtype=numpy.int8)
+        scores[numpy.asarray(rows), columns - firstGame] = numpy.asarray(values, dtype=numpy.int8)
+        return cls(memberIds, firstGame, scores)
+
+    @property
+    def shape(self) -> tuple:
+        return self.scores.shape
+
+    def head_to_head(self) -> numpy.ndarray:
+        '''wins[i, j] is how many games both played in which player i needed fewer guesses than player j'''
+        wins = numpy.zeros((len(self.memberIds),) * 2, dtype=numpy.float32)
+        for score in range(1, FAILED):
+            # One matrix product per score: i scored exactly this, j played and scored worse
+            scored = (self.scores == score).astype(numpy.float32)
+            worse = (self.scores > score).astype(numpy.float32)
+            wins += scored @ worse.T
+        return wins.astype(numpy.int32)
+
+    def means(self) -> numpy.ndarray:
+        '''Mean score per player over played games, counting a failure as FAILED; NaN if none played'''
+        counts = self.played.sum(axis=1)
+        totals = self.scores.sum(axis=1, dtype=numpy.int64)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return numpy.where(counts > 0, totals / counts, numpy.nan)
+
+    def rolling_averages(self, window: int = 30) -> numpy.ndarray:
+        '''Mean score over each player's games in the trailing window of game numbers; NaN where none were played'''
+        totals = numpy.cumsum(self.scores, axis=1, dtype=numpy.int64)
+        counts = numpy.cumsum(self.played, axis=1, dtype=numpy.int64)
+        totals[:, window:] -= totals[:, :-window].copy()
+        counts[:, window:] -= counts[:, :-window].copy()
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return numpy.where(counts > 0, totals / counts, numpy.nan)
+
+    def percentiles(self, q=(25, 50, 75)) -> numpy.ndarray:
+        '''Per player score percentiles over played games, shape (players, len(q))'''
+        values = numpy.where(self.played, self.scores, numpy.nan).astype(numpy.float32)
+        with warnings.catch_warnings():
+            # Players with no games get NaN rows
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return numpy.nanpercentile(values, q, axis=1).T
+
+    def participation(self, period: int = 7) -> numpy.ndarray:
+        '''Fraction of games played per player per period of game numbers, shape (players, periods)'''
+        players, games = self.scores.shape
+        periods = -(-games // period)
+        padded = numpy.zeros((players, periods * period), dtype=bool)
+        padded[:, :games] = self.played
+        return padded.reshape(players, periods, period).mean(axis=2)
+
+    def rankings(self, minimumGames: int = 1) -> list:
+        '''All-time ranking: lowest mean score first, more games played breaking ties.
+
+        Returns (memberId, mean, played, winRate) tuples for players with at least minimumGames.
+        '''
+        counts = self.played.sum(axis=1)
+        wins = ((self.scores != MISSING) & (self.scores != FAILED)).sum(axis=1)
+        means = self.means()
+        eligible = numpy.flatnonzero(counts >= max(1, minimumGames))
+        order = eligible[numpy.lexsort((-counts[eligible], means[eligible]))]
+        return [(self.memberIds[row], float(means[row]), int(counts[row]), float(wins[row] / counts[row])) for row in order]
+
+
+def format_rankings(rankings: list, names: dict, limit: int = 10) -> str:
+    if not rankings:
+        return 'No games have been recorded yet.'
+    lines = ['**ALL-TIME RANKINGS:**']
+    for place, (memberId, mean, played, winRate) in enumerate(rankings[:limit], start=1):
+        lines.append(f'{place}. {names.get(memberId, memberId)} - {mean:.2f} mean over {played} games, {winRate:.0%} won')
+    return '\n'.join(lines)
+
+
+def format_head_to_head(matrix: GameMatrix, wins: numpy.ndarray, first: int, second: int, names: dict) -> str:
+    firstName, secondName = names.get(first, first), names.get(second, second)
+    if first not in matrix.rows or second not in matrix.rows:
+        return f'{firstName} and {secondName} have no games in common.'
+    i, j = matrix.rows[first], matrix.rows[second]
+    common = int((matrix.played[i] & matrix.played[j]).sum())
+    if common == 0:
+        return f'{firstName} and {secondName} have no games in common.'
+    won, lost = int(wins[i, j]), int(wins[j, i])
+    return f'**{firstName}** vs **{secondName}** over {common} games: {won} wins, {lost} losses, {common - won - lost} ties'
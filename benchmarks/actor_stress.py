@@ -0,0 +1,283 @@
+'''Stress test for WordleTracker.py's actor: its real handlers fired interleaved against fake_gateway.
+
+Each run plays several days. Within a day every player sends their result,
+some twice in quick succession, some send a spoiler screenshot, and
+registrations (first ones early in the day and sometimes double clicked,
+repeats at any time) and the day's reset_call land at random times in
+between, all concurrently. Scoring runs as soon as the reset
+schedules it. After every day the run checks:
+  - no double registration: each player is registered once and sits in
+    exactly one timezone bucket, and the tracker's players are the bucket's
+  - each result counted once: a player's accepted result replies match
+    their records in history, and each game has at most one scoreboard
+  - the leaderboard matches the players: today's leaderboard holds exactly
+    the players with a result today, and the day's scoreboard lists exactly
+    the registered players with a result yesterday
+
+Each seed runs in its own process in a fresh temporary directory, since
+WordleTracker.py reads and writes its state files in the working directory.
+bot.py's handle_message and scoring_call are still TODO, so it is not driven
+here.
+
+Run from the repository root: python benchmarks/actor_stress.py [--players N] [--days D] [--seeds S] ...
+'''
+
+import io
+import os
+import re
+import sys
+import json
+import random
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from functools import partial
+from collections import Counter
+from datetime import datetime, timedelta
+from time import perf_counter
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+from fake_gateway import FakeAPI, FakeAttachment, FakeChannel, FakeGuild, FakeInteraction, FakeMessage, FakeResponse, FakeUser  # noqa: E402
+from loadtest import GAME_NUMBER, make_assets, move_reset, read_assets, result_text  # noqa: E402
+
+REGISTERED = 'You have been registered for Wordle tracking.'
+ACCEPTED = re.compile(r'^(\S+) (?:guessed the word in|did not guess the word)')
+SCOREBOARD = re.compile(r'^WORDLE #(\d+) COMPLETE!')
+SCORED = re.compile(r'^(?:\d+\. )?(\S+) \(')
+# Seconds within which a player's repeated clicks or sends arrive
+BURST = 0.05
+
+
+class RecordingChannel(FakeChannel):
+    '''A channel that keeps the text of everything sent to it'''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = []
+
+    async def send(self, content: str = None, files=None, **kwargs) -> None:
+        self.sent.append(content or '')
+        await super().send(content, files=files, **kwargs)
+
+
+class RecordingResponse(FakeResponse):
+    def __init__(self, api: FakeAPI, responses: list):
+        super().__init__(api)
+        self.responses = responses
+
+    async def send_message(self, content: str = None, **kwargs) -> None:
+        self.responses.append(content or '')
+        await super().send_message(content, **kwargs)
+
+
+def last_scoreboard(sent: list) -> list:
+    '''The lines of the last scoreboard, which may span several messages before its screenshot captions'''
+    starts = [index for index, content in enumerate(sent) if SCOREBOARD.match(content)]
+    if not starts:
+        return []
+    lines = sent[starts[-1]].splitlines()[1:]
+    for content in sent[starts[-1] + 1:]:
+        if content.startswith('__'):
+            break
+        if all(SCORED.match(line) for line in content.splitlines()):
+            lines += content.splitlines()
+    return lines
+
+
+def violations(bot, users: list, channel: RecordingChannel, responses: dict) -> list:
+    '''Returns a description of every broken invariant'''
+    from data import DayResult
+    client = bot.client
+    found = []
+
+    # No double registration
+    for user in users:
+        registered = responses[user.id].count(REGISTERED)
+        if registered > 1:
+            found.append(f'{user.name} was registered {registered} times')
+    players = {id(player): player for player in client.players}
+    bucketed = Counter(id(player) for bucket in client.buckets for player in bucket.players)
+    for key, count in bucketed.items():
+        if count > 1:
+            found.append(f'a player sits in {count} timezone buckets')
+        elif key not in players:
+            found.append('a timezone bucket holds a player the tracker no longer has')
+    for key, player in players.items():
+        if key not in bucketed:
+            found.append(f'{player.name} is in no timezone bucket')
+
+    # Each result counted once
+    accepted = Counter()
+    scoreboards = Counter()
+    for content in channel.sent:
+        match = ACCEPTED.match(content)
+        if match is not None:
+            accepted[match.group(1)] += 1
+        match = SCOREBOARD.match(content)
+        if match is not None:
+            scoreboards[int(match.group(1))] += 1
+    recorded = Counter()
+    games = set()
+    for record in client.history.records(channel.guild.id):
+        recorded[record.memberId] += 1
+        games.add((record.memberId, record.gameNumber))
+    for user in users:
+        if accepted[user.name] != recorded[user.id]:
+            found.append(f'{user.name} had {accepted[user.name]} results accepted and {recorded[user.id]} recorded')
+    if len(games) != sum(recorded.values()):
+        found.append('history holds a repeated game')
+    for gameNumber, count in scoreboards.items():
+        if count > 1:
+            found.append(f'Wordle #{gameNumber} was scored {count} times')
+
+    # The leaderboard matches the players
+    board = client.leaderboards.get(client.game_number)
+    onBoard = {standing.player.id for standing in board.standings()} if board is not None else set()
+    played = {player.id for player in client.players if player.today != DayResult.NONE}
+    if onBoard != played:
+        found.append(f'Wordle #{client.game_number} leaderboard has {sorted(onBoard ^ played)} wrong')
+    return found
+
+
+async def play(args, seed: int) -> dict:
+    import WordleTracker as bot
+    from data import DayResult
+    bot.load()
+    client = bot.client
+    rng = random.Random(seed)
+    api = FakeAPI(latency=args.latency, jitter=1.0, rateLimitRatio=args.rate_limit,
+                  retryAfter=args.retry_after, seed=seed)
+    users = [FakeUser(api, 10 ** 17 + index) for index in range(args.players)]
+    guild = FakeGuild(api, 1, users)
+    channel = RecordingChannel(api, 10, guild)
+    client.ingestor.stream = api.download
+    client.notifier.backoff = client.publisher.backoff = api.retryAfter
+    client.notifier.start()
+    client.game_number = GAME_NUMBER
+    originals = [FakeAttachment(open(path, 'rb').read()) for path in read_assets(args.assets, '.png')]
+    responses = {user.id: [] for user in users}
+
+    def interaction(user: FakeUser) -> FakeInteraction:
+        interaction = FakeInteraction(user, channel)
+        interaction.response = RecordingResponse(api, responses[user.id])
+        return interaction
+
+    async def at(delay: float, call) -> None:
+        await asyncio.sleep(delay)
+        await call()
+
+    async def register(user: FakeUser) -> None:
+        await bot.register_command.callback(interaction(user))
+
+    async def submit(user: FakeUser) -> None:
+        # Played when sent, so a result sent across a reset is for the old game
+        content = result_text(client.game_number, rng)[0]
+        await bot.on_message(FakeMessage(user, channel, content))
+
+    async def screenshot(user: FakeUser) -> None:
+        await bot.on_message(FakeMessage(user, channel, '', [rng.choice(originals)]))
+
+    async def reset() -> None:
+        # Every player shares the default timezone, so this is the day's only reset
+        for bucket in client.buckets:
+            move_reset(bucket, datetime.now().astimezone() - timedelta(seconds=1), bucket.players)
+            await bot.reset_call(bucket)
+        if bot.scheduler.deadline('score') is not None:
+            # Scoring is due now; run it here rather than starting the whole scheduler
+            bot.scheduler.cancel('score')
+            await bot.scoring_call()
+
+    events = 0
+    found = []
+    start = perf_counter()
+    for day in range(args.days):
+        jobs = []
+        for user in users:
+            if day == 0:
+                # First registrations land before the reset, some double clicked
+                first = rng.uniform(0, args.window / 2)
+                for _ in range(rng.choice((1, 1, 2, 3))):
+                    jobs.append(at(first + rng.uniform(0, BURST), partial(register, user)))
+            for _ in range(rng.choice((0, 0, 1))):
+                jobs.append(at(rng.uniform(0, args.window), partial(register, user)))
+            sent = rng.uniform(0, args.window)
+            for _ in range(rng.choice((1, 1, 2))):
+                jobs.append(at(sent + rng.uniform(0, BURST), partial(submit, user)))
+            if rng.random() < args.screenshots:
+                jobs.append(at(rng.uniform(0, args.window), partial(screenshot, user)))
+        jobs.append(at(rng.uniform(0.6, 1.0) * args.window, reset))
+        events += len(jobs)
+        await asyncio.gather(*jobs)
+        await asyncio.gather(*client.preparing)
+        found += [f'day {day}: {line}' for line in violations(bot, users, channel, responses)]
+        # The day's scoreboard lists exactly the registered players with a result yesterday
+        if day > 0:
+            expected = {player.name for player in client.players if player.registered and player.yesterday != DayResult.NONE}
+            listed = Counter(name for line in last_scoreboard(channel.sent) for name in SCORED.findall(line))
+            if set(listed) != expected or any(count > 1 for count in listed.values()):
+                found.append(f'day {day}: scoreboard lists {sorted(set(listed) ^ expected)} wrong')
+    elapsed = perf_counter() - start
+
+    await client.notifier.stop(timeout=1)
+    await client.saver.flush()
+    client.history.checkpoint()
+    await client.ingestor.close()
+    client.images.close()
+    return {'events': events, 'elapsed': elapsed, 'processed': client.actor.processed,
+            'accepted': sum(1 for content in channel.sent if ACCEPTED.match(content)),
+            'scoreboards': sum(1 for content in channel.sent if SCOREBOARD.match(content)),
+            'violations': found}
+
+
+def child(args) -> None:
+    # WordleTracker.py prints every step; keep that out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(play(args, args.child))
+    sys.stdout.write(json.dumps(result) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Interleaves WordleTracker.py handlers and checks its invariants')
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--seeds', type=int, default=3, help='independent runs, each with its own seed')
+    parser.add_argument('--window', type=float, default=2, help='seconds over which a day\'s events arrive')
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds per API round trip, ±100%%')
+    parser.add_argument('--rate-limit', type=float, default=0.02, help='share of API calls answered with a 429')
+    parser.add_argument('--retry-after', type=float, default=0.05, help='seconds a 429 asks the client to wait')
+    parser.add_argument('--screenshots', type=float, default=0.5, help='share of players who send a screenshot each day')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--assets', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        child(args)
+        return
+
+    print(f'{args.players} players, {args.days} days, {args.window:g} s per day, {args.seeds} seeds')
+    failed = 0
+    with tempfile.TemporaryDirectory() as assets:
+        make_assets(assets)
+        for seed in range(args.seeds):
+            with tempfile.TemporaryDirectory() as directory:
+                process = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:],
+                                          '--child', str(seed), '--assets', assets],
+                                         cwd=directory, capture_output=True, text=True)
+            if process.returncode != 0:
+                print(f'seed {seed} failed:\n{process.stderr[-2000:]}')
+                failed += 1
+                continue
+            result = json.loads(process.stdout.splitlines()[-1])
+            print(f'seed {seed}: {result["events"]} events, {result["processed"]} actor jobs in {result["elapsed"]:.2f}s, '
+                  f'{result["accepted"]} results accepted, {result["scoreboards"]} scoreboards, '
+                  f'{len(result["violations"])} invariant violations')
+            for line in result['violations']:
+                print(f'  {line}')
+            failed += bool(result['violations'])
+    assert not failed, 'a run violated an invariant'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+'''Times analytics.GameMatrix against per-player Python loops on a 200 player, 1500 game guild.
+
+Run from the repository root: python benchmarks/analytics_benchmark.py
+'''
+
+import os
+import sys
+import random
+from time import perf_counter
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import FAILED, GameMatrix  # noqa: E402
+from history import GameRecord  # noqa: E402
+
+PLAYERS = 200
+GAMES = 1500
+
+
+def make_records(seed: int = 1) -> list:
+    rng = random.Random(seed)
+    records = []
+    for memberId in range(PLAYERS):
+        participation = rng.uniform(0.3, 1.0)
+        for gameNumber in range(1, GAMES + 1):
+            if rng.random() < participation:
+                guesses = rng.choice((2, 3, 3, 4, 4, 4, 5, 5, 6, 7))
+                records.append(GameRecord(0, memberId, gameNumber, min(guesses, 6), guesses < 7, False, ''))
+    return records
+
+
+def loop_head_to_head(records: list) -> dict:
+    '''The per-object approach: each player's results in a dict, compared pair by pair'''
+    results = {}
+    for record in records:
+        results.setdefault(record.memberId, {})[record.gameNumber] = record.guesses if record.succeeded else FAILED
+    wins = {}
+    for first, firstResults in results.items():
+        for second, secondResults in results.items():
+            wins[(first, second)] = sum(1 for game, score in firstResults.items()
+                                        if game in secondResults and score < secondResults[game])
+    return wins
+
+
+def timed(function, *args, repeat: int = 1):
+    start = perf_counter()
+    for _ in range(repeat):
+        result = function(*args)
+    return result, (perf_counter() - start) / repeat * 1000
+
+
+def main():
+    records = make_records()
+    print(f'{PLAYERS} players x {GAMES} games, {len(records)} results')
+    matrix, build = timed(GameMatrix.from_records, records)
+    print(f'build matrix        {build:9.1f} ms')
+    wins, vectorized = timed(matrix.head_to_head, repeat=10)
+    print(f'head-to-head numpy  {vectorized:9.1f} ms')
+    for name, function in (('rolling averages', matrix.rolling_averages),
+                           ('percentiles', matrix.percentiles),
+                           ('participation', matrix.participation),
+                           ('rankings', matrix.rankings)):
+        _, elapsed = timed(function, repeat=10)
+        print(f'{name:<19} {elapsed:9.1f} ms')
+    looped, loop = timed(loop_head_to_head, records)
+    print(f'head-to-head loops  {loop:9.1f} ms ({loop / vectorized:.0f}x slower)')
+    expected = numpy.array([[looped[(matrix.memberIds[i], matrix.memberIds[j])] for j in range(PLAYERS)] for i in range(PLAYERS)])
+    assert (expected == wins).all(), 'vectorized head-to-head disagrees with the loops'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+'''In-process stand-ins for the discord.py objects the bots touch, for the load tests.
+
+Every call that would reach Discord goes through FakeAPI, which waits a
+jittered latency, counts the call and its payload bytes per endpoint, and
+answers a rateLimitRatio share of calls with a 429. discord.py retries a 429
+itself after the retry-after delay, so that is what the fake does for most
+endpoints; for the ones in surfaced (DMs and file uploads by default) it
+raises the HTTPException instead, so the Notifier's and ScoreboardPublisher's
+own retry paths run too.
+'''
+
+import asyncio
+import random
+from types import SimpleNamespace
+from collections import Counter
+from datetime import datetime, timezone
+
+from discord import HTTPException
+
+CHUNK_SIZE = 64 * 1024
+
+
+class FakeAPI():
+    def __init__(self,
+                 latency: float = 0.05,
+                 jitter: float = 0.5,
+                 rateLimitRatio: float = 0.0,
+                 retryAfter: float = 1.0,
+                 surfaced=('user.send', 'channel.upload'),
+                 seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rateLimitRatio = rateLimitRatio
+        self.retryAfter = retryAfter
+        self.surfaced = set(surfaced)
+        self.rng = random.Random(seed)
+        self.calls = Counter()
+        self.rateLimited = Counter()
+        self.bytesSent = 0
+
+    async def request(self, endpoint: str, size: int = 0) -> None:
+        '''One round trip to endpoint carrying size payload bytes'''
+        while True:
+            self.calls[endpoint] += 1
+            self.bytesSent += size
+            await asyncio.sleep(self.latency * (1 + self.jitter * (2 * self.rng.random() - 1)))
+            if self.rng.random() >= self.rateLimitRatio:
+                return
+            self.rateLimited[endpoint] += 1
+            if endpoint in self.surfaced:
+                raise HTTPException(SimpleNamespace(status=429, reason='Too Many Requests'), 'You are being rate limited.')
+            await asyncio.sleep(self.retryAfter)
+
+    async def download(self, attachment):
+        '''Stands in for ScreenshotIngestor.stream: the attachment's bytes from the CDN in chunks'''
+        await self.request('cdn.get')
+        for start in range(0, len(attachment.data), CHUNK_SIZE):
+            yield attachment.data[start:start + CHUNK_SIZE]
+            await asyncio.sleep(0)
+
+    def metrics(self) -> dict:
+        return {'calls': dict(self.calls),
+                'rateLimited': dict(self.rateLimited),
+                'bytesSent': self.bytesSent}
+
+
+class FakeUser():
+    '''A user or guild member; only DMs reach the API'''
+    def __init__(self, api: FakeAPI, id: int, name: str = None, bot: bool = False):
+        self.api = api
+        self.id = id
+        self.name = name or f'player{id}'
+        self.display_name = self.name
+        self.bot = bot
+        self.mention = f'<@{id}>'
+
+    def __eq__(self, other) -> bool:
+        return getattr(other, 'id', None) == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    async def send(self, content: str = None, **kwargs) -> None:
+        await self.api.request('user.send', len((content or '').encode('utf-8')))
+
+
+class FakeGuild():
+    '''A guild whose member cache is full or empty, as in the full and light cache modes'''
+    def __init__(self, api: FakeAPI, id: int, members: list = (), cached: bool = True):
+        self.api = api
+        self.id = id
+        self.members = {member.id: member for member in members}
+        self.cached = cached
+        self.filesize_limit = 25 * 1024 * 1024
+
+    def get_member(self, id: int):
+        return self.members.get(id) if self.cached else None
+
+    async def query_members(self, user_ids: list, limit: int, cache: bool) -> list:
+        await self.api.request('guild.query_members')
+        return [self.members[id] for id in user_ids[:limit] if id in self.members]
+
+    async def fetch_member(self, id: int):
+        await self.api.request('guild.fetch_member')
+        return self.members[id]
+
+
+class FakeChannel():
+    def __init__(self, api: FakeAPI, id: int, guild: FakeGuild, name: str = 'wordle'):
+        self.api = api
+        self.id = id
+        self.guild = guild
+        self.name = name
+        self.mention = f'<#{id}>'
+        self.members = list(guild.members.values())
+
+    def __eq__(self, other) -> bool:
+        return getattr(other, 'id', None) == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    async def send(self, content: str = None, files=None, **kwargs) -> None:
+        size = len((content or '').encode('utf-8'))
+        if not files:
+            await self.api.request('channel.send', size)
+            return
+        # Read and close the files as the upload would
+        for file in files:
+            size += len(file.fp.read())
+            file.close()
+        await self.api.request('channel.upload', size)
+
+    async def edit(self, name: str = None, **kwargs) -> None:
+        await self.api.request('channel.edit')
+        if name is not None:
+            self.name = name
+
+
+class FakeAttachment():
+    def __init__(self, data: bytes, filename: str = 'SPOILER_wordle.png', content_type: str = 'image/png'):
+        self.data = data
+        self.filename = filename
+        self.content_type = content_type
+        self.size = len(data)
+        self.url = f'https://cdn.invalid/attachments/{filename}'
+
+    def is_spoiler(self) -> bool:
+        return self.filename.startswith('SPOILER_')
+
+
+class FakeMessage():
+    def __init__(self, author: FakeUser, channel: FakeChannel, content: str = '', attachments: list = ()):
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.attachments = list(attachments)
+        self.created_at = datetime.now(timezone.utc)
+
+    async def delete(self) -> None:
+        await self.channel.api.request('message.delete')
+
+
+class FakeResponse():
+    def __init__(self, api: FakeAPI):
+        self.api = api
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def send_message(self, content: str = None, **kwargs) -> None:
+        await self.api.request('interaction.respond', len((content or '').encode('utf-8')))
+        self.done = True
+
+    async def defer(self, **kwargs) -> None:
+        await self.api.request('interaction.respond')
+        self.done = True
+
+
+class FakeInteraction():
+    def __init__(self, user: FakeUser, channel: FakeChannel):
+        self.user = user
+        self.channel = channel
+        self.guild = channel.guild
+        self.response = FakeResponse(channel.api)
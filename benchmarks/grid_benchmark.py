@@ -0,0 +1,67 @@
+'''Compares saved state with raw emoji grids against packed grid ints, and times grid operations.
+
+Run from the repository root: python benchmarks/grid_benchmark.py
+'''
+
+import os
+import sys
+import json
+import random
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grid import greens_by_row, lucky, pack, render  # noqa: E402
+from parsing import parse_result  # noqa: E402
+
+TILES = ('⬛', '🟨', '🟩')
+
+
+def share_text(rng: random.Random, gameNumber: int) -> str:
+    guesses = rng.randint(1, 6)
+    rows = [''.join(rng.choice(TILES) for _ in range(5)) for _ in range(guesses - 1)] + ['🟩' * 5]
+    return f'Wordle {gameNumber:,} {guesses}/6\n\n' + '\n'.join(rows)
+
+
+def state(players: int, packed: bool, rng: random.Random) -> dict:
+    '''Player entries shaped like the legacy info.json'''
+    data = {}
+    for index in range(players):
+        today, yesterday = share_text(rng, 1235), share_text(rng, 1234)
+        entry = {'id': 10 ** 17 + index, 'winCount': rng.randint(0, 300), 'guesses': 4, 'newGuesses': 3,
+                 'registered': True, 'completedToday': True, 'completedYesterday': True,
+                 'succeededToday': True, 'succeededYesterday': True,
+                 'resetTime': '2026-10-18T00:00:00-04:00', 'timezone': 'US/Eastern', 'sentWarning': False}
+        if packed:
+            entry.update(messageContent='', newMessageContent='',
+                         grid=pack(parse_result(yesterday).rows), newGrid=pack(parse_result(today).rows))
+        else:
+            entry.update(messageContent=yesterday, newMessageContent=today)
+        data[f'player{index}'] = entry
+    return data
+
+
+def main():
+    rng = random.Random(3)
+    print(f'{"players":>8} {"raw KiB":>9} {"packed KiB":>11} {"raw save ms":>12} {"packed save ms":>15}')
+    for players in (100, 1000, 10000):
+        row = []
+        for packed in (False, True):
+            data = state(players, packed, rng)
+            start = perf_counter()
+            text = json.dumps(data)
+            elapsed = (perf_counter() - start) * 1000
+            row.append((len(text.encode('utf-8')) / 1024, elapsed))
+        print(f'{players:>8} {row[0][0]:>9.1f} {row[1][0]:>11.1f} {row[0][1]:>12.2f} {row[1][1]:>15.2f}')
+
+    grids = [pack(parse_result(share_text(rng, 1234)).rows) for _ in range(10000)]
+    for name, function in (('render', render), ('greens_by_row', greens_by_row), ('lucky', lucky)):
+        start = perf_counter()
+        for packed in grids:
+            function(packed)
+        print(f'{name:<14} {(perf_counter() - start) / len(grids) * 1e6:6.2f} us per grid')
+    print(f'lucky solves: {sum(map(lucky, grids))}/{len(grids)}')
+
+
+if __name__ == '__main__':
+    main()
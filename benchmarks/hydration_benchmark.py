@@ -0,0 +1,82 @@
+'''Compares building every tracker at startup against reading only the tracker index, for both storage backends.
+
+Eager mirrors what bot.py used to do at import: read every payload and build
+each tracker's TrackerData and every Player. Lazy reads the index entries
+only, then builds a tracker when it is first used; the last column is the
+cost of that first use for one tracker. Retained memory is measured with
+tracemalloc. Most guilds being dormant is the case lazy hydration is for.
+The journal backend keeps every payload in memory to replay records onto, so
+its lazy column stays close to eager; that is why bot.py defaults to SQLite
+when hydration is lazy.
+
+Run from the repository root: python benchmarks/hydration_benchmark.py [guilds ...]
+'''
+
+import os
+import sys
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import PlayerData, TrackerData  # noqa: E402
+from player import Player  # noqa: E402
+from persistence import JournaledPersistence, SqlitePersistence  # noqa: E402
+from persistence_benchmark import tracker_payload  # noqa: E402
+
+
+def build(trackerData: dict) -> tuple:
+    '''The objects Tracker.from_dict builds, with stand-in members'''
+    players = [Player(member=SimpleNamespace(name=f'member{playerData["memberId"]}', id=playerData['memberId']),
+                      registered=playerData['registered'],
+                      prevData=PlayerData.from_dict(playerData['prevData']),
+                      data=PlayerData.from_dict(playerData['data']))
+               for playerData in trackerData['players']]
+    return TrackerData.from_dict(trackerData['data']), players
+
+
+def measure(function) -> tuple:
+    '''Returns (seconds, bytes retained, result) for one call'''
+    tracemalloc.start()
+    start = perf_counter()
+    result = function()
+    elapsed = perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, size, result
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1000]
+    print(f'{"guilds":>7} {"backend":<8} {"eager s":>8} {"eager MiB":>10} {"lazy s":>8} {"lazy MiB":>9} {"first use ms":>13}')
+    with tempfile.TemporaryDirectory() as directory:
+        for guilds in counts:
+            data = {'trackers': [tracker_payload(guild) for guild in range(1, guilds + 1)]}
+            journalPath = os.path.join(directory, f'journal{guilds}.json')
+            JournaledPersistence(journalPath).write(data)
+            database = SqlitePersistence(os.path.join(directory, f'sqlite{guilds}.db'))
+            database.write(data)
+            database.close()
+            backends = (('journal', lambda: JournaledPersistence(journalPath)),
+                        ('sqlite', lambda: SqlitePersistence(os.path.join(directory, f'sqlite{guilds}.db'))))
+            for name, open_backend in backends:
+                persist = open_backend()
+                eager, eagerSize, _ = measure(lambda: [build(trackerData) for trackerData in persist.read()['trackers']])
+                if name == 'sqlite':
+                    persist.close()
+                persist = open_backend()
+                lazy, lazySize, entries = measure(persist.read_index)
+                textChannelId = entries[len(entries) // 2]['textChannelId']
+                start = perf_counter()
+                build(persist.read_tracker(textChannelId))
+                firstUse = perf_counter() - start
+                if name == 'sqlite':
+                    persist.close()
+                print(f'{guilds:>7} {name:<8} {eager:>8.3f} {eagerSize / 2 ** 20:>10.1f} {lazy:>8.3f} '
+                      f'{lazySize / 2 ** 20:>9.1f} {firstUse * 1000:>13.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+'''Measures screenshot normalization throughput (images/sec) and bytes saved.
+
+Generates phone-sized synthetic Wordle screenshots (board plus keyboard on a
+noisy background, saved as PNG) and runs them through imaging.ImagePipeline.
+
+Run from the repository root: python benchmarks/imaging_benchmark.py [images]
+'''
+
+import os
+import sys
+import asyncio
+import tempfile
+from time import perf_counter
+
+import numpy
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imaging import ImagePipeline, find_board  # noqa: E402
+
+WIDTH, HEIGHT = 1170, 2532
+BACKGROUND = (18, 18, 19)
+COLORS = [(83, 141, 78), (181, 159, 59), (58, 58, 60)]
+
+
+def make_screenshot(path: str, seed: int) -> tuple:
+    '''Writes a synthetic screenshot and returns the boxes around its guess rows and its whole board'''
+    rng = numpy.random.default_rng(seed)
+    pixels = numpy.full((HEIGHT, WIDTH, 3), BACKGROUND, dtype=numpy.uint8)
+    # Sensor-like noise keeps the PNG from compressing unrealistically well
+    pixels += rng.integers(0, 6, size=pixels.shape, dtype=numpy.uint8)
+    image = Image.fromarray(pixels)
+    draw = ImageDraw.Draw(image)
+    tile, gap = 180, 14
+    left, top = (WIDTH - 5 * tile - 4 * gap) // 2, 420
+    guesses = int(rng.integers(2, 7))
+    for row in range(6):
+        for column in range(5):
+            x, y = left + column * (tile + gap), top + row * (tile + gap)
+            if row < guesses:
+                color = COLORS[0] if row == guesses - 1 else COLORS[int(rng.integers(0, 3))]
+                draw.rectangle((x, y, x + tile, y + tile), fill=color)
+            else:
+                draw.rectangle((x, y, x + tile, y + tile), outline=(58, 58, 60), width=4)
+    key, keyGap = 98, 12
+    for row, count in enumerate((10, 9, 7)):
+        start = (WIDTH - count * key - (count - 1) * keyGap) // 2
+        for column in range(count):
+            x, y = start + column * (key + keyGap), 1900 + row * (key * 1.4 + keyGap)
+            draw.rectangle((x, y, x + key, y + key * 1.4), fill=COLORS[int(rng.integers(0, 3))])
+    image.save(path, format='PNG')
+    right = left + 5 * tile + 4 * gap
+    return (left, top, right, top + guesses * (tile + gap) - gap), (left, top, right, top + 6 * (tile + gap) - gap)
+
+
+async def run(paths: list, outDirectory: str, workers: int) -> tuple:
+    pipeline = ImagePipeline(workers=workers)
+    start = perf_counter()
+    await asyncio.gather(*(pipeline.normalize(path, os.path.join(outDirectory, f'{workers}-{i}.webp'))
+                           for i, path in enumerate(paths)))
+    elapsed = perf_counter() - start
+    pipeline.close()
+    return elapsed, pipeline.metrics()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        misses = 0
+        for i in range(count):
+            path = os.path.join(directory, f'{i}.png')
+            guessed, board = make_screenshot(path, i)
+            with Image.open(path) as image:
+                box = find_board(image.convert('RGB'))
+            # The crop must hold every guess row and stay within the board, give or take a margin
+            if (box is None
+                    or box[0] > guessed[0] or box[1] > guessed[1] or box[2] < guessed[2] or box[3] < guessed[3]
+                    or box[0] < board[0] - 60 or box[1] < board[1] - 60 or box[2] > board[2] + 60 or box[3] > board[3] + 60):
+                misses += 1
+            paths.append(path)
+        print(f'board cropped correctly in {count - misses}/{count} screenshots')
+        print(f'{"workers":>8} {"images/sec":>11} {"MiB in":>8} {"MiB out":>8} {"saved":>7}')
+        for workers in sorted({1, 2, os.cpu_count() or 1}):
+            elapsed, metrics = asyncio.run(run(paths, directory, workers))
+            saved = 1 - metrics['bytesOut'] / metrics['bytesIn']
+            print(f'{workers:>8} {count / elapsed:>11.1f} {metrics["bytesIn"] / 2**20:>8.1f} '
+                  f'{metrics["bytesOut"] / 2**20:>8.2f} {saved:>7.1%}')
+
+
+if __name__ == '__main__':
+    main()
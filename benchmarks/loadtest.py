@@ -0,0 +1,373 @@
+'''Offline load tests driving WordleTracker.py's client and bot.py's client against fake_gateway.
+
+Each target and scenario runs in its own process in a fresh temporary
+directory, since both bots build their client and read their state files from
+the working directory at import. Scenarios:
+
+  submit      N players send their results, and a spoiler screenshot, at random times within M seconds
+  scoreboard  the daily scoreboard for N players who all sent a screenshot yesterday
+  day         the warnings and resets of a day for N players spread over six timezones,
+              the hours between timezones compressed to --spacing seconds, then scoring
+
+Reported per run: p50 and p99 latency of the scenario's unit of work (an
+on_message call; the scoring call; one timezone's warning and reset), the
+longest event-loop stall and the total time stalled past STALL_THRESHOLD, API
+calls issued and how many drew a 429, and bytes written to disk (this
+process's write syscalls from /proc/self/io, plus the image workers' output).
+
+bot.py's handle_message and scoring_call are still TODO, so its submit run
+measures routing, lazy hydration and the actor only, and it has no
+scoreboard run.
+
+Run from the repository root: python benchmarks/loadtest.py [--players N] [--window M] [--rate-limit R] ...
+'''
+
+import io
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+import logging
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime, timedelta
+from time import perf_counter
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+from fake_gateway import FakeAPI, FakeAttachment, FakeChannel, FakeGuild, FakeInteraction, FakeMessage, FakeUser  # noqa: E402
+
+TARGETS = ('tracker', 'bot')
+SCENARIOS = ('submit', 'scoreboard', 'day')
+TIMEZONES = ('Asia/Tokyo', 'Europe/London', 'US/Eastern', 'US/Central', 'US/Mountain', 'US/Pacific')
+GAME_NUMBER = 1000
+SCREENSHOTS = 4
+STALL_THRESHOLD = 0.005
+ROWS = ('⬛🟨⬛⬛⬛', '🟨🟩⬛⬛⬛', '⬛🟩🟨🟩⬛', '🟩🟩⬛🟩🟨', '🟩🟩🟩🟩⬛')
+
+
+class LoopMonitor():
+    '''Measures how late a 10 ms sleep wakes up, which is how long something held the event loop'''
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.maxStall = 0.0
+        self.stalled = 0.0
+        self.task = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        self.task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            start = perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = perf_counter() - start - self.interval
+            self.maxStall = max(self.maxStall, lag)
+            if lag > STALL_THRESHOLD:
+                self.stalled += lag
+
+
+def written_bytes() -> int:
+    '''Bytes this process has passed to write syscalls, or 0 where /proc is unavailable'''
+    try:
+        with open('/proc/self/io', 'r') as file:
+            for line in file:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+def result_text(gameNumber: int, rng: random.Random) -> tuple:
+    '''Returns (message content, succeeded, guesses, rows) for a random game'''
+    succeeded = rng.random() < 0.9
+    guesses = rng.randint(1, 6) if succeeded else 6
+    rows = [rng.choice(ROWS) for _ in range(guesses - 1 if succeeded else 6)]
+    if succeeded:
+        rows.append('🟩🟩🟩🟩🟩')
+    return f'Wordle {gameNumber:,} {guesses if succeeded else "X"}/6\n\n' + '\n'.join(rows), succeeded, guesses, rows
+
+
+def make_assets(directory: str) -> None:
+    '''Writes SCREENSHOTS synthetic phone screenshots and their prepared copies'''
+    from imaging import normalize
+    from imaging_benchmark import make_screenshot
+    for index in range(SCREENSHOTS):
+        path = os.path.join(directory, f'{index}.png')
+        make_screenshot(path, index)
+        normalize(path, os.path.join(directory, f'{index}.webp'))
+
+
+def read_assets(directory: str, extension: str) -> list:
+    return [os.path.join(directory, f'{index}{extension}') for index in range(SCREENSHOTS)]
+
+
+async def submit_all(onMessage, timed: list, latencies: list) -> None:
+    '''Delivers each (delay, message) to onMessage at its delay, recording each call's latency'''
+    async def submit(delay: float, message: FakeMessage) -> None:
+        await asyncio.sleep(delay)
+        start = perf_counter()
+        await onMessage(message)
+        latencies.append(perf_counter() - start)
+    await asyncio.gather(*(submit(delay, message) for delay, message in timed))
+
+
+def move_reset(bucket, when: datetime, players) -> None:
+    bucket.resetTime = when
+    for player in players:
+        if hasattr(player, 'data'):
+            player.data.resetTime = when
+        else:
+            player.resetTime = when
+
+
+async def drain(notifier, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(notifier.queue.join(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_tracker(args, scenario: str, api: FakeAPI, monitor: LoopMonitor) -> dict:
+    import WordleTracker as bot
+    from grid import pack
+    from data import DayResult
+    bot.load()
+    client = bot.client
+    rng = random.Random(args.seed)
+    users = [FakeUser(api, 10 ** 17 + index) for index in range(args.players)]
+    guild = FakeGuild(api, 1, users, cached=args.cache_mode == 'full')
+    channel = FakeChannel(api, 10, guild)
+    client.ingestor.stream = api.download
+    client.notifier.backoff = client.publisher.backoff = api.retryAfter
+    client.notifier.start()
+    for user in users:
+        await bot.register_command.callback(FakeInteraction(user, channel))
+    client.game_number = GAME_NUMBER
+    players = [client.players.find(user) for user in users]
+    latencies = []
+
+    if scenario == 'scoreboard':
+        prepared = read_assets(args.assets, '.webp')
+        for index, player in enumerate(players):
+            _, succeeded, guesses, rows = result_text(GAME_NUMBER - 1, rng)
+            player.yesterday = DayResult.SUCCEEDED if succeeded else DayResult.FAILED
+            player.guesses = guesses
+            player.grid = pack(rows)
+            player.imageKey = (guild.id, GAME_NUMBER - 1, player.id)
+            player.filePath = client.screenshots.import_file(player.imageKey, prepared[index % len(prepared)])
+            client.get_leaderboard(GAME_NUMBER - 1).submit(player, succeeded, guesses)
+            client.players.refresh(player)
+    elif scenario == 'day':
+        for index, player in enumerate(players):
+            bot.set_timezone(player, TIMEZONES[index % len(TIMEZONES)])
+            if rng.random() < 0.7:
+                _, succeeded, guesses, rows = result_text(GAME_NUMBER, rng)
+                player.today = DayResult.SUCCEEDED if succeeded else DayResult.FAILED
+                player.newGuesses = guesses
+                player.newGrid = pack(rows)
+                client.get_leaderboard(GAME_NUMBER).submit(player, succeeded, guesses)
+                client.players.refresh(player)
+    await client.saver.flush()
+    await drain(client.notifier, args.timeout)
+    api.calls.clear()
+    api.rateLimited.clear()
+    before = written_bytes()
+    start = perf_counter()
+    monitor.start()
+
+    if scenario == 'submit':
+        originals = [FakeAttachment(open(path, 'rb').read()) for path in read_assets(args.assets, '.png')]
+        timed = []
+        for index, user in enumerate(users):
+            delay = rng.uniform(0, args.window)
+            timed.append((delay, FakeMessage(user, channel, result_text(GAME_NUMBER, rng)[0])))
+            if rng.random() < args.screenshots:
+                timed.append((delay + rng.uniform(0.5, 2), FakeMessage(user, channel, '', [originals[index % len(originals)]])))
+        await submit_all(bot.on_message, timed, latencies)
+        await asyncio.gather(*client.preparing)
+    elif scenario == 'scoreboard':
+        step = perf_counter()
+        await bot.scoring_call()
+        latencies.append(perf_counter() - step)
+    elif scenario == 'day':
+        for name in TIMEZONES:
+            bucket = client.buckets.get(name)
+            step = perf_counter()
+            move_reset(bucket, datetime.now().astimezone() + timedelta(minutes=30), bucket.players)
+            await client.actor.ask(bot.warning_call, bucket)
+            move_reset(bucket, datetime.now().astimezone() - timedelta(seconds=1), bucket.players)
+            await bot.reset_call(bucket)
+            latencies.append(perf_counter() - step)
+            await asyncio.sleep(args.spacing)
+        if bot.scheduler.deadline('score') is not None:
+            # Scoring is due now; run it here rather than starting the whole scheduler
+            bot.scheduler.cancel('score')
+            await bot.scoring_call()
+
+    await drain(client.notifier, args.timeout)
+    await client.saver.flush()
+    client.history.checkpoint()
+    elapsed = perf_counter() - start
+    written = written_bytes() - before + client.images.bytesOut
+    monitor.stop()
+    await client.notifier.stop(timeout=1)
+    await client.ingestor.close()
+    client.images.close()
+    return {'latencies': latencies, 'elapsed': elapsed, 'written': written,
+            'undelivered': client.notifier.queue.qsize(), 'deadLettered': client.notifier.deadLettered}
+
+
+async def run_bot(args, scenario: str, api: FakeAPI, monitor: LoopMonitor) -> dict:
+    if scenario == 'scoreboard':
+        return {'skipped': 'scoring_call is a TODO in bot.py'}
+    import bot
+    bot.console_handler.setLevel(logging.WARNING)
+    client = bot.client
+    rng = random.Random(args.seed)
+    users = [FakeUser(api, 10 ** 17 + index) for index in range(args.players)]
+    guild = FakeGuild(api, 1, users, cached=args.cache_mode == 'full')
+    channel = FakeChannel(api, 10, guild)
+    client.is_ready = lambda: True
+    client.get_guild = {guild.id: guild}.get
+    client.get_channel = {channel.id: channel}.get
+    client.notifier.backoff = api.retryAfter
+    client.notifier.start()
+    await bot.textchannel_command.callback(FakeInteraction(users[0], channel))
+    tracker = client.get_tracker_for_channel(channel)
+    latencies = []
+
+    if scenario == 'submit':
+        # Saved but idle, so the first message hydrates it from the journal
+        client.evict(tracker)
+        await tracker.actor.stop()
+    elif scenario == 'day':
+        for index, player in enumerate(tracker.players):
+            bot.set_timezone(tracker, player, TIMEZONES[index % len(TIMEZONES)])
+            player.data.submitted = rng.random() < 0.7
+        client.save_tracker(tracker)
+    api.calls.clear()
+    api.rateLimited.clear()
+    before = written_bytes()
+    start = perf_counter()
+    monitor.start()
+
+    if scenario == 'submit':
+        timed = [(rng.uniform(0, args.window), FakeMessage(user, channel, result_text(GAME_NUMBER, rng)[0])) for user in users]
+        await submit_all(bot.on_message, timed, latencies)
+    elif scenario == 'day':
+        for name in TIMEZONES:
+            bucket = tracker.buckets.get(name)
+            step = perf_counter()
+            move_reset(bucket, datetime.now().astimezone() + timedelta(minutes=30), bucket.players)
+            await tracker.actor.ask(bot.warning_call, tracker, bucket)
+            move_reset(bucket, datetime.now().astimezone() - timedelta(seconds=1), bucket.players)
+            await tracker.actor.ask(bot.reset_call, tracker, bucket)
+            latencies.append(perf_counter() - step)
+            await asyncio.sleep(args.spacing)
+        key = ('score', channel.id)
+        if client.scheduler.deadline(key) is not None:
+            client.scheduler.cancel(key)
+            await tracker.actor.ask(bot.scoring_call, tracker)
+
+    await drain(client.notifier, args.timeout)
+    bot.persist.close()
+    elapsed = perf_counter() - start
+    written = written_bytes() - before
+    monitor.stop()
+    await client.notifier.stop(timeout=1)
+    return {'latencies': latencies, 'elapsed': elapsed, 'written': written,
+            'undelivered': client.notifier.queue.qsize(), 'deadLettered': client.notifier.deadLettered}
+
+
+async def run_child(args) -> dict:
+    target, scenario = args.child
+    api = FakeAPI(latency=args.latency, jitter=args.jitter, rateLimitRatio=args.rate_limit,
+                  retryAfter=args.retry_after, seed=args.seed)
+    monitor = LoopMonitor()
+    run = run_tracker if target == 'tracker' else run_bot
+    result = await run(args, scenario, api, monitor)
+    if 'skipped' not in result:
+        result.update(maxStall=monitor.maxStall, stalled=monitor.stalled, **api.metrics())
+    return result
+
+
+def child(args) -> None:
+    # Both bots print or log every step; keep that out of the report and off the terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(run_child(args))
+    sys.stdout.write(json.dumps(result) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load tests against a fake Discord gateway')
+    parser.add_argument('--players', type=int, default=100)
+    parser.add_argument('--window', type=float, default=10, help='seconds over which players submit')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per API round trip')
+    parser.add_argument('--jitter', type=float, default=0.5, help='latency varies by up to this fraction')
+    parser.add_argument('--rate-limit', type=float, default=0.02, help='share of API calls answered with a 429')
+    parser.add_argument('--retry-after', type=float, default=0.5, help='seconds a 429 asks the client to wait')
+    parser.add_argument('--screenshots', type=float, default=1.0, help='share of players who send a screenshot')
+    parser.add_argument('--spacing', type=float, default=1.0, help='seconds between timezones in the day scenario')
+    parser.add_argument('--cache-mode', choices=('full', 'light'), default='light',
+                        help='whether the fake guilds answer get_member from a member cache')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds to wait for queued DMs to drain')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--assets', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    print(f'{args.players} players, {args.latency * 1000:.0f} ms ±{args.jitter:.0%} per API call, '
+          f'{args.rate_limit:.0%} of calls rate limited, {args.cache_mode} member cache')
+    print(f'{"target":<8} {"scenario":<11} {"p50 ms":>8} {"p99 ms":>8} {"max stall ms":>13} {"stalled ms":>11} '
+          f'{"API calls":>10} {"429s":>5} {"written KiB":>12} {"total s":>8}')
+    endpoints = []
+    with tempfile.TemporaryDirectory() as assets:
+        make_assets(assets)
+        for target in args.targets:
+            for scenario in args.scenarios:
+                with tempfile.TemporaryDirectory() as directory:
+                    process = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:],
+                                              '--child', target, scenario, '--assets', assets],
+                                             cwd=directory, capture_output=True, text=True,
+                                             env={**os.environ, 'CACHE_MODE': args.cache_mode})
+                if process.returncode != 0:
+                    print(f'{target:<8} {scenario:<11} failed:\n{process.stderr[-2000:]}')
+                    continue
+                result = json.loads(process.stdout.splitlines()[-1])
+                if 'skipped' in result:
+                    print(f'{target:<8} {scenario:<11} skipped: {result["skipped"]}')
+                    continue
+                latencies = result['latencies']
+                print(f'{target:<8} {scenario:<11} {percentile(latencies, 0.5) * 1000:>8.1f} '
+                      f'{percentile(latencies, 0.99) * 1000:>8.1f} {result["maxStall"] * 1000:>13.1f} '
+                      f'{result["stalled"] * 1000:>11.1f} {sum(result["calls"].values()):>10} '
+                      f'{sum(result["rateLimited"].values()):>5} {result["written"] / 1024:>12.1f} {result["elapsed"]:>8.2f}')
+                if result['undelivered'] or result['deadLettered']:
+                    print(f'{"":<20} {result["undelivered"]} DMs undelivered, {result["deadLettered"]} dead-lettered')
+                endpoints.append((target, scenario, result['calls']))
+    print('\nAPI calls by endpoint')
+    for target, scenario, calls in endpoints:
+        print(f'{target:<8} {scenario:<11} ' + ', '.join(f'{endpoint} {count}' for endpoint, count in sorted(calls.items())))
+
+
+if __name__ == '__main__':
+    main()
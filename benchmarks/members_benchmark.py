@@ -0,0 +1,108 @@
+'''Models member caching cost in full mode against the light mode's on-demand MemberCache.
+
+FakeGuild stands in for a discord.py guild: chunking sends the whole member
+list in gateway chunks of 1000, and query_members answers up to 100 ids, each
+after LATENCY seconds. Full mode chunks every guild at startup and keeps every
+member. Light mode keeps none and fetches registered players' members when
+they are first needed, as a tracker hydrating or a round of warnings does,
+with every lookup issued at once so MemberCache can coalesce them.
+
+Run from the repository root: python benchmarks/members_benchmark.py [server size ...]
+'''
+
+import os
+import sys
+import asyncio
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from users import MemberCache  # noqa: E402
+
+LATENCY = 0.02
+CHUNK_SIZE = 1000
+REGISTERED = 300
+
+
+class FakeMember():
+    def __init__(self, id: int):
+        self.id = id
+        self.name = f'member{id}'
+        self.nick = None
+        self.roles = [1, 2, 3]
+        self.joined_at = None
+        self.activities = ()
+
+
+class FakeGuild():
+    def __init__(self, id: int, size: int):
+        self.id = id
+        self.size = size
+        self.requests = 0
+
+    def get_member(self, id: int):
+        return None
+
+    async def chunk(self) -> list:
+        members = []
+        for start in range(0, self.size, CHUNK_SIZE):
+            self.requests += 1
+            await asyncio.sleep(LATENCY)
+            members.extend(FakeMember(id) for id in range(start, min(start + CHUNK_SIZE, self.size)))
+        return members
+
+    async def query_members(self, user_ids: list, limit: int, cache: bool) -> list:
+        self.requests += 1
+        await asyncio.sleep(LATENCY)
+        return [FakeMember(id) for id in user_ids[:limit] if id < self.size]
+
+    async def fetch_member(self, id: int):
+        self.requests += 1
+        await asyncio.sleep(LATENCY)
+        return FakeMember(id)
+
+
+async def full(size: int) -> tuple:
+    guild = FakeGuild(1, size)
+    tracemalloc.start()
+    start = perf_counter()
+    members = {member.id: member for member in await guild.chunk()}
+    elapsed = perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(members) == size
+    return elapsed, retained, guild.requests
+
+
+async def light(size: int, registered: int, coalesce: bool = True) -> tuple:
+    guild = FakeGuild(1, size)
+    cache = MemberCache()
+    ids = range(0, size, max(1, size // registered))
+    tracemalloc.start()
+    start = perf_counter()
+    if coalesce:
+        found = await cache.fetch_many(guild, ids)
+    else:
+        found = {id: await guild.fetch_member(id) for id in ids}
+    elapsed = perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(found) == len(ids)
+    return elapsed, retained, guild.requests
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    print(f'{REGISTERED} registered players, {LATENCY * 1000:.0f} ms per gateway or API round trip')
+    print(f'{"server":>8} {"mode":<18} {"startup s":>10} {"KiB":>9} {"requests":>9}')
+    for size in sizes:
+        for name, run in (('full (chunked)', full(size)),
+                          ('light, one by one', light(size, REGISTERED, coalesce=False)),
+                          ('light, coalesced', light(size, REGISTERED))):
+            elapsed, retained, requests = asyncio.run(run)
+            print(f'{size:>8} {name:<18} {elapsed:>10.2f} {retained / 1024:>9.0f} {requests:>9}')
+
+
+if __name__ == '__main__':
+    main()
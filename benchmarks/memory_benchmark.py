@@ -0,0 +1,141 @@
+'''Compares memory and attribute access for the old dict-backed player against the slotted data model.
+
+LegacyPlayer below is the WordleTracker player as it was before data.PlayerState:
+a plain class with an instance dict and four boolean flags. Sizes are measured
+with tracemalloc, so they count only what building the players allocates.
+
+Run from the repository root: python benchmarks/memory_benchmark.py [players ...]
+'''
+
+import os
+import sys
+import gc
+import random
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import DayResult, PlayerData, PlayerState  # noqa: E402
+
+TIMEZONES = ('US/Eastern', 'US/Central', 'US/Mountain', 'US/Pacific', 'Europe/London', 'Asia/Tokyo')
+RESET_TIME = datetime.fromisoformat('2026-10-18T00:00:00-04:00')
+
+
+class LegacyPlayer():
+    def __init__(self, name, id=None):
+        self.name = name
+        self.id = id
+        self.guesses = 0
+        self.newGuesses = 0
+        self.winCount = 0
+        self.registered = True
+        self.completedToday = False
+        self.completedYesterday = False
+        self.succeededToday = False
+        self.succeededYesterday = False
+        self.filePath = ''
+        self.newFilePath = ''
+        self.imageKey = None
+        self.newImageKey = None
+        self.messageContent = ''
+        self.newMessageContent = ''
+        self.grid = 0
+        self.newGrid = 0
+        self.timezone = 'US/Eastern'
+        self.resetTime = RESET_TIME
+        self.sentWarning = False
+
+
+def build_legacy(count: int, rng: random.Random) -> list:
+    players = []
+    for index in range(count):
+        player = LegacyPlayer(f'player{index}', 10 ** 17 + index)
+        player.winCount = rng.randint(0, 300)
+        player.completedYesterday = player.succeededYesterday = True
+        # Read back from JSON, so every player holds its own copy of the string
+        player.timezone = ''.join(rng.choice(TIMEZONES))
+        players.append(player)
+    return players
+
+
+def build_slotted(count: int, rng: random.Random) -> list:
+    players = []
+    for index in range(count):
+        player = PlayerState(f'player{index}', 10 ** 17 + index, RESET_TIME)
+        player.winCount = rng.randint(0, 300)
+        player.yesterday = DayResult.SUCCEEDED
+        player.timezone = sys.intern(''.join(rng.choice(TIMEZONES)))
+        players.append(player)
+    return players
+
+
+def build_player_data(count: int, rng: random.Random) -> list:
+    return [PlayerData(submitted=True, guesses=rng.randint(1, 6), resetTime=RESET_TIME) for _ in range(count)]
+
+
+def measure(build, count: int) -> tuple:
+    '''Returns (bytes allocated, seconds to build) for count players'''
+    gc.collect()
+    tracemalloc.start()
+    start = perf_counter()
+    players = build(count, random.Random(5))
+    elapsed = perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del players
+    return size, elapsed
+
+
+def access_legacy(players: list) -> float:
+    '''Seconds per player for a scoring pass's reads and a reset's writes'''
+    start = perf_counter()
+    total = 0
+    for player in players:
+        if player.registered and player.completedYesterday:
+            total += player.winCount + player.guesses
+        player.sentWarning = False
+    return (perf_counter() - start) / len(players)
+
+
+def access_slotted(players: list) -> float:
+    '''The same pass reading the DayResult directly, as the scoring loops do'''
+    start = perf_counter()
+    total = 0
+    for player in players:
+        if player.registered and player.yesterday:
+            total += player.winCount + player.guesses
+        player.sentWarning = False
+    return (perf_counter() - start) / len(players)
+
+
+def access_property(players: list) -> float:
+    '''The same pass through the completedYesterday compatibility property'''
+    start = perf_counter()
+    total = 0
+    for player in players:
+        if player.registered and player.completedYesterday:
+            total += player.winCount + player.guesses
+        player.sentWarning = False
+    return (perf_counter() - start) / len(players)
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    print(f'{"players":>8} {"model":<12} {"MiB":>8} {"bytes/player":>13} {"build s":>8}')
+    for count in counts:
+        for name, build in (('legacy dict', build_legacy), ('PlayerState', build_slotted), ('PlayerData', build_player_data)):
+            size, elapsed = measure(build, count)
+            print(f'{count:>8} {name:<12} {size / 2 ** 20:>8.1f} {size / count:>13.0f} {elapsed:>8.2f}')
+    count = counts[0]
+    legacy, slotted = build_legacy(count, random.Random(5)), build_slotted(count, random.Random(5))
+    for name, function, players in (('legacy dict', access_legacy, legacy),
+                                    ('PlayerState', access_slotted, slotted),
+                                    ('via property', access_property, slotted)):
+        best = min(function(players) for _ in range(5))
+        print(f'{name:<12} {best * 1e9:6.0f} ns per player per scoring pass')
+
+
+if __name__ == '__main__':
+    main()
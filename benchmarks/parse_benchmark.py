@@ -0,0 +1,76 @@
+'''Checks parsing.parse_result against a corpus of share formats and times it per message.
+
+Run from the repository root: python benchmarks/parse_benchmark.py
+'''
+
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsing import ParseError, parse_result  # noqa: E402
+
+ITERATIONS = 20000
+
+# (message, expected (gameNumber, guesses, succeeded, hardMode, row count), ParseError, or None)
+CORPUS = [
+    ('Wordle 1,234 4/6\n\n⬛🟨⬛⬛⬛\n⬛⬛🟩🟨⬛\n🟩🟩🟩⬛⬛\n🟩🟩🟩🟩🟩', (1234, 4, True, False, 4)),
+    ('Wordle 1,234 3/6*\n\n⬛🟨⬛⬛⬛\n⬛🟩🟩🟨⬛\n🟩🟩🟩🟩🟩', (1234, 3, True, True, 3)),
+    ('Wordle 1,234 X/6\n\n⬛🟨⬛⬛⬛\n⬛⬛🟩🟨⬛\n🟩🟩🟩⬛⬛\n🟩🟩🟩⬛⬛\n🟩🟩🟩⬛🟩\n🟩🟩🟩⬛🟩', (1234, 6, False, False, 6)),
+    ('Wordle 987 2/6\n\n⬜🟨⬜⬜⬜\n🟩🟩🟩🟩🟩', (987, 2, True, False, 2)),
+    ('Wordle 1,234 🎉 1/6\n\n🟩🟩🟩🟩🟩', (1234, 1, True, False, 1)),
+    ('Wordle 1.234 3/6\n\n🟦⬛⬛⬛🟧\n🟧🟧🟦⬛🟧\n🟧🟧🟧🟧🟧', (1234, 3, True, False, 3)),
+    ('Wordle 1 234 5/6*\n\n⬛️⬛️🟨⬛️⬛️\n⬛️🟨⬛️⬛️⬛️\n⬛️⬛️⬛️🟩⬛️\n🟩🟩⬛️🟩🟩\n🟩🟩🟩🟩🟩', (1234, 5, True, True, 5)),
+    ('Wordle (ES) #1.234 3/6\n\n⬜⬜🟨⬜⬜\n🟨🟩⬜⬜⬜\n🟩🟩🟩🟩🟩', (1234, 3, True, False, 3)),
+    ('my results\nWordle 1,234 2/6\n\n🟨⬛⬛⬛⬛\n🟩🟩🟩🟩🟩\nnice', (1234, 2, True, False, 2)),
+    ('Wordle 1,234 2/6\n\n⬛⬛⬛⬛⬛\n🟩🟩🟩🟩🟩\n🟩🟩🟩🟩🟩', ParseError),
+    ('Wordle 1,234 3/6\n\n⬛⬛⬛⬛⬛\n🟩🟩🟩🟩⬛\n🟩🟩🟩⬛🟩', ParseError),
+    ('Wordle 1,234 X/6\n\n🟩🟩🟩🟩🟩', ParseError),
+    ('Wordle 1,234 1/6\n🟩🟩🟩🟩🟩\nWordle 1,235 1/6\n🟩🟩🟩🟩🟩', ParseError),
+    ('anyone done today\'s Wordle yet?', None),
+    ('lunch at 12/6?', None),
+]
+
+
+def legacy_parse(content: str):
+    parseGuesses = content.split('/')
+    parseGuesses[0] = parseGuesses[0].replace(' 🎉', '').replace(',', '')
+    parseGuesses = parseGuesses[0].split(' ', -1)
+    return int(parseGuesses[1]), parseGuesses[2]
+
+
+def check_corpus() -> None:
+    for message, expected in CORPUS:
+        try:
+            result = parse_result(message)
+        except ParseError as e:
+            assert expected is ParseError, f'{message!r} raised {e}'
+            continue
+        if expected is None:
+            assert result is None, f'{message!r} parsed as {result}'
+            continue
+        assert expected is not ParseError, f'{message!r} should not parse, got {result}'
+        actual = (result.gameNumber, result.guesses, result.succeeded, result.hardMode, len(result.rows))
+        assert actual == expected, f'{message!r}: {actual} != {expected}'
+    print(f'{len(CORPUS)} corpus messages OK')
+
+
+def time_us(fn, message: str) -> float:
+    start = perf_counter()
+    for _ in range(ITERATIONS):
+        fn(message)
+    return (perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    check_corpus()
+    result = CORPUS[0][0]
+    chatter = 'has anyone seen the new episode yet? spoilers please'
+    print(f'parse_result, result message: {time_us(parse_result, result):.2f} us')
+    print(f'parse_result, ordinary chat:  {time_us(parse_result, chatter):.2f} us')
+    print(f'legacy split/replace parse:   {time_us(legacy_parse, result):.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+'''Compares a full-file save against a journal append and an SQLite row update as the number of guilds grows.
+
+The journal is read first, as bot.py does at startup, so each append also
+updates the in-memory image the journal keeps. A second table grows the
+players per guild instead, saving the guild's last player each time.
+
+Run from the repository root: python benchmarks/persistence_benchmark.py
+'''
+
+import os
+import sys
+import tempfile
+from statistics import median
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import Persistence, JournaledPersistence, SqlitePersistence  # noqa: E402
+
+PLAYERS_PER_GUILD = 30
+SAMPLES = 50
+
+
+def player_payload(memberId: int) -> dict:
+    day = {"submitted": True, "guesses": 4, "imagePath": "", "msgContent": "Wordle 1,000 4/6\n" + "🟩🟨⬛⬛⬛\n" * 4,
+           "resetTime": "2026-01-01T00:00:00-05:00", "warningSent": False}
+    return {"memberId": memberId, "registered": True, "prevData": day, "data": day}
+
+
+def tracker_payload(guildId: int, players: int = PLAYERS_PER_GUILD) -> dict:
+    letters = {"gameNumber": 1000, "savedLettersCount": 6, "letter": "A", "savedLetters": ["A"], "scored": False}
+    return {"guildId": guildId, "textChannelId": guildId * 10, "usingRandomLetter": False,
+            "players": [player_payload(guildId * 100000 + i) for i in range(players)],
+            "prevData": letters, "data": letters}
+
+
+def time_ms(fn, samples: int = SAMPLES) -> float:
+    times = []
+    for _ in range(samples):
+        start = perf_counter()
+        fn()
+        times.append((perf_counter() - start) * 1000)
+    return median(times)
+
+
+def main():
+    print(f"{'guilds':>8} {'full write ms':>14} {'append ms':>10} {'sqlite ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for guilds in (10, 100, 1000):
+            data = {"trackers": [tracker_payload(g) for g in range(1, guilds + 1)]}
+            full = Persistence(os.path.join(tmp, f"full{guilds}.json"))
+            journal = JournaledPersistence(os.path.join(tmp, f"journal{guilds}.json"), compact_every=10**9)
+            journal.write(data)
+            journal.read()
+            change = player_payload(100000)
+            full_ms = time_ms(lambda: full.write(data), samples=5 if guilds >= 1000 else SAMPLES)
+            append_ms = time_ms(lambda: journal.save_player(10, change))
+            journal.close()
+            database = SqlitePersistence(os.path.join(tmp, f"sqlite{guilds}.db"))
+            database.write(data)
+            sqlite_ms = time_ms(lambda: database.save_player(10, change).result())
+            database.close()
+            print(f"{guilds:>8} {full_ms:>14.3f} {append_ms:>10.4f} {sqlite_ms:>10.4f}")
+
+        print(f"\n{'players':>8} {'append ms':>10} {'sqlite ms':>10}  (10 guilds)")
+        for players in (30, 500, 5000):
+            data = {"trackers": [tracker_payload(g, players) for g in range(1, 11)]}
+            journal = JournaledPersistence(os.path.join(tmp, f"players{players}.json"), compact_every=10**9)
+            journal.write(data)
+            journal.read()
+            change = player_payload(100000 + players - 1)
+            append_ms = time_ms(lambda: journal.save_player(10, change))
+            journal.close()
+            database = SqlitePersistence(os.path.join(tmp, f"players{players}.db"))
+            database.write(data)
+            sqlite_ms = time_ms(lambda: database.save_player(10, change).result())
+            database.close()
+            print(f"{players:>8} {append_ms:>10.4f} {sqlite_ms:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+'''Times the batched rating recompute over years of history, against applying games one by one.
+
+Run from the repository root: python benchmarks/rating_benchmark.py
+'''
+
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import FAILED, GameMatrix  # noqa: E402
+from rating import Ratings  # noqa: E402
+from analytics_benchmark import make_records  # noqa: E402
+
+
+def incremental(records: list) -> Ratings:
+    '''The tally path: one Ratings.update per game'''
+    games = {}
+    for record in records:
+        games.setdefault(record.gameNumber, []).append((record.memberId, record.guesses if record.succeeded else FAILED))
+    ratings = Ratings()
+    for gameNumber in sorted(games):
+        ratings.update(gameNumber, games[gameNumber])
+    return ratings
+
+
+def main():
+    records = make_records()
+    games = len({record.gameNumber for record in records})
+    print(f'{len({record.memberId for record in records})} players, {games} games ({games / 365:.1f} years), {len(records)} results')
+
+    start = perf_counter()
+    matrix = GameMatrix.from_records(records)
+    built = perf_counter()
+    batched = Ratings.recompute(matrix)
+    done = perf_counter()
+    print(f'build matrix        {(built - start) * 1000:9.1f} ms')
+    print(f'batched recompute   {(done - built) * 1000:9.1f} ms')
+
+    start = perf_counter()
+    stepped = incremental(records)
+    elapsed = perf_counter() - start
+    print(f'game-by-game update {elapsed * 1000:9.1f} ms')
+
+    worst = max(abs(batched.get(memberId) - stepped.get(memberId)) for memberId in batched.ratings)
+    assert worst < 1e-6, f'batched and incremental ratings differ by {worst}'
+    top = sorted(batched.ratings.items(), key=lambda item: -item[1])[:3]
+    print('top ratings: ' + ', '.join(f'{memberId}: {rating:.0f}' for memberId, rating in top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+'''Compares startup load time of the legacy info.json against the binary snapshot.
+
+legacy_load below is WordleTrackerClient.read_json_file as it was before the
+snapshot: json.load, an if/elif ladder over the top-level keys, try/except
+around most player fields and a multi-line log per player (written to a
+discarded buffer here, so terminal speed does not count). The snapshot rows
+also do a round trip check against the JSON they were migrated from.
+
+Run from the repository root: python benchmarks/snapshot_benchmark.py [players ...]
+'''
+
+import io
+import os
+import sys
+import json
+import random
+import tempfile
+import contextlib
+from datetime import datetime
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import DayResult, PlayerState  # noqa: E402
+from grid import pack  # noqa: E402
+from snapshot import SnapshotPersistence, capture, decode, encode, migrate_json  # noqa: E402
+from timezones import DEFAULT_TIMEZONE, next_midnight  # noqa: E402
+
+TIMEZONES = ('US/Eastern', 'US/Central', 'US/Pacific', 'Europe/London', 'Asia/Tokyo')
+
+
+def legacy_json(players: int, rng: random.Random) -> dict:
+    data = {'text_channel': {'text_channel': 987654321},
+            'game_number': {'game_number': 1235},
+            'scored_today': {'scored_today': False},
+            'random_letter': {'random_letter': True},
+            'current_letter': {'current_letter': 'Q'},
+            'last_letters': {str(place): letter for place, letter in enumerate('KBCDZF')}}
+    for index in range(players):
+        timezone = rng.choice(TIMEZONES)
+        completed = rng.random() < 0.7
+        data[f'player{index}'] = {'id': 10 ** 17 + index if rng.random() < 0.9 else None,
+                                  'winCount': rng.randint(0, 300),
+                                  'guesses': rng.randint(1, 6),
+                                  'newGuesses': rng.randint(0, 6),
+                                  'registered': rng.random() < 0.95,
+                                  'completedToday': completed,
+                                  'completedYesterday': True,
+                                  'succeededToday': completed and rng.random() < 0.9,
+                                  'succeededYesterday': True,
+                                  'messageContent': '',
+                                  'newMessageContent': '',
+                                  'grid': pack(['🟨⬛⬛🟩⬛', '🟩🟩🟩🟩🟩']),
+                                  'newGrid': 0,
+                                  'resetTime': next_midnight(timezone).isoformat(),
+                                  'timezone': timezone,
+                                  'sentWarning': False,
+                                  'imageKey': [0, 1234, 10 ** 17 + index] if rng.random() < 0.5 else None,
+                                  'newImageKey': None}
+    return data
+
+
+def legacy_load(path: str) -> list:
+    players = []
+    last_letters = []
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    for firstField, secondField in data.items():
+        if firstField == 'text_channel':
+            int(secondField['text_channel'])
+        elif firstField == 'game_number':
+            int(secondField['game_number'])
+        elif firstField in ('scored_today', 'random_letter', 'current_letter', 'rated_game'):
+            secondField[firstField]
+        elif firstField == 'last_letters':
+            last_letters.clear()
+            for place in range(6):
+                last_letters.append(secondField[str(place)])
+        else:
+            load_player = PlayerState(firstField, secondField.get('id'))
+            load_player.winCount = secondField['winCount']
+            load_player.guesses = secondField['guesses']
+            try:
+                load_player.newGuesses = secondField['newGuesses']
+            except Exception:
+                load_player.newGuesses = 0
+            load_player.registered = secondField['registered']
+            load_player.today = DayResult.of(secondField['completedToday'], secondField['succeededToday'])
+            load_player.yesterday = DayResult.of(secondField.get('completedYesterday', load_player.completedToday),
+                                                 secondField.get('succeededYesterday', load_player.succeededToday))
+            try:
+                load_player.messageContent = secondField['messageContent']
+            except Exception:
+                load_player.messageContent = ''
+            try:
+                load_player.newMessageContent = secondField['newMessageContent']
+            except Exception:
+                load_player.newMessageContent = load_player.messageContent
+            load_player.grid = secondField.get('grid', 0)
+            load_player.newGrid = secondField.get('newGrid', 0)
+            try:
+                load_player.resetTime = datetime.fromisoformat(secondField['resetTime'])
+            except Exception:
+                load_player.resetTime = next_midnight(DEFAULT_TIMEZONE)
+            try:
+                load_player.timezone = sys.intern(secondField['timezone'])
+            except Exception:
+                pass
+            try:
+                load_player.sentWarning = secondField['sentWarning']
+            except Exception:
+                pass
+            load_player.imageKey = secondField.get('imageKey')
+            load_player.newImageKey = secondField.get('newImageKey')
+            players.append(load_player)
+            print(f'Loaded player {load_player.name}\n'
+                  f'\twins: {load_player.winCount}\n'
+                  f'\tguesses: {load_player.guesses}\n'
+                  f'\tnew guesses: {load_player.newGuesses}\n'
+                  f'\tregistered: {load_player.registered}\n'
+                  f'\tcompleted today: {load_player.completedToday}\n'
+                  f'\tcompleted yesterday: {load_player.completedYesterday}\n'
+                  f'\tsucceeded today: {load_player.succeededToday}\n'
+                  f'\tsucceeded yesterday: {load_player.succeededYesterday}\n'
+                  f'\tmessage content: {load_player.messageContent}\n'
+                  f'\tnew message content: {load_player.newMessageContent}\n'
+                  f'\treset time: {load_player.resetTime.strftime("%d/%m %H:%M")}\n'
+                  f'\tsent warning: {load_player.sentWarning}')
+    return players
+
+
+def best(function, repeats: int = 3) -> tuple:
+    '''Returns (fastest seconds, last result) over repeats calls'''
+    fastest = None
+    for _ in range(repeats):
+        start = perf_counter()
+        result = function()
+        elapsed = perf_counter() - start
+        fastest = elapsed if fastest is None else min(fastest, elapsed)
+    return fastest, result
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    rng = random.Random(11)
+    print(f'{"players":>8} {"json MiB":>9} {"snap MiB":>9} {"json load s":>12} {"migrate s":>10} {"snap load s":>12} {"snap save s":>12}')
+    with tempfile.TemporaryDirectory() as directory:
+        for count in counts:
+            jsonPath = os.path.join(directory, f'info{count}.json')
+            snapshotPath = os.path.join(directory, f'info{count}.snapshot')
+            with open(jsonPath, 'w', encoding='utf-8') as file:
+                file.write(json.dumps(legacy_json(count, rng), indent=4))
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                jsonSeconds, legacyPlayers = best(lambda: legacy_load(jsonPath))
+
+            def migrate():
+                if os.path.exists(snapshotPath):
+                    os.remove(snapshotPath)
+                return SnapshotPersistence(snapshotPath, PlayerState, legacyFilename=jsonPath).read()
+            migrateSeconds, _ = best(migrate)
+            persistence = SnapshotPersistence(snapshotPath, PlayerState)
+            loadSeconds, (tracker, players) = best(persistence.read)
+            captured = capture(tracker, players)
+            saveSeconds, _ = best(lambda: persistence.write(captured))
+
+            # The snapshot must hold exactly what the JSON did
+            with open(jsonPath, 'r', encoding='utf-8') as file:
+                expected = migrate_json(json.load(file))
+            assert captured[1] == expected[1], 'snapshot does not match the JSON it was migrated from'
+            assert decode(encode(*captured), PlayerState)[0] == tracker
+            assert [player.name for player in players] == [player.name for player in legacyPlayers]
+
+            print(f'{count:>8} {os.path.getsize(jsonPath) / 2 ** 20:>9.1f} {os.path.getsize(snapshotPath) / 2 ** 20:>9.1f} '
+                  f'{jsonSeconds:>12.3f} {migrateSeconds:>10.3f} {loadSeconds:>12.3f} {saveSeconds:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,26 @@
 '''Written by Cael Shoop.'''
 
 import os
-import pytz
+import sys
 import asyncio
 import logging
+from time import monotonic, perf_counter
+from concurrent.futures import Future
+from functools import partial
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from discord import (app_commands, Intents, Client, Message, Guild,
                      File, Interaction, TextChannel, SelectOption)
 from discord.ui import Select, View
-from discord.ext import tasks
 
-from persistence import Persistence
+from persistence import JournaledPersistence, SqlitePersistence, tracker_index
 from player import Player
+from registry import PlayerRegistry
+from actor import Actor, serialized
+from scheduler import Scheduler
+from notifier import Notifier
+from users import MemberCache, UserCache, client_options
+from timezones import TimezoneBuckets, moved_reset, next_midnight
 from data import TrackerData
 
 # .env
@@ -35,7 +43,15 @@ logger.addHandler(file_handler)
 logger.addHandler(console_handler)
 
 # Persistence
-persist = Persistence("info.json")
+LAZY_HYDRATION = os.getenv("TRACKER_HYDRATION", "lazy") != "eager"
+# The journal backend holds every tracker's payload in memory, dormant or not, so lazy hydration defaults to SQLite
+if os.getenv("STORAGE_BACKEND", "sqlite" if LAZY_HYDRATION else "journal") == "sqlite":
+    persist = SqlitePersistence("info.db")
+    if persist.is_empty() and os.path.exists("info.json"):
+        logger.info("Importing info.json into info.db")
+        persist.write(JournaledPersistence("info.json").read())
+else:
+    persist = JournaledPersistence("info.json", compact_every=int(os.getenv("JOURNAL_COMPACT_EVERY", "1000")))
 
 
 class Tracker:
@@ -49,18 +65,32 @@ class Tracker:
         self.guild = guild
         self.textChannel = textChannel
         self.usingRandomLetter = usingRandomLetter
-        if players is not None:
-            self.players = players
-        else:
-            self.players = []
+        self.players = PlayerRegistry(views={"registered": lambda player: player.registered})
+        self.buckets = TimezoneBuckets()
+        for player in players or []:
+            self.add_player(player)
         self.prevData = prevData
         self.data = data
+        self.resetToday = set()
+        # Serializes everything that changes this tracker; other trackers run independently
+        self.actor = Actor(name=str(textChannel.id) if textChannel is not None else "")
+        self.lastUsed = monotonic()
+
+    def add_player(self, player: Player):
+        """Adds a player, returning their timezone bucket"""
+        self.players.add(player)
+        return self.buckets.add(player, player.timezone, player.data.resetTime)
+
+    def remove_player(self, player: Player):
+        """Removes a player, returning their timezone bucket if it is now empty"""
+        self.players.remove(player)
+        self.resetToday.discard(player)
+        return self.buckets.remove(player, player.timezone)
 
     def shift_data(self) -> None:
-        self.prevData = self.data
+        '''Rolls the tracker over to the next game; players shift individually at their own reset time'''
+        self.prevData = TrackerData.from_dict(self.data.to_dict())
         self.data.reset()
-        for player in self.players:
-            player.shift_data()
 
     def to_dict(self) -> dict:
         payload = {}
@@ -68,7 +98,7 @@ class Tracker:
         payload["textChannelId"] = self.textChannel.id
         payload["usingRandomLetter"] = self.usingRandomLetter
         payload["players"] = [player.to_dict() for player in self.players]
-        payload["prevData"] = self.prevData.to_dict()
+        payload["prevData"] = self.prevData.to_dict() if self.prevData is not None else None
         payload["data"] = self.data.to_dict()
         return payload
 
@@ -100,8 +130,9 @@ class Tracker:
             guild=guild,
             textChannel=textChannel,
             usingRandomLetter=payload["usingRandomLetter"],
-            players=[Player.from_dict(playerData) for playerData in payload["players"]],
-            prevData=TrackerData.from_dict(payload["prevData"]),
+            players=[Player.from_dict(guild, playerData, client.members.get(guild, playerData["memberId"]))
+                     for playerData in payload["players"]],
+            prevData=TrackerData.from_dict(payload["prevData"]) if payload["prevData"] is not None else None,
             data=TrackerData.from_dict(payload["data"])
         )
 
@@ -119,16 +150,22 @@ class TimezoneMenu(Select):
 
     async def callback(self, interaction: Interaction):
         content = "Failed to find you in the players list. Are you registered?"
-        tracker = client.get_tracker_for_channel(interaction.channel)
-        for player in tracker.players:
-            if player.name == interaction.user.name:
-                timezone = pytz.timezone(self.values[0])
-                player.resetTime = datetime.now().astimezone(tz=timezone).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-                logger.info(f"Reset time for {player.name} is now {player.resetTime.isoformat()}")
+        tracker = await client.fetch_tracker_for_channel(interaction.channel)
+        trackers = [tracker] if tracker is not None else await client.fetch_trackers_for_member(interaction.user.id)
+        for tracker in trackers:
+            if await tracker.actor.ask(self.set_timezone, tracker, interaction.user.id):
                 content = f"Successfully set timezone to {self.values[0]}!"
-                break
         await interaction.response.send_message(content=content, ephemeral=True)
 
+    async def set_timezone(self, tracker: Tracker, memberId: int) -> bool:
+        player = tracker.players.get(memberId)
+        if player is None:
+            return False
+        set_timezone(tracker, player, self.values[0])
+        logger.info(f"Reset time for {player.name} is now {player.data.resetTime.isoformat()}")
+        client.save_player(tracker, player)
+        return True
+
 
 class TimezoneMenuView(View):
     def __init__(self):
@@ -139,127 +176,428 @@ class TimezoneMenuView(View):
 class WordleTracker(Client):
     FILENAME = "data.json"
 
-    def __init__(self, intents: Intents) -> None:
-        super().__init__(intents=intents)
+    def __init__(self, intents: Intents, **options) -> None:
+        super().__init__(intents=intents, **options)
         self.tree = app_commands.CommandTree(self)
         self.trackers = []
-
-    def load_data(self, data: dict) -> None:
-        if data is None:
-            logger.info("No json data found")
+        self.trackers_by_channel = {}
+        self.trackers_by_guild = {}
+        self.trackers_by_member = {}
+        # Index entries of saved trackers that are not built yet, or were evicted while idle
+        self.dormant = {}
+        self.dormant_by_member = {}
+        # Hydrations in flight by text channel id, so concurrent first uses share one read
+        self.hydrating = {}
+        self.lazy_hydration = LAZY_HYDRATION
+        self.idle_seconds = float(os.getenv("TRACKER_IDLE_SECONDS", "3600"))
+        self.compaction = None
+        self.user_cache = UserCache(self)
+        self.members = MemberCache()
+        self.notifier = Notifier(concurrency=int(os.getenv("NOTIFY_CONCURRENCY", "4")), log=logger.warning)
+        self.scheduler = Scheduler(on_error=lambda key, e: logger.exception(f"Scheduled {key} failed: {e}", exc_info=e))
+
+    def load_index(self, entries: list) -> None:
+        """Records saved trackers as dormant; each is built on first use once the client is ready"""
+        if not entries:
+            logger.info("No saved trackers found")
             return
-        logger.info("Json data found")
-        for trackerData in data["trackers"]:
-            self.add_tracker(trackerData)
+        for entry in entries:
+            self.add_dormant(entry)
+        logger.info(f"Indexed {len(entries)} saved trackers")
+
+    def add_dormant(self, entry: dict) -> None:
+        self.dormant[entry["textChannelId"]] = entry
+        for memberId in entry["memberIds"]:
+            self.dormant_by_member.setdefault(memberId, set()).add(entry["textChannelId"])
+
+    def remove_dormant(self, textChannelId: int) -> dict:
+        entry = self.dormant.pop(textChannelId, None)
+        for memberId in entry["memberIds"] if entry is not None else []:
+            channels = self.dormant_by_member.get(memberId)
+            channels.discard(textChannelId)
+            if not channels:
+                del self.dormant_by_member[memberId]
+        return entry
+
+    async def hydrate(self, textChannelId: int) -> Tracker:
+        """Builds a dormant tracker and its players from disk and arms its deadlines"""
+        tracker = self.trackers_by_channel.get(textChannelId)
+        if tracker is not None or textChannelId not in self.dormant or not self.is_ready():
+            # Before on_ready the guild, channel and member caches are empty
+            return tracker
+        task = self.hydrating.get(textChannelId)
+        if task is None:
+            task = self.hydrating[textChannelId] = asyncio.create_task(self._hydrate(textChannelId))
+            task.add_done_callback(lambda _: self.hydrating.pop(textChannelId, None))
+        return await task
+
+    async def _hydrate(self, textChannelId: int) -> Tracker:
+        start = perf_counter()
+        # The payload is read off the event loop; the tracker stays dormant until it is built
+        data = await persist.load_tracker(textChannelId)
+        entry = self.remove_dormant(textChannelId)
+        if entry is None:
+            return self.trackers_by_channel.get(textChannelId)
+        tracker = self.add_tracker(data)
+        if tracker is None:
+            self.add_dormant(entry)
+            return None
+        for bucket in tracker.buckets:
+            schedule_deadlines(tracker, bucket)
+        if any(player.member is None for player in tracker.players):
+            asyncio.create_task(self.bind_members(tracker))
+        logger.info(f"Hydrated tracker {textChannelId} with {len(tracker.players)} players in {(perf_counter() - start) * 1000:.1f} ms")
+        return tracker
+
+    def evict(self, tracker: Tracker) -> bool:
+        """Saves an idle tracker and drops it back to an index entry; False if it has work queued"""
+        if tracker.actor.lock.locked() or not tracker.actor.mailbox.empty():
+            return False
+        payload = tracker.to_dict()
+        self.journal(persist.save_tracker, payload)
+        # A pending scoring job would run on the stopped actor of this instance
+        self.scheduler.cancel(("score", tracker.textChannel.id))
+        self.trackers.remove(tracker)
+        del self.trackers_by_channel[tracker.textChannel.id]
+        self.trackers_by_guild[tracker.guild.id].remove(tracker)
+        for player in tracker.players:
+            self.unindex_player(tracker, player)
+        entry = tracker_index(payload)
+        self.add_dormant(entry)
+        schedule_dormant_deadlines(entry)
+        return True
+
+    async def bind_members(self, tracker: Tracker) -> None:
+        """Fetches the members of players built without one, in batches per guild"""
+        unbound = [player for player in tracker.players if player.member is None]
+        members = await self.members.fetch_many(tracker.guild, [player.id for player in unbound])
+        for player in unbound:
+            if player.id in members:
+                player.bind(members[player.id])
+        logger.info(f"Bound {len(members)} of {len(unbound)} members in tracker {tracker.textChannel.id}")
+
+    async def resolve_member(self, guild: Guild, memberId: int):
+        """The member to DM, falling back to the user if they are no longer in the guild"""
+        member = await self.members.fetch(guild, memberId)
+        return member if member is not None else await self.user_cache.fetch(memberId)
 
     def get_tracker_for_channel(self, channel: TextChannel) -> Tracker:
-        for tracker in self.trackers:
-            if tracker.textChannel == channel:
-                return tracker
-        return None
-
-    def add_tracker(self, data: dict) -> None:
+        """The built tracker bound to channel; a dormant one needs fetch_tracker_for_channel first"""
+        if channel is None:
+            return None
+        tracker = self.trackers_by_channel.get(channel.id)
+        if tracker is not None:
+            tracker.lastUsed = monotonic()
+        return tracker
+
+    async def fetch_tracker_for_channel(self, channel: TextChannel) -> Tracker:
+        """The tracker bound to channel, hydrating it if it is dormant"""
+        if channel is not None and channel.id in self.dormant:
+            await self.hydrate(channel.id)
+        return self.get_tracker_for_channel(channel)
+
+    def get_trackers_for_guild(self, guildId: int) -> list:
+        return self.trackers_by_guild.get(guildId, [])
+
+    async def fetch_trackers_for_member(self, memberId: int) -> list:
+        for textChannelId in list(self.dormant_by_member.get(memberId, ())):
+            await self.hydrate(textChannelId)
+        trackers = self.trackers_by_member.get(memberId, [])
+        for tracker in trackers:
+            tracker.lastUsed = monotonic()
+        return trackers
+
+    def add_tracker(self, data: dict) -> Tracker:
         try:
+            if data is None:
+                raise Exception("No saved data")
             tracker = Tracker.from_dict(data)
-            self.trackers.append(tracker)
+            if tracker is None or tracker.textChannel is None:
+                raise Exception(f"Text channel {data['textChannelId']} is unavailable")
+            self.index_tracker(tracker)
             logger.info("Added tracker")
+            return tracker
         except Exception as e:
             logger.exception(f"Failed to load tracker: {e}")
+            return None
 
     def remove_tracker(self, tracker: Tracker) -> None:
         try:
             self.trackers.remove(tracker)
+            del self.trackers_by_channel[tracker.textChannel.id]
+            self.trackers_by_guild[tracker.guild.id].remove(tracker)
+            for player in tracker.players:
+                self.unindex_player(tracker, player)
+            self.delete_tracker(tracker)
             logger.info("Removed tracker")
         except Exception as e:
             logger.error(f"Failed to remove tracker: {e}")
 
+    def index_tracker(self, tracker: Tracker) -> None:
+        self.trackers.append(tracker)
+        self.trackers_by_channel[tracker.textChannel.id] = tracker
+        self.trackers_by_guild.setdefault(tracker.guild.id, []).append(tracker)
+        for player in tracker.players:
+            self.index_player(tracker, player)
+
+    def index_player(self, tracker: Tracker, player: Player) -> None:
+        trackers = self.trackers_by_member.setdefault(player.id, [])
+        if tracker not in trackers:
+            trackers.append(tracker)
+
+    def unindex_player(self, tracker: Tracker, player: Player) -> None:
+        trackers = self.trackers_by_member.get(player.id, [])
+        if tracker in trackers:
+            trackers.remove(tracker)
+        if not trackers:
+            self.trackers_by_member.pop(player.id, None)
+
     def get_tracker_data(self) -> dict:
         payload = {}
         try:
             payload["trackers"] = [tracker.to_dict() for tracker in self.trackers]
+            payload["trackers"] += [persist.read_tracker(textChannelId) for textChannelId in self.dormant]
         except Exception as e:
             logger.exception(f"Failed to get tracker data: {e}")
         finally:
             return payload
 
+    def save_tracker(self, tracker: Tracker) -> None:
+        self.journal(persist.save_tracker, tracker.to_dict())
+
+    def save_player(self, tracker: Tracker, player: Player) -> None:
+        self.journal(persist.save_player, tracker.textChannel.id, player.to_dict())
+
+    def delete_player(self, tracker: Tracker, player: Player) -> None:
+        self.journal(persist.remove_player, tracker.textChannel.id, player.id)
+
+    def delete_tracker(self, tracker: Tracker) -> None:
+        self.journal(persist.remove_tracker, tracker.textChannel.id)
+
+    def log_save_error(self, future: Future) -> None:
+        if future.exception() is not None:
+            logger.error(f"Failed to save data: {future.exception()}")
+
+    def journal(self, append, *args) -> None:
+        try:
+            result = append(*args)
+        except Exception as e:
+            logger.exception(f"Failed to save data: {e}")
+            return
+        if isinstance(result, Future):
+            result.add_done_callback(self.log_save_error)
+        if persist.needs_compaction and (self.compaction is None or self.compaction.done()):
+            # Snapshot on the loop in the same step as the rotation, write it in a thread
+            persist.rotate()
+            self.compaction = asyncio.create_task(asyncio.to_thread(persist.compact, self.get_tracker_data()))
+
 
 discord_token = os.getenv("DISCORD_TOKEN")
-client = WordleTracker(intents=Intents.all())
-data = persist.read()
-client.load_data(data)
-client.get_previous_answers()
+client = WordleTracker(**client_options())
+client.load_index(persist.read_index())
 
 
-async def setup_hourly_call():
-    if midnight_call.is_running():
-        return
-    curTime = datetime.now()
-    nextHour = curTime.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-    offset = (nextHour - curTime).total_seconds()
-    await asyncio.sleep(offset)
-    await midnight_call.start()
+def tracker_actor(interaction: Interaction, *args, **kwargs):
+    """The actor of the tracker bound to interaction's channel, for @serialized"""
+    tracker = client.get_tracker_for_channel(interaction.channel)
+    return tracker.actor if tracker is not None else None
+
+
+def schedule_deadlines(tracker: Tracker, bucket) -> None:
+    """(Re)arms a timezone bucket's one hour warning and reset deadlines"""
+    key = (tracker.textChannel.id, bucket.name)
+    client.scheduler.schedule(("warning", key), bucket.warningTime, partial(tracker.actor.ask, warning_call, tracker, bucket))
+    client.scheduler.schedule(("reset", key), bucket.resetTime, partial(tracker.actor.ask, reset_call, tracker, bucket))
+
+
+def schedule_dormant_deadlines(entry: dict) -> None:
+    """Arms a dormant tracker's deadlines to hydrate it; hydrating re-arms them with the real calls"""
+    for timezone, resetTime in entry["resets"].items():
+        key = (entry["textChannelId"], timezone)
+        hydrate = partial(hydrate_call, entry["textChannelId"])
+        client.scheduler.schedule(("warning", key), resetTime - timedelta(hours=1), hydrate)
+        client.scheduler.schedule(("reset", key), resetTime, hydrate)
+
+
+def schedule_eviction() -> None:
+    if client.idle_seconds > 0:
+        client.scheduler.schedule(("evict",), datetime.now().astimezone() + timedelta(seconds=min(client.idle_seconds, 300)), evict_call)
+
+
+def unschedule_deadlines(tracker: Tracker, bucket) -> None:
+    key = (tracker.textChannel.id, bucket.name)
+    client.scheduler.cancel(("warning", key))
+    client.scheduler.cancel(("reset", key))
+
+
+def set_timezone(tracker: Tracker, player: Player, timezone: str) -> None:
+    oldTimezone = player.timezone
+    emptied = tracker.buckets.remove(player, player.timezone)
+    if emptied is not None:
+        unschedule_deadlines(tracker, emptied)
+    player.timezone = sys.intern(timezone)
+    bucket = tracker.buckets.get(timezone)
+    if player in tracker.resetToday:
+        # Already reset today; a midnight further west must not reset them again
+        player.data.resetTime = moved_reset(timezone, oldTimezone, player.data.resetTime)
+    else:
+        player.data.resetTime = bucket.resetTime if bucket is not None else next_midnight(timezone)
+    schedule_deadlines(tracker, tracker.buckets.add(player, player.timezone, player.data.resetTime))
+
+
+async def warning_call(tracker: Tracker, bucket) -> None:
+    tracker.lastUsed = monotonic()
+    content = f"You have one hour left to do (or skip) Wordle #{tracker.data.gameNumber}!"
+    for player in bucket.players:
+        if player.registered and not player.data.submitted and not player.data.warningSent:
+            player.data.warningSent = True
+            client.save_player(tracker, player)
+            client.notifier.send(player.id, partial(client.resolve_member, tracker.guild, player.id), content, f"warning for {player.name}")
+
+
+async def reset_call(tracker: Tracker, bucket) -> None:
+    tracker.lastUsed = monotonic()
+    curTime = datetime.now().astimezone()
+    # The first reset in a tracker rolls its game over
+    if not tracker.resetToday:
+        tracker.shift_data()
+        client.save_tracker(tracker)
+    due = [player for player in bucket.players if player.data.resetTime <= curTime]
+    bucket.advance(curTime)
+    for player in bucket.players:
+        if player in due:
+            player.shift_data()
+            tracker.resetToday.add(player)
+        player.data.resetTime = bucket.resetTime
+        client.save_player(tracker, player)
+    schedule_deadlines(tracker, bucket)
+    logger.info(f"Reset {len(due)} players in {tracker.textChannel.id} {bucket.name}, next reset at {bucket.resetTime.isoformat()}")
+    if all(player in tracker.resetToday for player in tracker.players.view("registered")):
+        client.scheduler.schedule(("score", tracker.textChannel.id), datetime.now().astimezone(), partial(tracker.actor.ask, scoring_call, tracker))
+
+
+async def hydrate_call(textChannelId: int) -> None:
+    # A hydrated tracker's deadlines that are already due run straight away
+    await client.hydrate(textChannelId)
+
+
+async def evict_call() -> None:
+    cutoff = monotonic() - client.idle_seconds
+    evicted = [tracker for tracker in list(client.trackers) if tracker.lastUsed < cutoff and client.evict(tracker)]
+    for tracker in evicted:
+        await tracker.actor.stop()
+    if evicted:
+        logger.info(f"Evicted {len(evicted)} idle trackers, {len(client.trackers)} remain in memory")
+    schedule_eviction()
+
+
+async def scoring_call(tracker: Tracker) -> None:
+    tracker.lastUsed = monotonic()
+    tracker.resetToday.clear()
+    # TODO scoring for each timezone
 
 
 @client.event
 async def on_ready():
     logger.info(f"{client.user} has connected to Discord!")
-    await setup_hourly_call()
+    for tracker in client.trackers:
+        for bucket in tracker.buckets:
+            schedule_deadlines(tracker, bucket)
+    for entry in list(client.dormant.values()):
+        if client.lazy_hydration:
+            schedule_dormant_deadlines(entry)
+        else:
+            await client.hydrate(entry["textChannelId"])
+    schedule_eviction()
+    client.user_cache.warm(client.trackers_by_member.keys())
+    client.scheduler.start()
+    client.notifier.start()
+
+@client.event
+async def on_member_update(before, after):
+    client.user_cache.invalidate(after.id)
+    client.members.invalidate(after.guild.id, after.id)
+
+@client.event
+async def on_user_update(before, after):
+    client.user_cache.invalidate(after.id)
+
+@client.event
+async def on_member_remove(member):
+    client.user_cache.invalidate(member.id)
+    client.members.invalidate(member.guild.id, member.id)
 
 @client.event
 async def on_message(message: Message):
     # Return if message isn't in a tracked channel
-    tracker = client.get_tracker_for_channel(message.channel)
+    tracker = await client.fetch_tracker_for_channel(message.channel)
     if tracker is None:
         return
-    # TODO parse player messages into scores and screenshots
+    await tracker.actor.ask(handle_message, tracker, message)
+
+async def handle_message(tracker: Tracker, message: Message) -> None:
+    pass  # TODO parse player messages into scores and screenshots
 
 @client.tree.command(name="register", description="Register for Wordle tracking.")
 async def register_command(interaction: Interaction):
+    # Hydrate first, so tracker_actor finds the tracker built
+    await client.fetch_tracker_for_channel(interaction.channel)
+    content = await register(interaction)
+    await interaction.response.send_message(content=content, ephemeral=True)
+
+@serialized(tracker_actor)
+async def register(interaction: Interaction) -> str:
+    """Registers the interaction's user on the actor and returns the response to send"""
     tracker = client.get_tracker_for_channel(interaction.channel)
     if tracker is None:
-        content = f"WordleTracker is not bound to {interaction.channel.mention}."
-        await interaction.response.send_message(content=content, ephemeral=True)
-        return
-    for player in tracker.players:
-        if player.member.id == interaction.user.id:
-            if player.registered:
-                content = "You are already registered for Wordle tracking."
-            else:
-                player.registered = True
-                content = "You have been re-registered for Wordle tracking."
-            await interaction.response.send_message(content=content, ephemeral=True)
-            return
-    member = interaction.guild.get_member(interaction.user.id)
-    player = Player.from_member(member)
-    tracker.players.append(player)
-    content = "You have been registered for Wordle tracking."
-    await interaction.response.send_message(content=content, ephemeral=True)
+        return f"WordleTracker is not bound to {interaction.channel.mention}."
+    player = tracker.players.get(interaction.user.id)
+    if player is not None:
+        if player.registered:
+            return "You are already registered for Wordle tracking."
+        player.registered = True
+        tracker.players.refresh(player)
+        client.save_player(tracker, player)
+        return "You have been re-registered for Wordle tracking."
+    # A guild interaction carries the member, so this works without the member cache
+    player = Player.from_member(interaction.user)
+    schedule_deadlines(tracker, tracker.add_player(player))
+    client.index_player(tracker, player)
+    client.save_player(tracker, player)
+    return "You have been registered for Wordle tracking."
 
 @client.tree.command(name="deregister", description="Deregister from Wordle tracking. Use twice to delete saved data.")
 async def deregister_command(interaction: Interaction):
+    await client.fetch_tracker_for_channel(interaction.channel)
+    content = await deregister(interaction)
+    await interaction.response.send_message(content=content, ephemeral=True)
+
+@serialized(tracker_actor)
+async def deregister(interaction: Interaction) -> str:
+    """Deregisters the interaction's user on the actor, or deletes their data if already deregistered"""
     tracker = client.get_tracker_for_channel(interaction.channel)
     if tracker is None:
-        content = f"WordleTracker is not bound to {interaction.channel.mention}."
-        await interaction.response.send_message(content=content, ephemeral=True)
-        return
-    culled_players = []
+        return f"WordleTracker is not bound to {interaction.channel.mention}."
     content = "You are not registered for Wordle tracking."
-    for player in tracker.players:
-        if player.member.id == interaction.user.id:
-            if player.registered:
-                player.registered = False
-                content = "You have been deregistered from Wordle tracking."
-                culled_players.append(player)
-            else:
-                content = "Your Wordle data has been deleted."
+    player = tracker.players.get(interaction.user.id)
+    if player is not None:
+        if player.registered:
+            player.registered = False
+            tracker.players.refresh(player)
+            content = "You have been deregistered from Wordle tracking."
+            client.save_player(tracker, player)
         else:
-            culled_players.append(player)
-    tracker.players = culled_players
-    await interaction.response.send_message(content=content, ephemeral=True)
+            content = "Your Wordle data has been deleted."
+            emptied = tracker.remove_player(player)
+            if emptied is not None:
+                unschedule_deadlines(tracker, emptied)
+            client.unindex_player(tracker, player)
+            client.delete_player(tracker, player)
+    return content
 
 @client.tree.command(name="timezone", description="Change your timezone for scoring and notification purposes.")
 async def timezone_command(interaction: Interaction):
-    tracker = client.get_tracker_for_channel(interaction.channel)
+    tracker = await client.fetch_tracker_for_channel(interaction.channel)
     if tracker is None:
         content = f"WordleTracker is not bound to {interaction.channel.mention}."
         await interaction.response.send_message(content=content, ephemeral=True)
@@ -271,31 +609,39 @@ async def timezone_command(interaction: Interaction):
 @client.tree.command(name="randomletterstart", description="State a random letter to start the Wordle guessing with.")
 @app_commands.describe(use_random_letters="Whether you want forced starting with a random letter.")
 async def randomletterstart_command(interaction: Interaction, use_random_letters: bool = True):
+    await client.fetch_tracker_for_channel(interaction.channel)
+    content, ephemeral = await randomletterstart(interaction, use_random_letters)
+    await interaction.response.send_message(content=content, ephemeral=ephemeral)
+
+@serialized(tracker_actor)
+async def randomletterstart(interaction: Interaction, use_random_letters: bool) -> tuple:
+    """Turns random letters on or off on the actor; returns (response, whether it is ephemeral)"""
     tracker = client.get_tracker_for_channel(interaction.channel)
     if tracker is None:
-        content = f"WordleTracker is not bound to {interaction.channel.mention}."
-        await interaction.response.send_message(content=content, ephemeral=True)
-        return
+        return f"WordleTracker is not bound to {interaction.channel.mention}.", True
     tracker.usingRandomLetter = use_random_letters
     if tracker.usingRandomLetter:
         tracker.data.get_new_letter()
         content = f"WordleTracker will now provide random letters. The current letter is {tracker.data.letter}."
     else:
         content = "WordleTracker will no longer provide random letters."
-    await interaction.response.send_message(content=content)
+    client.save_tracker(tracker)
+    return content, False
 
 @client.tree.command(name="textchannel", description="Set the text channel for Wordle Tracker.")
 @app_commands.describe(use_random_letters="Whether you want forced starting with a random letter.")
 async def textchannel_command(interaction: Interaction, use_random_letters: bool = False):
-    tracker = client.get_tracker_for_channel(interaction.channel)
+    tracker = await client.fetch_tracker_for_channel(interaction.channel)
     if tracker is None:
         tracker = Tracker.from_interaction(interaction)
         tracker.usingRandomLetter = use_random_letters
-    persist.write(client.get_tracker_dict())
+        client.index_tracker(tracker)
+        for bucket in tracker.buckets:
+            schedule_deadlines(tracker, bucket)
+    client.save_tracker(tracker)
     content = f"WordleTracker in this server will now operate in {interaction.channel.mention}."
     await interaction.response.send_message(content=content, ephemeral=True)
 
-@tasks.loop(hours=1)
-async def midnight_call():
-    # TODO scoring for each timezone
-    pass
+
+if __name__ == "__main__":
+    client.run(discord_token)
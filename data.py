@@ -1,20 +1,47 @@
 '''Written by Cael Shoop.'''
 
+import sys
+from enum import IntEnum
 from random import randint
 from datetime import datetime, timedelta
 
+from timezones import DEFAULT_TIMEZONE, next_midnight
+
+
+class DayResult(IntEnum):
+    '''A player's result for one day, replacing separate completed and succeeded flags'''
+    NONE = 0
+    FAILED = 1
+    SUCCEEDED = 2
+
+    @classmethod
+    def of(cls, completed: bool, succeeded: bool):
+        if not completed:
+            return cls.NONE
+        return cls.SUCCEEDED if succeeded else cls.FAILED
+
+    @property
+    def completed(self) -> bool:
+        return self is not DayResult.NONE
+
+    @property
+    def succeeded(self) -> bool:
+        return self is DayResult.SUCCEEDED
+
 
 class TrackerData:
+    __slots__ = ('gameNumber', 'SAVED_LETTERS_COUNT', 'letter', 'savedLetters', 'scored')
+
     def __init__(self,
-                 gameNumber: int,
-                 savedLettersCount: int,
-                 letter: chr,
-                 savedLetters: list,
-                 scored: bool):
+                 gameNumber: int = 0,
+                 savedLettersCount: int = 6,
+                 letter: chr = '',
+                 savedLetters: list = None,
+                 scored: bool = False):
         self.gameNumber = gameNumber
         self.SAVED_LETTERS_COUNT = savedLettersCount
         self.letter = letter
-        self.savedLetters = savedLetters
+        self.savedLetters = savedLetters if savedLetters is not None else []
         self.scored = scored
 
     def get_new_letter(self) -> None:
@@ -23,6 +50,8 @@ class TrackerData:
             letter = chr(randint(ord('A'), ord('Z')))
         if len(self.savedLetters) >= self.SAVED_LETTERS_COUNT:
             self.savedLetters.remove(self.savedLetters[0])
+        self.savedLetters.append(letter)
+        self.letter = letter
 
     def reset(self) -> None:
         self.get_new_letter()
@@ -34,7 +63,7 @@ class TrackerData:
         payload["gameNumber"] = self.gameNumber
         payload["savedLettersCount"] = self.SAVED_LETTERS_COUNT
         payload["letter"] = self.letter
-        payload["savedLetters"] = self.savedLetters
+        payload["savedLetters"] = list(self.savedLetters)
         payload["scored"] = self.scored
         return payload
 
@@ -43,22 +72,30 @@ class TrackerData:
         return cls(gameNumber=payload["gameNumber"],
                    savedLettersCount=payload["savedLettersCount"],
                    letter=payload["letter"],
-                   savedLetters=payload["savedLetters"],
+                   savedLetters=list(payload["savedLetters"]),
                    scored=payload["scored"]
                    )
 
+
 class PlayerData:
+    __slots__ = ('submitted', 'guesses', 'imagePath', 'msgContent', 'grid', 'resetTime', 'warningSent')
+
     def __init__(self,
-                 submitted: bool,
-                 guesses: int,
-                 imagePath: str,
-                 msgContent: str,
-                 resetTime: datetime,
-                 warningSent: bool):
+                 submitted: bool = False,
+                 guesses: int = 0,
+                 imagePath: str = '',
+                 msgContent: str = '',
+                 grid: int = 0,
+                 resetTime: datetime = None,
+                 warningSent: bool = False):
         self.submitted = submitted
         self.guesses = guesses
         self.imagePath = imagePath
         self.msgContent = msgContent
+        # Result grid packed by grid.pack, stored instead of the emoji text
+        self.grid = grid
+        if resetTime is None:
+            resetTime = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
         self.resetTime = resetTime
         self.warningSent = warningSent
 
@@ -67,6 +104,7 @@ class PlayerData:
         self.guesses = 0
         self.imagePath = ''
         self.msgContent = ''
+        self.grid = 0
         self.resetTime += timedelta(days=1)
         self.warningSent = False
 
@@ -76,6 +114,7 @@ class PlayerData:
         payload["guesses"] = self.guesses
         payload["imagePath"] = self.imagePath
         payload["msgContent"] = self.msgContent
+        payload["grid"] = self.grid
         payload["resetTime"] = self.resetTime.isoformat()
         payload["warningSent"] = self.warningSent
         return payload
@@ -86,6 +125,56 @@ class PlayerData:
                    guesses=payload["guesses"],
                    imagePath=payload["imagePath"],
                    msgContent=payload["msgContent"],
+                   grid=payload.get("grid", 0),
                    resetTime=datetime.fromisoformat(payload["resetTime"]),
                    warningSent=payload["warningSent"]
                    )
+
+
+class PlayerState:
+    '''A player in the single-channel WordleTracker bot.
+
+    Slotted, with today's and yesterday's results as DayResults, so a large
+    guild costs a few hundred bytes per player. Names and timezones are
+    interned since many players share them.
+    '''
+    __slots__ = ('name', 'id', 'guesses', 'newGuesses', 'winCount', 'registered', 'today', 'yesterday',
+                 'filePath', 'newFilePath', 'imageKey', 'newImageKey', 'messageContent', 'newMessageContent',
+                 'grid', 'newGrid', 'timezone', 'resetTime', 'sentWarning')
+
+    def __init__(self, name: str, id: int = None, resetTime: datetime = None):
+        self.name = sys.intern(name)
+        self.id = id
+        self.guesses = 0
+        self.newGuesses = 0
+        self.winCount = 0
+        self.registered = True
+        self.today = DayResult.NONE
+        self.yesterday = DayResult.NONE
+        self.filePath = ''
+        self.newFilePath = ''
+        self.imageKey = None
+        self.newImageKey = None
+        self.messageContent = ''
+        self.newMessageContent = ''
+        self.grid = 0
+        self.newGrid = 0
+        self.timezone = DEFAULT_TIMEZONE
+        self.resetTime = resetTime if resetTime is not None else next_midnight(self.timezone)
+        self.sentWarning = False
+
+    @property
+    def completedToday(self) -> bool:
+        return self.today is not DayResult.NONE
+
+    @property
+    def completedYesterday(self) -> bool:
+        return self.yesterday is not DayResult.NONE
+
+    @property
+    def succeededToday(self) -> bool:
+        return self.today is DayResult.SUCCEEDED
+
+    @property
+    def succeededYesterday(self) -> bool:
+        return self.yesterday is DayResult.SUCCEEDED
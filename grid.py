@@ -0,0 +1,75 @@
+'''Written by Cael Shoop.'''
+
+from parsing import CORRECT_TILES, PRESENT_TILES
+
+ABSENT, PRESENT, CORRECT = 0, 1, 2
+ROWS = 6
+COLUMNS = 5
+# Bits 0-2 hold the row count, then 2 bits per cell row by row: 63 bits, so a grid fits a signed 64-bit int
+ROW_BITS = 3
+CELL_BITS = 2
+
+THEMES = {
+    'dark': ('⬛', '🟨', '🟩'),
+    'light': ('⬜', '🟨', '🟩'),
+    'contrast': ('⬛', '🟦', '🟧'),
+}
+# A solve straight after a row with this few green or yellow tiles is put down to luck
+LUCKY_KNOWN = 2
+
+
+def pack(rows) -> int:
+    '''Packs emoji grid rows (as in parsing.WordleResult.rows) into one int; 0 is an empty grid'''
+    if len(rows) > ROWS:
+        raise ValueError(f'A grid has at most {ROWS} rows')
+    packed = len(rows)
+    shift = ROW_BITS
+    for row in rows:
+        if len(row) != COLUMNS:
+            raise ValueError(f'A grid row has {COLUMNS} tiles')
+        for tile in row:
+            if tile in CORRECT_TILES:
+                packed |= CORRECT << shift
+            elif tile in PRESENT_TILES:
+                packed |= PRESENT << shift
+            shift += CELL_BITS
+    return packed
+
+
+def row_count(packed: int) -> int:
+    return packed & ((1 << ROW_BITS) - 1)
+
+
+def unpack(packed: int) -> list:
+    '''Returns the grid as rows of ABSENT/PRESENT/CORRECT values'''
+    cells = packed >> ROW_BITS
+    rows = []
+    for _ in range(row_count(packed)):
+        rows.append([(cells >> (column * CELL_BITS)) & 3 for column in range(COLUMNS)])
+        cells >>= COLUMNS * CELL_BITS
+    return rows
+
+
+def render(packed: int, theme: str = 'dark') -> str:
+    '''Renders a packed grid back to emoji, one row per line'''
+    tiles = THEMES[theme]
+    return '\n'.join(''.join(tiles[cell] for cell in row) for row in unpack(packed))
+
+
+def greens_by_row(packed: int) -> tuple:
+    return tuple(row.count(CORRECT) for row in unpack(packed))
+
+
+def solved(packed: int) -> bool:
+    rows = unpack(packed)
+    return bool(rows) and all(cell == CORRECT for cell in rows[-1])
+
+
+def lucky(packed: int) -> bool:
+    '''Whether the solve came straight after a row that revealed little, a hole in one included'''
+    rows = unpack(packed)
+    if not rows or any(cell != CORRECT for cell in rows[-1]):
+        return False
+    if len(rows) == 1:
+        return True
+    return sum(1 for cell in rows[-2] if cell != ABSENT) <= LUCKY_KNOWN
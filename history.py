@@ -0,0 +1,221 @@
+'''Written by Cael Shoop.'''
+
+import os
+import json
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+
+from persistence import atomic_write
+from grid import lucky, pack
+
+MAX_GUESSES = 6
+
+
+@dataclass(frozen=True)
+class GameRecord:
+    scope: int
+    memberId: int
+    gameNumber: int
+    guesses: int
+    succeeded: bool
+    hardMode: bool
+    submittedAt: str
+    grid: int = 0
+
+    @classmethod
+    def from_result(cls, scope: int, memberId: int, result, submittedAt: datetime = None):
+        '''Builds a record from a parsing.WordleResult'''
+        submittedAt = submittedAt or datetime.now().astimezone()
+        return cls(scope=scope,
+                   memberId=memberId,
+                   gameNumber=result.gameNumber,
+                   guesses=result.guesses,
+                   succeeded=result.succeeded,
+                   hardMode=result.hardMode,
+                   submittedAt=submittedAt.isoformat(),
+                   grid=pack(result.rows))
+
+
+class PlayerStats:
+    '''Running aggregates for one player, updated in O(1) per game'''
+    def __init__(self,
+                 played: int = 0,
+                 wins: int = 0,
+                 hardModeGames: int = 0,
+                 winGuesses: int = 0,
+                 distribution: list = None,
+                 currentStreak: int = 0,
+                 maxStreak: int = 0,
+                 lastGame: int = 0,
+                 lastWin: int = 0,
+                 luckyWins: int = 0):
+        self.played = played
+        self.wins = wins
+        self.hardModeGames = hardModeGames
+        self.winGuesses = winGuesses
+        self.distribution = distribution if distribution is not None else [0] * MAX_GUESSES
+        self.currentStreak = currentStreak
+        self.maxStreak = maxStreak
+        self.lastGame = lastGame
+        self.lastWin = lastWin
+        self.luckyWins = luckyWins
+
+    def add(self, record: GameRecord) -> bool:
+        '''Counts record, returning False if it is not newer than the last counted game'''
+        if record.gameNumber <= self.lastGame:
+            return False
+        self.played += 1
+        self.hardModeGames += record.hardMode
+        if record.succeeded:
+            self.wins += 1
+            self.winGuesses += record.guesses
+            self.distribution[record.guesses - 1] += 1
+            self.currentStreak = self.currentStreak + 1 if self.lastWin == record.gameNumber - 1 else 1
+            self.maxStreak = max(self.maxStreak, self.currentStreak)
+            self.lastWin = record.gameNumber
+            self.luckyWins += lucky(record.grid)
+        else:
+            self.currentStreak = 0
+        self.lastGame = record.gameNumber
+        return True
+
+    @property
+    def mean(self) -> float:
+        '''Mean guesses over won games'''
+        return self.winGuesses / self.wins if self.wins else 0.0
+
+    @property
+    def winRate(self) -> float:
+        return self.wins / self.played if self.played else 0.0
+
+    def streak(self, gameNumber: int) -> int:
+        '''Current win streak as of gameNumber; a skipped game breaks it'''
+        return self.currentStreak if self.lastWin >= gameNumber - 1 else 0
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, payload: dict):
+        return cls(**payload)
+
+
+class HistoryStore:
+    '''Append-only per-game history with aggregates kept alongside it.
+
+    Every record is one line in games.jsonl. stats.json is a checkpoint of the
+    aggregates plus the journal offset it covers, so loading reads the
+    checkpoint and replays only the lines written after it. Aggregates and the
+    offset are updated on the event loop; the appends run in order on one
+    writer thread.
+    '''
+    def __init__(self, directory: str = 'history'):
+        self.directory = directory
+        self.gamesFilename = os.path.join(directory, 'games.jsonl')
+        self.statsFilename = os.path.join(directory, 'stats.json')
+        self.stats = {}
+        self.offset = 0
+        self.dirty = False
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='history')
+        self.pending = None
+
+    def load(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.statsFilename):
+            with open(self.statsFilename, 'r', encoding='utf-8') as file:
+                checkpoint = json.load(file)
+            self.offset = checkpoint['offset']
+            for scope, memberId, stats in checkpoint['stats']:
+                self.stats[(scope, memberId)] = PlayerStats.from_dict(stats)
+        if not os.path.exists(self.gamesFilename):
+            return
+        with open(self.gamesFilename, 'rb') as file:
+            file.seek(self.offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    # Torn final write; the next append starts a fresh line
+                    break
+                self._count(GameRecord(**json.loads(line)))
+                self.offset += len(line)
+                self.dirty = True
+
+    def record(self, record: GameRecord) -> bool:
+        '''Appends record and updates its player's aggregates, returning False for a repeated game'''
+        stats = self.stats.get((record.scope, record.memberId))
+        if stats is not None and record.gameNumber <= stats.lastGame:
+            return False
+        line = (json.dumps(asdict(record)) + '\n').encode('utf-8')
+        self.pending = self.executor.submit(self._append, self.offset, line)
+        self.offset += len(line)
+        self._count(record)
+        self.dirty = True
+        return True
+
+    def records(self, scope: int = None, end: int = None):
+        '''Yields the records in games.jsonl up to byte offset end, optionally only scope's.
+
+        Reads the file, so run it off the event loop and pass the offset taken on the loop.
+        '''
+        end = self.offset if end is None else end
+        self.wait()
+        if not os.path.exists(self.gamesFilename):
+            return
+        with open(self.gamesFilename, 'rb') as file:
+            position = 0
+            for line in file:
+                position += len(line)
+                if position > end:
+                    return
+                record = GameRecord(**json.loads(line))
+                if scope is None or record.scope == scope:
+                    yield record
+
+    def get(self, scope: int, memberId: int) -> PlayerStats:
+        return self.stats.get((scope, memberId))
+
+    def wait(self) -> None:
+        '''Blocks until the appends queued so far are on disk'''
+        pending = self.pending
+        if pending is not None:
+            pending.result()
+
+    def checkpoint(self) -> None:
+        '''Writes the aggregates so the next load skips the records already counted'''
+        if not self.dirty:
+            return
+        # The checkpoint's offset must not run ahead of the file
+        self.wait()
+        stats = [[scope, memberId, stats.to_dict()] for (scope, memberId), stats in self.stats.items()]
+        atomic_write(self.statsFilename, json.dumps({'offset': self.offset, 'stats': stats}))
+        self.dirty = False
+
+    def _append(self, start: int, line: bytes) -> None:
+        with open(self.gamesFilename, 'ab') as file:
+            if file.tell() > start:
+                # Drop a torn line left by a crash so the journal stays parseable
+                file.truncate(start)
+            file.write(line)
+
+    def _count(self, record: GameRecord) -> None:
+        key = (record.scope, record.memberId)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = PlayerStats()
+        stats.add(record)
+
+
+def format_stats(name: str, stats: PlayerStats, gameNumber: int) -> str:
+    '''Renders stats as a Discord message'''
+    if stats is None or stats.played == 0:
+        return f'{name} has no recorded games yet.'
+    most = max(stats.distribution) or 1
+    lines = [f'**{name}**',
+             f'Played: {stats.played} | Win rate: {stats.winRate:.0%} | Mean guesses: {stats.mean:.2f}',
+             f'Current streak: {stats.streak(gameNumber)} | Max streak: {stats.maxStreak} | Hard mode: {stats.hardModeGames} | Lucky: {stats.luckyWins}',
+             '```']
+    for guesses, count in enumerate(stats.distribution, start=1):
+        lines.append(f'{guesses} {"#" * round(count * 20 / most):<20} {count}')
+    lines.append(f'X {"":<20} {stats.played - stats.wins}')
+    lines.append('```')
+    return '\n'.join(lines)
@@ -0,0 +1,126 @@
+'''Written by Cael Shoop.'''
+
+import os
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+from PIL import Image, ImageOps
+
+MAX_WIDTH = int(os.getenv('SCREENSHOT_MAX_WIDTH', '720'))
+QUALITY = int(os.getenv('SCREENSHOT_QUALITY', '80'))
+# 'never' drops an original once its prepared copy is stored, 'until-scored' keeps it until scoring
+KEEP_ORIGINALS = os.getenv('SCREENSHOT_KEEP_ORIGINALS', 'never')
+PREPARED_EXTENSION = '.webp'
+
+# Tile colors in dark, light and high contrast themes
+TILE_COLORS = numpy.array([
+    (83, 141, 78), (106, 170, 100),
+    (181, 159, 59), (201, 180, 88),
+    (58, 58, 60), (120, 124, 126),
+    (245, 121, 58), (133, 192, 249),
+], dtype=numpy.int16)
+TOLERANCE = 24
+# Width the board search runs at; the crop is scaled back up to the full image
+SEARCH_WIDTH = 256
+
+
+def find_board(image: Image.Image):
+    '''Returns the (left, top, right, bottom) box around the colored guess rows, or None.
+
+    Rows dense with tile colors are grouped into bands, and the topmost tall band
+    is the board; the keyboard below it uses the same colors but comes later.
+    '''
+    scale = image.width / SEARCH_WIDTH
+    small = image.resize((SEARCH_WIDTH, max(1, round(image.height / scale))), Image.Resampling.NEAREST)
+    pixels = numpy.asarray(small, dtype=numpy.int16)
+    distance = numpy.abs(pixels[:, :, None, :] - TILE_COLORS[None, None, :, :]).max(axis=3)
+    mask = (distance <= TOLERANCE).any(axis=2)
+
+    rows = numpy.flatnonzero(mask.sum(axis=1) >= SEARCH_WIDTH * 0.2)
+    if rows.size == 0:
+        return None
+    gap = max(2, mask.shape[0] // 50)
+    bandEnd = numpy.flatnonzero(numpy.diff(rows) > gap)
+    top = rows[0]
+    bottom = rows[bandEnd[0]] if bandEnd.size else rows[-1]
+    if bottom - top < mask.shape[0] * 0.03:
+        return None
+    columns = numpy.flatnonzero(mask[top:bottom + 1].any(axis=0))
+    left, right = columns[0], columns[-1]
+    margin = (bottom - top) * 0.05
+    return (max(0, int((left - margin) * scale)),
+            max(0, int((top - margin) * scale)),
+            min(image.width, int((right + 1 + margin) * scale)),
+            min(image.height, int((bottom + 1 + margin) * scale)))
+
+
+def normalize(source: str, destination: str, maxWidth: int = MAX_WIDTH, quality: int = QUALITY):
+    '''Crops source to the board, downscales it to maxWidth and writes it to destination as WebP.
+
+    Runs in a worker process. Returns (destination, sha256, size).
+    '''
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    box = find_board(image)
+    if box is not None:
+        image = image.crop(box)
+    if image.width > maxWidth:
+        image = image.resize((maxWidth, round(image.height * maxWidth / image.width)), Image.Resampling.LANCZOS)
+    image.save(destination, format='WEBP', quality=quality, method=4)
+    with open(destination, 'rb') as file:
+        data = file.read()
+    return destination, hashlib.sha256(data).hexdigest(), len(data)
+
+
+class ImagePipeline():
+    '''Normalizes screenshots in a process pool so cropping and encoding never block the event loop.
+
+    The pool is created on first use with the forkserver start method: by then the
+    bot runs worker threads (to_thread, the default executor, sqlite), and a plain
+    fork taken while one of them holds a lock can deadlock the worker. Workers
+    import the bot script, so it must only connect and load state under __main__.
+    '''
+    def __init__(self, workers: int = None, maxWidth: int = MAX_WIDTH, quality: int = QUALITY):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.maxWidth = maxWidth
+        self.quality = quality
+        self.executor = None
+        self.processed = 0
+        self.failed = 0
+        self.bytesIn = 0
+        self.bytesOut = 0
+
+    async def normalize(self, source: str, destination: str):
+        '''Returns (destination, sha256, size) of the prepared copy of source'''
+        if self.executor is None:
+            context = multiprocessing.get_context('forkserver')
+            # Workers fork from a server that has only this module's imports loaded
+            context.set_forkserver_preload(['imaging'])
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=context)
+        loop = asyncio.get_running_loop()
+        size = os.path.getsize(source)
+        try:
+            result = await loop.run_in_executor(self.executor, normalize, source, destination, self.maxWidth, self.quality)
+        except Exception:
+            self.failed += 1
+            raise
+        self.processed += 1
+        self.bytesIn += size
+        self.bytesOut += result[2]
+        return result
+
+    def metrics(self) -> dict:
+        return {
+            'processed': self.processed,
+            'failed': self.failed,
+            'bytesIn': self.bytesIn,
+            'bytesOut': self.bytesOut
+        }
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
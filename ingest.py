@@ -0,0 +1,138 @@
+'''Written by Cael Shoop.'''
+
+import os
+import asyncio
+import hashlib
+import tempfile
+import aiohttp
+from discord import Attachment
+
+CHUNK_SIZE = 64 * 1024
+MAX_BYTES = int(os.getenv('SCREENSHOT_MAX_BYTES', str(10 * 1024 * 1024)))
+# Enough of the file to tell every type in IMAGE_TYPES apart (WEBP is at bytes 8 to 12)
+SNIFF_BYTES = 12
+
+# Content type -> (file extension, leading magic bytes)
+IMAGE_TYPES = {
+    'image/png': ('.png', (b'\x89PNG\r\n\x1a\n',)),
+    'image/jpeg': ('.jpg', (b'\xff\xd8\xff',)),
+    'image/webp': ('.webp', (b'RIFF',)),
+    'image/gif': ('.gif', (b'GIF87a', b'GIF89a')),
+}
+
+
+class IngestError(Exception):
+    pass
+
+
+class IngestedImage():
+    def __init__(self, path: str, sha256: str, size: int, contentType: str):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.contentType = contentType
+        self.extension = IMAGE_TYPES[contentType][0]
+
+
+def sniff(head: bytes):
+    '''Returns the content type whose magic bytes start head, or None'''
+    for contentType, (_, magics) in IMAGE_TYPES.items():
+        if any(head.startswith(magic) for magic in magics):
+            if contentType == 'image/webp' and head[8:12] != b'WEBP':
+                continue
+            return contentType
+    return None
+
+
+class ScreenshotIngestor():
+    '''Streams attachments to disk in chunks, off the event loop.
+
+    Enforces a byte cap and the allowed image types (checked against both the
+    declared content type and the file's magic bytes), hashes while streaming,
+    and hands back the finished temp file, unique to each download, for the
+    ScreenshotStore to move into place, so a partial download never replaces a
+    good screenshot and two downloads never write the same file.
+    '''
+    def __init__(self, directory: str = '.', maxBytes: int = MAX_BYTES, allowedTypes=None):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.allowedTypes = set(allowedTypes or IMAGE_TYPES)
+        self.session = None
+
+    async def ingest(self, attachment: Attachment, name: str) -> IngestedImage:
+        '''Saves attachment to a new temp file named after name; its real type's extension is on the result'''
+        declared = (attachment.content_type or '').split(';')[0].strip()
+        if declared not in self.allowedTypes:
+            raise IngestError(f'{declared or "unknown"} files are not accepted')
+        if attachment.size > self.maxBytes:
+            raise IngestError(f'image is {attachment.size // 1024} KiB, the limit is {self.maxBytes // 1024} KiB')
+
+        fd, tmpPath = await asyncio.to_thread(tempfile.mkstemp, prefix=f'.{name}.', suffix='.part', dir=self.directory)
+        file = os.fdopen(fd, 'wb')
+        digest = hashlib.sha256()
+        size = 0
+        contentType = None
+        head = b''
+        try:
+            async for chunk in self.stream(attachment):
+                size += len(chunk)
+                if size > self.maxBytes:
+                    raise IngestError(f'image is larger than the {self.maxBytes // 1024} KiB limit')
+                if contentType is None:
+                    # Chunks can be shorter than the magic bytes, so hold them back until there are enough
+                    head += chunk
+                    if len(head) < SNIFF_BYTES:
+                        continue
+                    contentType = self.check_type(head, declared)
+                    chunk = head
+                await asyncio.to_thread(self._write_chunk, file, digest, chunk)
+            if contentType is None:
+                if not head:
+                    raise IngestError('image is empty')
+                contentType = self.check_type(head, declared)
+                await asyncio.to_thread(self._write_chunk, file, digest, head)
+            await asyncio.to_thread(self._commit, file)
+        except BaseException:
+            file.close()
+            try:
+                os.remove(tmpPath)
+            except OSError:
+                pass
+            raise
+        return IngestedImage(tmpPath, digest.hexdigest(), size, contentType)
+
+    def check_type(self, head: bytes, declared: str) -> str:
+        '''Returns the content type the magic bytes in head show, if it is allowed and the one declared'''
+        contentType = sniff(head)
+        if contentType not in self.allowedTypes:
+            raise IngestError('file contents are not an accepted image type')
+        if contentType != declared:
+            raise IngestError(f'file contents are {contentType}, not the declared {declared}')
+        return contentType
+
+    async def stream(self, attachment: Attachment):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        try:
+            async with self.session.get(attachment.url) as response:
+                if response.status != 200:
+                    raise IngestError(f'download failed with HTTP {response.status}')
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    yield chunk
+        except aiohttp.ClientError as e:
+            raise IngestError(f'download failed: {e}') from e
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+    @staticmethod
+    def _write_chunk(file, digest, chunk: bytes) -> None:
+        digest.update(chunk)
+        file.write(chunk)
+
+    @staticmethod
+    def _commit(file) -> None:
+        file.flush()
+        os.fsync(file.fileno())
+        file.close()
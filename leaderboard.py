@@ -0,0 +1,60 @@
+'''Written by Cael Shoop.'''
+
+from bisect import bisect_left, insort
+from itertools import count
+
+
+class Standing():
+    def __init__(self, place: int, player, succeeded: bool, guesses: int):
+        self.place = place
+        self.player = player
+        self.succeeded = succeeded
+        self.guesses = guesses
+
+
+class Leaderboard():
+    '''One game's results, kept sorted as they are submitted.
+
+    Entries are ordered by (failed, guesses, submission time), so reading the
+    standings is a single walk with no sorting at scoring time. Players tied on
+    success and guesses share a place; the next place skips past them (1, 1, 3).
+    '''
+    def __init__(self, gameNumber: int):
+        self.gameNumber = gameNumber
+        self.entries = []
+        self.keys = {}
+        self._sequence = count()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, player) -> bool:
+        return id(player) in self.keys
+
+    def submit(self, player, succeeded: bool, guesses: int, submittedAt: float = 0) -> None:
+        '''Inserts player's result in order, replacing any earlier result of theirs'''
+        self.remove(player)
+        # The sequence number breaks remaining ties so players are never compared
+        key = (not succeeded, guesses, submittedAt, next(self._sequence))
+        self.keys[id(player)] = key
+        insort(self.entries, (key, player))
+
+    def remove(self, player) -> None:
+        key = self.keys.pop(id(player), None)
+        if key is None:
+            return
+        # (key,) sorts just before (key, player), and keys are unique
+        del self.entries[bisect_left(self.entries, (key,))]
+
+    def standings(self, include=None) -> list:
+        '''Returns Standings in order, for the players include accepts (all by default)'''
+        standings = []
+        previous = None
+        for (failed, guesses, _, _), player in self.entries:
+            if include is not None and not include(player):
+                continue
+            if (failed, guesses) != previous:
+                place = len(standings) + 1
+                previous = (failed, guesses)
+            standings.append(Standing(place, player, not failed, guesses))
+        return standings
@@ -0,0 +1,150 @@
+'''Written by Cael Shoop.'''
+
+import time
+import asyncio
+import inspect
+import aiohttp
+from collections import deque
+from discord import Forbidden, NotFound, HTTPException
+
+
+class RateLimiter():
+    '''Token buckets: one shared by every route, plus one per route'''
+    def __init__(self, rate: float, burst: int, routeRate: float, routeBurst: int):
+        self.limits = {None: (rate, burst)}
+        self.routeLimit = (routeRate, routeBurst)
+        self.buckets = {}
+
+    async def acquire(self, route) -> None:
+        while True:
+            wait = max(self._take(None, peek=True), self._take(route, peek=True))
+            if wait <= 0:
+                self._take(None)
+                self._take(route)
+                return
+            await asyncio.sleep(wait)
+
+    def _take(self, route, peek: bool = False) -> float:
+        '''Refills route's bucket and takes a token, or with peek returns seconds until one is available'''
+        rate, burst = self.limits.get(route, self.routeLimit)
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(route, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if peek:
+            self.buckets[route] = (tokens, now)
+            return 0 if tokens >= 1 else (1 - tokens) / rate
+        self.buckets[route] = (tokens - 1, now)
+        if len(self.buckets) > 10000:
+            # Forget full buckets so one-off routes don't accumulate
+            for key in [key for key, (count, _) in self.buckets.items() if key is not None and count >= self.routeLimit[1]]:
+                del self.buckets[key]
+        return 0
+
+
+class Notification():
+    def __init__(self, route, resolve, content: str, description: str):
+        self.route = route
+        self.resolve = resolve
+        self.content = content
+        self.description = description
+        self.queued = time.monotonic()
+        self.attempts = 0
+
+
+class Notifier():
+    '''Bounded-concurrency DM queue with rate limiting, retry with backoff and dead-letter logging.
+
+    resolve is a callable returning the messageable (or an awaitable of it), so
+    looking up the user happens on a worker instead of in the caller.
+    '''
+    def __init__(self,
+                 concurrency: int = 4,
+                 retries: int = 3,
+                 backoff: float = 1.0,
+                 limiter: RateLimiter = None,
+                 log=print):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = limiter or RateLimiter(rate=40, burst=40, routeRate=1, routeBurst=5)
+        self.log = log
+        self.queue = asyncio.Queue()
+        self.workers = []
+        self.delivered = 0
+        self.deadLettered = 0
+        self.retried = 0
+        self.latencies = deque(maxlen=1000)
+
+    def start(self) -> None:
+        self.workers = [worker for worker in self.workers if not worker.done()]
+        while len(self.workers) < self.concurrency:
+            self.workers.append(asyncio.create_task(self._work()))
+
+    async def stop(self, timeout: float = 10) -> None:
+        '''Lets queued notifications drain for up to timeout seconds, then stops the workers'''
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            self.log(f'Notifier stopping with {self.queue.qsize()} notifications undelivered')
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+
+    def send(self, route, resolve, content: str, description: str = '') -> None:
+        self.queue.put_nowait(Notification(route, resolve, content, description))
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            'queued': self.queue.qsize(),
+            'delivered': self.delivered,
+            'retried': self.retried,
+            'deadLettered': self.deadLettered,
+            'p50Latency': latencies[len(latencies) // 2] if latencies else 0,
+            'p99Latency': latencies[int(len(latencies) * 0.99)] if latencies else 0
+        }
+
+    async def _work(self) -> None:
+        while True:
+            notification = await self.queue.get()
+            try:
+                await self._deliver(notification)
+            except Exception as e:
+                self._dead_letter(notification, f'unexpected {type(e).__name__}: {e}')
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, notification: Notification) -> None:
+        target = notification.resolve()
+        if inspect.isawaitable(target):
+            target = await target
+        if target is None:
+            self._dead_letter(notification, 'recipient could not be resolved')
+            return
+        while True:
+            notification.attempts += 1
+            await self.limiter.acquire(notification.route)
+            try:
+                await target.send(content=notification.content)
+                self.delivered += 1
+                self.latencies.append(time.monotonic() - notification.queued)
+                return
+            except (Forbidden, NotFound) as e:
+                self._dead_letter(notification, f'{e.status} {e.text}')
+                return
+            except HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    self._dead_letter(notification, f'{e.status} {e.text}')
+                    return
+                reason = f'{e.status} {e.text}'
+            except (OSError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = f'{type(e).__name__}: {e}'
+            if notification.attempts > self.retries:
+                self._dead_letter(notification, reason)
+                return
+            self.retried += 1
+            await asyncio.sleep(self.backoff * 2 ** (notification.attempts - 1))
+
+    def _dead_letter(self, notification: Notification, reason: str) -> None:
+        self.deadLettered += 1
+        self.log(f'Dead letter {notification.description or notification.route} after {notification.attempts} attempts: {reason}')
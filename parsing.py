@@ -0,0 +1,76 @@
+'''Written by Cael Shoop.'''
+
+import re
+from dataclasses import dataclass
+
+# Correct, present and absent tiles in dark, light and high contrast themes
+CORRECT_TILES = '🟩🟧'
+PRESENT_TILES = '🟨🟦'
+ABSENT_TILES = '⬛⬜'
+TILES = CORRECT_TILES + PRESENT_TILES + ABSENT_TILES
+
+# Game numbers may use ',', '.', or (narrow) no-break space as thousands separators,
+# and localized clones add a language tag and '#'.
+HEADER = re.compile(
+    r'Wordle[ \t]+(?:\([A-Za-z]{2,3}\)[ \t]*)?#?'
+    r'(?P<game>\d{1,3}(?:[,.\u00a0\u202f ]\d{3})+|\d+)[ \t]+'
+    r'(?:🎉[ \t]+)?(?P<score>[1-6Xx])/6(?P<hard>\*?)'
+)
+# A grid row is a line of exactly five tiles; only the text after the header is scanned
+ROW = re.compile(rf'^[ \t]*([{TILES}]{{5}})[ \t]*$', re.MULTILINE)
+SEPARATORS = str.maketrans('', '', ',.\u00a0\u202f ')
+
+
+class ParseError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class WordleResult:
+    gameNumber: int
+    guesses: int
+    succeeded: bool
+    hardMode: bool
+    rows: tuple
+
+    @property
+    def score(self) -> str:
+        return str(self.guesses) if self.succeeded else 'X'
+
+
+def parse_result(text: str):
+    '''Parses a Wordle share message.
+
+    Returns None if text has no Wordle header, a WordleResult if it is a valid
+    result, and raises ParseError if it looks like a result but is inconsistent.
+    '''
+    if 'Wordle' not in text:
+        return None
+    # Some platforms add emoji variation selectors after ⬛/⬜
+    text = text.replace('\ufe0f', '')
+    header = HEADER.search(text)
+    if header is None:
+        return None
+    if text.find('Wordle', header.end()) != -1 and HEADER.search(text, header.end()) is not None:
+        raise ParseError('Message contains more than one Wordle result')
+    rows = ROW.findall(text, header.end())
+
+    game, score, hard = header.group('game', 'score', 'hard')
+    gameNumber = int(game.translate(SEPARATORS))
+    score = score.upper()
+    succeeded = score != 'X'
+    guesses = int(score) if succeeded else 6
+
+    if rows:
+        if len(rows) != guesses:
+            raise ParseError(f'Score is {score}/6 but the grid has {len(rows)} rows')
+        solved = all(tile in CORRECT_TILES for tile in rows[-1])
+        if succeeded and not solved:
+            raise ParseError(f'Score is {score}/6 but the last row is not solved')
+        if not succeeded and solved:
+            raise ParseError('Score is X/6 but the last row is solved')
+    return WordleResult(gameNumber=gameNumber,
+                        guesses=guesses,
+                        succeeded=succeeded,
+                        hardMode=hard == '*',
+                        rows=tuple(rows))
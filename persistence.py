@@ -1,5 +1,14 @@
 import os
+import copy
 import json
+import asyncio
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from timezones import DEFAULT_TIMEZONE
 
 
 class Persistence():
@@ -14,5 +23,473 @@ class Persistence():
 
     def write(self, data = {}):
         json_data = json.dumps(data, indent=4)
-        with open(self.filename, 'w+', encoding='utf-8') as file:
-            file.write(json_data)
\ No newline at end of file
+        atomic_write(self.filename, json_data)
+
+
+def atomic_write(filename, text):
+    '''Writes text (or bytes) to a temp file beside filename, fsyncs it, then renames it over filename'''
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(filename)}.', suffix='.tmp', dir=directory)
+    try:
+        with (os.fdopen(fd, 'wb') if isinstance(text, bytes) else os.fdopen(fd, 'w', encoding='utf-8')) as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class WriteBehind():
+    '''Coalesces save requests into at most one write per delay window.
+
+    snapshot is called on the event loop so the saved state is consistent;
+    serialization and the file write happen in a worker thread. A background
+    flush that fails is logged and retried after another delay.
+    '''
+    def __init__(self, persistence: Persistence, snapshot, delay: float = 2.0, log=print):
+        self.persistence = persistence
+        self.snapshot = snapshot
+        self.delay = delay
+        self.log = log
+        self.dirty = False
+        self._handle = None
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def mark_dirty(self) -> None:
+        self.dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop yet (startup), nothing to stall
+            self.dirty = False
+            self.persistence.write(self.snapshot())
+            return
+        if self._handle is None and (self._task is None or self._task.done()):
+            self._handle = loop.call_later(self.delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._handle = None
+        self._task = asyncio.get_running_loop().create_task(self.flush())
+        self._task.add_done_callback(self._flushed)
+
+    def _flushed(self, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is None:
+            return
+        self.log(f'Save failed, retrying in {self.delay:g}s: {task.exception()!r}')
+        self.mark_dirty()
+
+    async def flush(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        async with self._lock:
+            while self.dirty:
+                self.dirty = False
+                try:
+                    data = self.snapshot()
+                    await asyncio.to_thread(self.persistence.write, data)
+                except Exception:
+                    self.dirty = True
+                    raise
+
+
+class JournaledPersistence(Persistence):
+    '''Persistence that appends each change to a journal instead of rewriting the whole file.
+
+    Records are upserts/removals of a single tracker or player, so replaying the
+    journal over the snapshot is idempotent. Compaction rotates the journal aside,
+    writes a full snapshot, then drops the rotated journal.
+    '''
+    def __init__(self, filename, compact_every: int = 1000, sync: bool = False):
+        super().__init__(filename)
+        self.journal_filename = f'{filename}.journal'
+        self.rotated_filename = f'{filename}.journal.old'
+        self.compact_every = compact_every
+        self.sync = sync
+        self.records = 0
+        # Tracker payloads by text channel id as of the last record, once read() has run,
+        # with each tracker's players keyed by member id so a record applies in constant time
+        self.trackers = None
+        self._journal = None
+        self._lock = threading.Lock()
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.records >= self.compact_every
+
+    def read(self):
+        data = super().read()
+        journals = [name for name in (self.rotated_filename, self.journal_filename) if os.path.exists(name)]
+        if data is None and not journals:
+            return None
+        trackers = {}
+        for trackerData in (data or {}).get('trackers', []):
+            trackers[trackerData['textChannelId']] = keyed_players(trackerData)
+        self.records = 0
+        for name in journals:
+            with open(name, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final append from a crash; everything before it is intact
+                        break
+                    apply_record(trackers, record)
+                    self.records += 1
+        self.trackers = trackers
+        return {'trackers': [listed_players(trackerData) for trackerData in trackers.values()]}
+
+    def read_index(self) -> list:
+        '''Index entries (see tracker_index) for every saved tracker'''
+        if self.trackers is None:
+            self.read()
+        return [tracker_index(listed_players(trackerData)) for trackerData in (self.trackers or {}).values()]
+
+    def read_tracker(self, textChannelId: int):
+        '''A copy of one tracker's payload as of the last record, or None'''
+        if self.trackers is None:
+            self.read()
+        trackerData = (self.trackers or {}).get(textChannelId)
+        return copy.deepcopy(listed_players(trackerData)) if trackerData is not None else None
+
+    async def load_tracker(self, textChannelId: int):
+        '''read_tracker for the event loop; the payloads are already in memory'''
+        return self.read_tracker(textChannelId)
+
+    def write(self, data = {}):
+        '''Writes a full snapshot of data and discards the journal'''
+        self.rotate()
+        self.compact(data)
+
+    def rotate(self) -> None:
+        '''Moves the journal aside; call this at the same moment the snapshot for compact() is taken'''
+        self._close_journal()
+        self.records = 0
+        if not os.path.exists(self.journal_filename):
+            return
+        if os.path.exists(self.rotated_filename):
+            # An earlier compaction never finished, keep both sets of records
+            with open(self.rotated_filename, 'a', encoding='utf-8') as rotated, \
+                 open(self.journal_filename, 'r', encoding='utf-8') as journal:
+                rotated.write(journal.read())
+            os.remove(self.journal_filename)
+        else:
+            os.replace(self.journal_filename, self.rotated_filename)
+
+    def compact(self, data: dict) -> None:
+        '''Writes the snapshot taken at rotate() time; safe to run in a worker thread'''
+        with self._lock:
+            super().write(data)
+            if os.path.exists(self.rotated_filename):
+                os.remove(self.rotated_filename)
+
+    def save_tracker(self, trackerData: dict) -> None:
+        self.append({'op': 'tracker', 'tracker': trackerData})
+
+    def remove_tracker(self, textChannelId: int) -> None:
+        self.append({'op': 'removeTracker', 'textChannelId': textChannelId})
+
+    def save_player(self, textChannelId: int, playerData: dict) -> None:
+        self.append({'op': 'player', 'textChannelId': textChannelId, 'player': playerData})
+
+    def remove_player(self, textChannelId: int, memberId: int) -> None:
+        self.append({'op': 'removePlayer', 'textChannelId': textChannelId, 'memberId': memberId})
+
+    def append(self, record: dict) -> None:
+        '''Appends one record. Appends are small, so they run inline to keep them ordered'''
+        if self._journal is None:
+            self._journal = open(self.journal_filename, 'a', encoding='utf-8')
+        self._journal.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        if self.sync:
+            os.fsync(self._journal.fileno())
+        self.records += 1
+        if self.trackers is not None:
+            apply_record(self.trackers, record)
+
+    def close(self) -> None:
+        self._close_journal()
+
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+def tracker_index(trackerData: dict) -> dict:
+    '''The part of a tracker payload needed before the tracker is built: its ids and each timezone's earliest reset'''
+    resets = {}
+    for playerData in trackerData['players']:
+        if playerData.get('data') is not None:
+            add_reset(resets, playerData.get('timezone') or DEFAULT_TIMEZONE,
+                      datetime.fromisoformat(playerData['data']['resetTime']))
+    return {'guildId': trackerData['guildId'],
+            'textChannelId': trackerData['textChannelId'],
+            'memberIds': [playerData['memberId'] for playerData in trackerData['players']],
+            'resets': resets}
+
+
+def add_reset(resets: dict, timezone: str, resetTime: datetime) -> None:
+    if timezone not in resets or resetTime < resets[timezone]:
+        resets[timezone] = resetTime
+
+
+def keyed_players(trackerData: dict) -> dict:
+    '''A shallow copy of a tracker payload with its players keyed by member id, for the journal's in-memory image'''
+    trackerData = dict(trackerData)
+    trackerData['players'] = {playerData['memberId']: playerData for playerData in trackerData['players']}
+    return trackerData
+
+
+def listed_players(trackerData: dict) -> dict:
+    '''The tracker payload format back from keyed_players'''
+    trackerData = dict(trackerData)
+    trackerData['players'] = list(trackerData['players'].values())
+    return trackerData
+
+
+def apply_record(trackers: dict, record: dict) -> None:
+    '''Applies a journal record to trackers, tracker payloads from keyed_players keyed by text channel id'''
+    op = record['op']
+    if op == 'tracker':
+        trackers[record['tracker']['textChannelId']] = keyed_players(record['tracker'])
+    elif op == 'removeTracker':
+        trackers.pop(record['textChannelId'], None)
+    elif op == 'player':
+        tracker = trackers.get(record['textChannelId'])
+        if tracker is not None:
+            # An existing player keeps their place in the order
+            tracker['players'][record['player']['memberId']] = record['player']
+    elif op == 'removePlayer':
+        tracker = trackers.get(record['textChannelId'])
+        if tracker is not None:
+            tracker['players'].pop(record['memberId'], None)
+    else:
+        raise ValueError(f'Unknown journal record {op}')
+
+
+class SqlitePersistence():
+    '''Persistence backed by an SQLite database in WAL mode.
+
+    Exposes the same read/write/save_*/remove_* interface as JournaledPersistence,
+    using the Tracker/Player to_dict payloads as the boundary format. Row updates
+    run on a single worker thread so they stay in submission order; save_* and
+    remove_* return a Future instead of blocking the caller. The read_* methods
+    block, so on the event loop use load_tracker instead.
+    '''
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS trackers (
+            text_channel_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            using_random_letter INTEGER NOT NULL,
+            prev_data TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS trackers_guild ON trackers (guild_id);
+        CREATE TABLE IF NOT EXISTS players (
+            text_channel_id INTEGER NOT NULL,
+            member_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            registered INTEGER NOT NULL,
+            timezone TEXT,
+            PRIMARY KEY (text_channel_id, member_id)
+        );
+        CREATE INDEX IF NOT EXISTS players_member ON players (member_id);
+        CREATE INDEX IF NOT EXISTS players_guild ON players (guild_id);
+        CREATE TABLE IF NOT EXISTS player_days (
+            text_channel_id INTEGER NOT NULL,
+            member_id INTEGER NOT NULL,
+            slot TEXT NOT NULL,
+            submitted INTEGER NOT NULL,
+            guesses INTEGER NOT NULL,
+            image_path TEXT NOT NULL,
+            msg_content TEXT NOT NULL,
+            reset_time TEXT NOT NULL,
+            warning_sent INTEGER NOT NULL,
+            grid INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (text_channel_id, member_id, slot)
+        );
+    """
+    SLOTS = ('prevData', 'data')
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.needs_compaction = False
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(self.SCHEMA)
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(player_days)')]
+        if 'grid' not in columns:
+            with self.connection:
+                self.connection.execute('ALTER TABLE player_days ADD COLUMN grid INTEGER NOT NULL DEFAULT 0')
+
+    def read(self):
+        return self.executor.submit(self._read_trackers, '', ()).result()
+
+    def read_index(self) -> list:
+        '''Index entries (see tracker_index) for every saved tracker, without reading their payloads'''
+        return self.executor.submit(self._read_index).result()
+
+    def read_tracker(self, textChannelId: int):
+        return self.executor.submit(self._read_tracker, textChannelId).result()
+
+    async def load_tracker(self, textChannelId: int):
+        '''One tracker's payload, or None, read on the worker thread without blocking the event loop'''
+        return await asyncio.wrap_future(self.executor.submit(self._read_tracker, textChannelId))
+
+    def is_empty(self) -> bool:
+        return self.executor.submit(self._is_empty).result()
+
+    def read_guild(self, guildId: int) -> list:
+        trackers = self.executor.submit(self._read_trackers, 'WHERE guild_id = ?', (guildId,)).result()
+        return trackers['trackers'] if trackers else []
+
+    def write(self, data = {}):
+        '''Replaces the whole database with data, e.g. when importing a json file'''
+        self.executor.submit(self._write, data).result()
+
+    def save_tracker(self, trackerData: dict) -> Future:
+        return self.executor.submit(self._save_tracker, trackerData)
+
+    def remove_tracker(self, textChannelId: int) -> Future:
+        return self.executor.submit(self._remove_tracker, textChannelId)
+
+    def save_player(self, textChannelId: int, playerData: dict) -> Future:
+        return self.executor.submit(self._save_player, textChannelId, playerData)
+
+    def remove_player(self, textChannelId: int, memberId: int) -> Future:
+        return self.executor.submit(self._remove_player, textChannelId, memberId)
+
+    def rotate(self) -> None:
+        pass
+
+    def compact(self, data: dict) -> None:
+        pass
+
+    def close(self) -> None:
+        self.executor.submit(self.connection.close).result()
+        self.executor.shutdown()
+
+    def _is_empty(self) -> bool:
+        return self.connection.execute('SELECT 1 FROM trackers LIMIT 1').fetchone() is None
+
+    def _read_tracker(self, textChannelId: int):
+        trackers = self._read_trackers('WHERE text_channel_id = ?', (textChannelId,))
+        return trackers['trackers'][0] if trackers and trackers['trackers'] else None
+
+    def _read_trackers(self, where: str, params: tuple):
+        connection = self.connection
+        rows = connection.execute(f'SELECT text_channel_id, guild_id, using_random_letter, prev_data, data FROM trackers {where}', params).fetchall()
+        if not rows and not where:
+            return None
+        trackers = {}
+        for textChannelId, guildId, usingRandomLetter, prevData, data in rows:
+            trackers[textChannelId] = {
+                'guildId': guildId,
+                'textChannelId': textChannelId,
+                'usingRandomLetter': bool(usingRandomLetter),
+                'players': [],
+                'prevData': json.loads(prevData) if prevData is not None else None,
+                'data': json.loads(data)
+            }
+        players = {}
+        for textChannelId, memberId, registered, timezone in connection.execute(f'SELECT text_channel_id, member_id, registered, timezone FROM players WHERE text_channel_id IN (SELECT text_channel_id FROM trackers {where})', params):
+            playerData = {'memberId': memberId, 'registered': bool(registered), 'prevData': None, 'data': None}
+            if timezone is not None:
+                playerData['timezone'] = timezone
+            trackers[textChannelId]['players'].append(playerData)
+            players[(textChannelId, memberId)] = playerData
+        for row in connection.execute(f'SELECT text_channel_id, member_id, slot, submitted, guesses, image_path, msg_content, reset_time, warning_sent, grid FROM player_days WHERE text_channel_id IN (SELECT text_channel_id FROM trackers {where})', params):
+            playerData = players.get((row[0], row[1]))
+            if playerData is not None:
+                playerData[row[2]] = {'submitted': bool(row[3]), 'guesses': row[4], 'imagePath': row[5],
+                                      'msgContent': row[6], 'resetTime': row[7], 'warningSent': bool(row[8]),
+                                      'grid': row[9]}
+        return {'trackers': list(trackers.values())}
+
+    def _read_index(self) -> list:
+        trackers = {}
+        for textChannelId, guildId in self.connection.execute('SELECT text_channel_id, guild_id FROM trackers'):
+            trackers[textChannelId] = {'guildId': guildId, 'textChannelId': textChannelId, 'memberIds': [], 'resets': {}}
+        for textChannelId, memberId, timezone, resetTime in self.connection.execute(
+                'SELECT players.text_channel_id, players.member_id, players.timezone, player_days.reset_time FROM players '
+                'LEFT JOIN player_days ON player_days.text_channel_id = players.text_channel_id '
+                "AND player_days.member_id = players.member_id AND player_days.slot = 'data'"):
+            entry = trackers.get(textChannelId)
+            if entry is None:
+                continue
+            entry['memberIds'].append(memberId)
+            if resetTime is not None:
+                add_reset(entry['resets'], timezone or DEFAULT_TIMEZONE, datetime.fromisoformat(resetTime))
+        return list(trackers.values())
+
+    def _write(self, data: dict) -> None:
+        with self.connection:
+            self.connection.execute('DELETE FROM player_days')
+            self.connection.execute('DELETE FROM players')
+            self.connection.execute('DELETE FROM trackers')
+            for trackerData in data.get('trackers', []):
+                self._upsert_tracker(trackerData)
+
+    def _save_tracker(self, trackerData: dict) -> None:
+        with self.connection:
+            self._upsert_tracker(trackerData)
+
+    def _upsert_tracker(self, trackerData: dict) -> None:
+        textChannelId = trackerData['textChannelId']
+        prevData = trackerData['prevData']
+        self.connection.execute(
+            'INSERT INTO trackers VALUES (?, ?, ?, ?, ?) ON CONFLICT (text_channel_id) DO UPDATE SET '
+            'guild_id = excluded.guild_id, using_random_letter = excluded.using_random_letter, '
+            'prev_data = excluded.prev_data, data = excluded.data',
+            (textChannelId, trackerData['guildId'], int(trackerData['usingRandomLetter']),
+             json.dumps(prevData) if prevData is not None else None, json.dumps(trackerData['data'])))
+        memberIds = [playerData['memberId'] for playerData in trackerData['players']]
+        placeholders = ','.join('?' * len(memberIds))
+        for table in ('player_days', 'players'):
+            self.connection.execute(f'DELETE FROM {table} WHERE text_channel_id = ? AND member_id NOT IN ({placeholders})',
+                                    (textChannelId, *memberIds))
+        for playerData in trackerData['players']:
+            self._upsert_player(textChannelId, trackerData['guildId'], playerData)
+
+    def _remove_tracker(self, textChannelId: int) -> None:
+        with self.connection:
+            for table in ('player_days', 'players', 'trackers'):
+                self.connection.execute(f'DELETE FROM {table} WHERE text_channel_id = ?', (textChannelId,))
+
+    def _save_player(self, textChannelId: int, playerData: dict) -> None:
+        with self.connection:
+            row = self.connection.execute('SELECT guild_id FROM trackers WHERE text_channel_id = ?', (textChannelId,)).fetchone()
+            if row is not None:
+                self._upsert_player(textChannelId, row[0], playerData)
+
+    def _upsert_player(self, textChannelId: int, guildId: int, playerData: dict) -> None:
+        memberId = playerData['memberId']
+        self.connection.execute(
+            'INSERT INTO players VALUES (?, ?, ?, ?, ?) ON CONFLICT (text_channel_id, member_id) DO UPDATE SET '
+            'guild_id = excluded.guild_id, registered = excluded.registered, timezone = excluded.timezone',
+            (textChannelId, memberId, guildId, int(playerData['registered']), playerData.get('timezone')))
+        for slot in self.SLOTS:
+            day = playerData.get(slot)
+            if day is None:
+                self.connection.execute('DELETE FROM player_days WHERE text_channel_id = ? AND member_id = ? AND slot = ?',
+                                        (textChannelId, memberId, slot))
+                continue
+            self.connection.execute(
+                'INSERT OR REPLACE INTO player_days VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (textChannelId, memberId, slot, int(day['submitted']), day['guesses'], day['imagePath'],
+                 day['msgContent'], day['resetTime'], int(day['warningSent']), day.get('grid', 0)))
+
+    def _remove_player(self, textChannelId: int, memberId: int) -> None:
+        with self.connection:
+            for table in ('player_days', 'players'):
+                self.connection.execute(f'DELETE FROM {table} WHERE text_channel_id = ? AND member_id = ?',
+                                        (textChannelId, memberId))
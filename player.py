@@ -1,27 +1,46 @@
 '''Written by Cael Shoop.'''
 
+import sys
+
 from discord import Member, Guild
 
 from data import PlayerData
+from timezones import DEFAULT_TIMEZONE, next_midnight
 
 class Player:
+    __slots__ = ("name", "id", "member", "registered", "prevData", "data", "timezone")
+
     def __init__(self,
                  member: Member,
                  registered: bool,
                  prevData: PlayerData,
-                 data: PlayerData):
-        self.name = member.name
+                 data: PlayerData,
+                 timezone: str = DEFAULT_TIMEZONE,
+                 memberId: int = None):
+        # Without a member (not fetched yet) the player is known by id until bind()
+        self.name = member.name if member is not None else str(memberId)
+        self.id = member.id if member is not None else memberId
         self.member = member
         self.registered = registered
         self.prevData = prevData
         self.data = data
+        self.timezone = sys.intern(timezone)
+
+    def bind(self, member: Member) -> None:
+        self.member = member
+        self.name = member.name
+
+    def shift_data(self) -> None:
+        self.prevData = self.data
+        self.data = PlayerData(resetTime=next_midnight(self.timezone, self.prevData.resetTime))
 
     def to_dict(self) -> dict:
         payload = {}
-        payload["memberId"] = self.member.id
+        payload["memberId"] = self.id
         payload["registered"] = self.registered
-        payload["prevData"] = self.prevData.to_dict()
+        payload["prevData"] = self.prevData.to_dict() if self.prevData is not None else None
         payload["data"] = self.data.to_dict()
+        payload["timezone"] = self.timezone
         return payload
 
     @classmethod
@@ -29,16 +48,18 @@ class Player:
         return cls(member=member,
                    registered=True,
                    prevData=None,
-                   data=PlayerData()
+                   data=PlayerData(resetTime=next_midnight(DEFAULT_TIMEZONE))
                    )
 
     @classmethod
-    def from_dict(cls, guild: Guild, payload: dict):
-        member = guild.get_member(payload["memberId"])
+    def from_dict(cls, guild: Guild, payload: dict, member: Member = None):
+        """Builds a player from its payload; member defaults to the guild's cached copy and may be None"""
         if member is None:
-            raise Exception("Error getting member object")
+            member = guild.get_member(payload["memberId"])
         return cls(member=member,
                    registered=payload["registered"],
-                   prevData=PlayerData.from_dict(payload["prevData"]),
-                   data=PlayerData.from_dict(payload["data"])
+                   prevData=PlayerData.from_dict(payload["prevData"]) if payload["prevData"] is not None else None,
+                   data=PlayerData.from_dict(payload["data"]),
+                   timezone=payload.get("timezone", DEFAULT_TIMEZONE),
+                   memberId=payload["memberId"]
                    )
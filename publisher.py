@@ -0,0 +1,118 @@
+'''Written by Cael Shoop.'''
+
+import os
+import asyncio
+import aiohttp
+from discord import File, HTTPException, TextChannel
+
+from notifier import RateLimiter
+
+MAX_FILES = 10
+MAX_CONTENT = 2000
+DEFAULT_FILESIZE_LIMIT = 25 * 1024 * 1024
+
+
+class Screenshot():
+    def __init__(self, caption: str, path: str, name: str, owner=None, key=None):
+        self.caption = caption[:MAX_CONTENT]
+        self.path = path
+        self.name = name
+        self.owner = owner
+        self.key = key
+        self.size = os.path.getsize(path)
+
+
+def pack(screenshots: list, maxBytes: int) -> list:
+    '''Groups screenshots, in order, into as few messages as the attachment, size and content limits allow'''
+    batches = []
+    files = length = size = 0
+    for screenshot in screenshots:
+        if screenshot.size > maxBytes:
+            continue
+        added = len(screenshot.caption) + (1 if files else 0)
+        if not batches or files == MAX_FILES or size + screenshot.size > maxBytes or length + added > MAX_CONTENT:
+            batches.append([])
+            files = length = size = 0
+            added = len(screenshot.caption)
+        batches[-1].append(screenshot)
+        files += 1
+        length += added
+        size += screenshot.size
+    return batches
+
+
+def split_content(text: str, limit: int = MAX_CONTENT) -> list:
+    '''Splits text at line boundaries into messages of at most limit characters; a longer line is cut'''
+    chunks = ['']
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if len(chunks[-1]) + len(line) > limit:
+            chunks.append('')
+        chunks[-1] += line
+    return [chunk for chunk in chunks if chunk]
+
+
+class ScoreboardPublisher():
+    '''Posts the scoreboard text followed by everyone's screenshots in batched messages.
+
+    Batches are uploaded concurrently, at most concurrency at a time, through the
+    shared rate limiter; failed uploads are retried with backoff like notifications.
+    '''
+    def __init__(self,
+                 concurrency: int = 3,
+                 retries: int = 3,
+                 backoff: float = 1.0,
+                 limiter: RateLimiter = None,
+                 log=print):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = limiter or RateLimiter(rate=40, burst=40, routeRate=1, routeBurst=5)
+        self.log = log
+
+    async def publish(self, channel: TextChannel, scoreboard: str, screenshots: list) -> list:
+        '''Returns the screenshots whose upload was confirmed; only those may be deleted'''
+        for content in split_content(scoreboard):
+            await self._send(channel, content=content)
+        maxBytes = getattr(channel.guild, 'filesize_limit', DEFAULT_FILESIZE_LIMIT)
+        for screenshot in screenshots:
+            if screenshot.size > maxBytes:
+                self.log(f'Screenshot {screenshot.path} is {screenshot.size} bytes, over the {maxBytes} byte upload limit')
+        batches = pack(screenshots, maxBytes)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def upload(batch: list) -> list:
+            async with semaphore:
+                try:
+                    await self._send(channel,
+                                     content='\n'.join(screenshot.caption for screenshot in batch),
+                                     files=lambda: [File(screenshot.path, filename=screenshot.name) for screenshot in batch])
+                except (HTTPException, OSError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self.log(f'Failed to post {len(batch)} screenshots: {e}')
+                    return []
+                return batch
+
+        results = await asyncio.gather(*(upload(batch) for batch in batches))
+        return [screenshot for batch in results for screenshot in batch]
+
+    async def _send(self, channel: TextChannel, content: str, files=None) -> None:
+        attempts = 0
+        while True:
+            attempts += 1
+            await self.limiter.acquire(channel.id)
+            try:
+                # Files are reopened on every attempt since a failed upload consumes them
+                if files is None:
+                    await channel.send(content=content)
+                else:
+                    await channel.send(content=content, files=files())
+                return
+            except HTTPException as e:
+                if (e.status != 429 and e.status < 500) or attempts > self.retries:
+                    raise
+            except (OSError, aiohttp.ClientError, asyncio.TimeoutError):
+                if attempts > self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2 ** (attempts - 1))
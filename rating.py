@@ -0,0 +1,102 @@
+'''Written by Cael Shoop.'''
+
+import numpy
+
+from analytics import GameMatrix
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+
+def match_deltas(ratings: numpy.ndarray, scores: numpy.ndarray, k: float = K_FACTOR) -> numpy.ndarray:
+    '''Rating changes for one game played as a multiplayer match.
+
+    Every pair of participants is an Elo game (fewer guesses wins, equal is a
+    draw), and each player's pairwise results are averaged so a game moves a
+    rating by at most k however many people played.
+    '''
+    count = len(ratings)
+    if count < 2:
+        return numpy.zeros(count)
+    # Expected score of i against j is q_i / (q_i + q_j) with q = 10^(rating / 400)
+    strength = 10 ** ((ratings - ratings.max()) / 400)
+    expected = (strength[:, None] / (strength[:, None] + strength[None, :])).sum(axis=1)
+    # Actual score is one per player with more guesses and a half per tie, counted per score value
+    scores = numpy.asarray(scores, dtype=numpy.int64)
+    counts = numpy.bincount(scores)
+    worse = counts.sum() - numpy.cumsum(counts)
+    actual = worse[scores] + 0.5 * counts[scores]
+    # Both sums include the player against themself, which is 0.5 on each side
+    return k / (count - 1) * (actual - expected)
+
+
+class Ratings():
+    '''Each player's rating in one guild, updated one scored game at a time'''
+    def __init__(self, k: float = K_FACTOR, initial: float = INITIAL_RATING):
+        self.k = k
+        self.initial = initial
+        self.ratings = {}
+        self.games = {}
+        self.lastGame = 0
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    def get(self, memberId: int) -> float:
+        return self.ratings.get(memberId, self.initial)
+
+    def update(self, gameNumber: int, results: list) -> dict:
+        '''Applies one game's (memberId, score) results, returning each player's change.
+
+        Games at or before the last applied one are ignored, so a game is never counted twice.
+        '''
+        if gameNumber <= self.lastGame or not results:
+            return {}
+        memberIds = [memberId for memberId, _ in results]
+        deltas = match_deltas(numpy.array([self.get(memberId) for memberId in memberIds]),
+                              numpy.array([score for _, score in results]),
+                              self.k)
+        for memberId, delta in zip(memberIds, deltas):
+            self.ratings[memberId] = self.get(memberId) + delta
+            self.games[memberId] = self.games.get(memberId, 0) + 1
+        self.lastGame = gameNumber
+        return dict(zip(memberIds, deltas.tolist()))
+
+    def rank(self, memberId: int) -> int:
+        '''1-based place of memberId among rated players, or 0 if unrated'''
+        if memberId not in self.ratings:
+            return 0
+        rating = self.ratings[memberId]
+        return 1 + sum(1 for other in self.ratings.values() if other > rating)
+
+    @classmethod
+    def recompute(cls, matrix: GameMatrix, k: float = K_FACTOR, initial: float = INITIAL_RATING, through: int = None):
+        '''Replays every game in matrix, up to game number through, in one pass'''
+        ratings = numpy.full(len(matrix.memberIds), initial)
+        games = numpy.zeros(len(matrix.memberIds), dtype=numpy.int64)
+        # Game-major copy so each game's column is contiguous
+        columns = numpy.ascontiguousarray(matrix.scores.T)
+        last = columns.shape[0] if through is None else min(columns.shape[0], through - matrix.firstGame + 1)
+        lastGame = 0
+        for column in range(max(0, last)):
+            scores = columns[column]
+            rows = numpy.flatnonzero(scores)
+            if len(rows) == 0:
+                continue
+            ratings[rows] += match_deltas(ratings[rows], scores[rows], k)
+            games[rows] += 1
+            lastGame = matrix.firstGame + column
+        result = cls(k, initial)
+        for row in numpy.flatnonzero(games):
+            memberId = matrix.memberIds[row]
+            result.ratings[memberId] = float(ratings[row])
+            result.games[memberId] = int(games[row])
+        result.lastGame = lastGame
+        return result
+
+
+def format_rating(name: str, ratings: Ratings, memberId: int) -> str:
+    if memberId not in ratings.ratings:
+        return f'{name} has no rated games yet.'
+    return (f'**{name}**: {ratings.get(memberId):.0f} rating, '
+            f'#{ratings.rank(memberId)} of {len(ratings)} after {ratings.games[memberId]} games')
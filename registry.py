@@ -0,0 +1,74 @@
+'''Written by Cael Shoop.'''
+
+
+class PlayerRegistry():
+    '''Players keyed by Discord user id, with a secondary name index.
+
+    views maps a view name to a predicate; the registry keeps the set of players
+    matching each predicate. Call refresh(player) after changing any attribute
+    a predicate reads.
+    '''
+    def __init__(self, views: dict = None):
+        self.players = {}
+        self.by_name = {}
+        self.predicates = views or {}
+        self.views = {name: set() for name in self.predicates}
+
+    def __iter__(self):
+        return iter(list(self.players.values()))
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def __contains__(self, player) -> bool:
+        return self.players.get(self._key(player)) is player
+
+    def add(self, player) -> None:
+        self.players[self._key(player)] = player
+        self.by_name[player.name] = player
+        self.refresh(player)
+
+    def remove(self, player) -> None:
+        self.players.pop(self._key(player), None)
+        if self.by_name.get(player.name) is player:
+            del self.by_name[player.name]
+        for members in self.views.values():
+            members.discard(player)
+
+    def get(self, id: int):
+        return self.players.get(id)
+
+    def get_by_name(self, name: str):
+        return self.by_name.get(name)
+
+    def find(self, user):
+        '''Finds the player for a Discord user, binding its id if it was only known by name'''
+        player = self.players.get(user.id)
+        if player is not None:
+            if player.name != user.name:
+                if self.by_name.get(player.name) is player:
+                    del self.by_name[player.name]
+                player.name = user.name
+                self.by_name[player.name] = player
+            return player
+        player = self.by_name.get(user.name)
+        if player is not None and player.id is None:
+            del self.players[self._key(player)]
+            player.id = user.id
+            self.players[player.id] = player
+            return player
+        return None
+
+    def refresh(self, player) -> None:
+        for name, predicate in self.predicates.items():
+            if predicate(player):
+                self.views[name].add(player)
+            else:
+                self.views[name].discard(player)
+
+    def view(self, name: str) -> set:
+        return self.views[name]
+
+    @staticmethod
+    def _key(player):
+        return player.id if player.id is not None else ('name', player.name)
@@ -0,0 +1,90 @@
+'''Written by Cael Shoop.'''
+
+import heapq
+import asyncio
+import itertools
+from functools import partial
+from datetime import datetime
+
+
+class Scheduler():
+    '''Runs coroutine callbacks at deadlines, sleeping until the earliest one is due.
+
+    Every deadline has a key; scheduling the same key again replaces the earlier
+    deadline, and cancel(key) drops it. Deadlines must be timezone-aware datetimes.
+    Each due callback runs in its own task, so a slow one cannot hold back the
+    deadlines after it.
+    '''
+    MAX_SLEEP_SECONDS = 300
+
+    def __init__(self, on_error=None):
+        self.heap = []
+        self.entries = {}
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.on_error = on_error
+        self.task = None
+        self.running = set()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def schedule(self, key, when: datetime, callback) -> None:
+        seq = next(self.counter)
+        self.entries[key] = seq
+        heapq.heappush(self.heap, (when, seq, key, callback))
+        if self.heap[0][1] == seq:
+            self.wakeup.set()
+
+    def cancel(self, key) -> None:
+        self.entries.pop(key, None)
+
+    def deadline(self, key):
+        for when, seq, entryKey, _ in self.heap:
+            if entryKey == key and self.entries.get(key) == seq:
+                return when
+        return None
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        for task in list(self.running):
+            task.cancel()
+
+    async def run(self) -> None:
+        while True:
+            # Drop entries that were cancelled or rescheduled
+            while self.heap and self.entries.get(self.heap[0][2]) != self.heap[0][1]:
+                heapq.heappop(self.heap)
+            if not self.heap:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            when, _, key, callback = self.heap[0]
+            delay = (when - datetime.now(when.tzinfo)).total_seconds()
+            if delay > 0:
+                # Capped so wall clock jumps (suspend, NTP) are picked up
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=min(delay, self.MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self.heap)
+            del self.entries[key]
+            task = asyncio.create_task(callback())
+            self.running.add(task)
+            task.add_done_callback(partial(self._finished, key))
+
+    def _finished(self, key, task: asyncio.Task) -> None:
+        self.running.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None and self.on_error is not None:
+            self.on_error(key, error)
@@ -0,0 +1,167 @@
+'''Written by Cael Shoop.'''
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+from persistence import atomic_write
+
+BUDGET_BYTES = int(os.getenv('SCREENSHOT_BUDGET_BYTES', str(512 * 1024 * 1024)))
+
+
+class ScreenshotStore():
+    '''Content-addressed screenshot files with an index from (guild id, game number, member id) to blob.
+
+    Blobs are named by their sha256 so identical uploads share a file and players
+    can never overwrite each other. Total blob size is kept under budgetBytes by
+    evicting the least recently used blobs. Methods do file IO, so call them from
+    a worker thread on the event loop; get() and contains() only touch memory.
+    '''
+    def __init__(self, root: str = 'screenshots', budgetBytes: int = BUDGET_BYTES):
+        self.root = root
+        self.blobDirectory = os.path.join(root, 'blobs')
+        self.tempDirectory = os.path.join(root, 'tmp')
+        self.indexFilename = os.path.join(root, 'index.json')
+        self.budgetBytes = budgetBytes
+        self.index = {}
+        self.refs = {}
+        self.blobs = OrderedDict()
+        self.usedBytes = 0
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        '''Reads the index and scans the blob directory once, deleting orphaned blobs and temp files'''
+        os.makedirs(self.blobDirectory, exist_ok=True)
+        shutil.rmtree(self.tempDirectory, ignore_errors=True)
+        os.makedirs(self.tempDirectory, exist_ok=True)
+        entries = []
+        if os.path.exists(self.indexFilename):
+            with open(self.indexFilename, 'r', encoding='utf-8') as file:
+                entries = json.load(file)
+        found = []
+        with os.scandir(self.blobDirectory) as scan:
+            for entry in scan:
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+        referenced = {blob for *_, blob in entries}
+        for _, blob, size in sorted(found):
+            if blob in referenced:
+                self.blobs[blob] = size
+                self.usedBytes += size
+            else:
+                os.remove(os.path.join(self.blobDirectory, blob))
+        for *key, blob in entries:
+            if blob in self.blobs:
+                self.index[tuple(key)] = blob
+                self.refs[blob] = self.refs.get(blob, 0) + 1
+        self._evict()
+
+    def get(self, key):
+        '''Returns the path of the screenshot for key, or None'''
+        if key is None:
+            return None
+        with self._lock:
+            blob = self.index.get(tuple(key))
+            if blob is None:
+                return None
+            self.blobs.move_to_end(blob)
+        return self.path(blob)
+
+    def contains(self, path: str) -> bool:
+        return os.path.basename(path) in self.blobs
+
+    def path(self, blob: str) -> str:
+        return os.path.join(self.blobDirectory, blob)
+
+    def put(self, key, tempPath: str, sha256: str, extension: str = None) -> str:
+        '''Moves a fully written temp file into the store under key, returning its blob path.
+
+        The blob keeps extension, or the temp file's own if none is given.
+        '''
+        key = tuple(key)
+        blob = sha256 + (extension or os.path.splitext(tempPath)[1])
+        with self._lock:
+            if blob in self.blobs:
+                os.remove(tempPath)
+                self.blobs.move_to_end(blob)
+            else:
+                os.replace(tempPath, self.path(blob))
+                size = os.path.getsize(self.path(blob))
+                self.blobs[blob] = size
+                self.usedBytes += size
+            if self.index.get(key) != blob:
+                self._unlink(key)
+                self.index[key] = blob
+                self.refs[blob] = self.refs.get(blob, 0) + 1
+            self._evict(keep=blob)
+            self._save()
+        return self.path(blob)
+
+    def link(self, source, key) -> bool:
+        '''Indexes key to the same blob as source, so the blob outlives source being replaced'''
+        with self._lock:
+            blob = self.index.get(tuple(source))
+            if blob is None:
+                return False
+            key = tuple(key)
+            if self.index.get(key) != blob:
+                self._unlink(key)
+                self.index[key] = blob
+                self.refs[blob] += 1
+                self._save()
+        return True
+
+    def import_file(self, key, path: str) -> str:
+        '''Copies a screenshot saved outside the store into it'''
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+        tempPath = os.path.join(self.tempDirectory, f'import{os.path.splitext(path)[1]}')
+        shutil.copyfile(path, tempPath)
+        return self.put(key, tempPath, digest.hexdigest())
+
+    def release(self, *keys) -> None:
+        '''Drops the screenshots for keys, deleting blobs once nothing else references them'''
+        with self._lock:
+            released = [self._unlink(tuple(key)) for key in keys if key is not None]
+            if any(released):
+                self._save()
+
+    def _unlink(self, key) -> bool:
+        blob = self.index.pop(key, None)
+        if blob is None:
+            return False
+        self.refs[blob] -= 1
+        if self.refs[blob] <= 0:
+            del self.refs[blob]
+            self._delete_blob(blob)
+        return True
+
+    def _delete_blob(self, blob: str) -> None:
+        size = self.blobs.pop(blob, 0)
+        self.usedBytes -= size
+        try:
+            os.remove(self.path(blob))
+        except OSError:
+            pass
+
+    def _evict(self, keep: str = None) -> None:
+        while self.usedBytes > self.budgetBytes and self.blobs:
+            blob = next(iter(self.blobs))
+            if blob == keep:
+                if len(self.blobs) == 1:
+                    break
+                self.blobs.move_to_end(blob)
+                continue
+            for key in [key for key, indexed in self.index.items() if indexed == blob]:
+                del self.index[key]
+            self.refs.pop(blob, None)
+            self._delete_blob(blob)
+
+    def _save(self) -> None:
+        entries = [[*key, blob] for key, blob in self.index.items()]
+        atomic_write(self.indexFilename, json.dumps(entries))
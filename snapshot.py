@@ -0,0 +1,264 @@
+'''Written by Cael Shoop.'''
+
+import os
+import sys
+import json
+import zlib
+import struct
+from datetime import datetime
+
+from data import DayResult
+from persistence import Persistence, atomic_write
+from timezones import DEFAULT_TIMEZONE, get_timezone, next_midnight
+
+MAGIC = b'WTSS'
+VERSION = 1
+# magic, version, flags, player count, crc32 of everything after the header
+HEADER = struct.Struct('<4sHHII')
+# text channel id (0 if unset), game number, rated game (-1 if unset), scored today,
+# random letter starting, current letter and last letters (string table indices)
+TRACKER = struct.Struct('<qii??II')
+# id (0 if unbound), name, win count, guesses, new guesses, registered, sent warning,
+# today, yesterday, grid, new grid, reset time (unix seconds), timezone, message content,
+# new message content, image key, new image key (string table indices)
+PLAYER = struct.Struct('<qIIBB??BBqqdIIIII')
+# String table index 0 stands for None; stored strings are numbered from 1
+NO_STRING = 0
+LAST_LETTERS = ['K', 'B', 'C', 'D', 'Z', 'F']
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def capture(tracker: dict, players) -> tuple:
+    '''Copies the state to save into plain tuples, so encoding can run off the event loop'''
+    return tracker, [(player.id, player.name, player.winCount, player.guesses, player.newGuesses,
+                      player.registered, player.sentWarning, player.today, player.yesterday,
+                      player.grid, player.newGrid, player.resetTime, player.timezone,
+                      player.messageContent, player.newMessageContent, player.imageKey, player.newImageKey)
+                     for player in players]
+
+
+def encode(tracker: dict, rows: list) -> bytes:
+    '''Encodes captured state as a version VERSION snapshot'''
+    strings = {}
+
+    def index(value) -> int:
+        if value is None:
+            return NO_STRING
+        if not isinstance(value, str):
+            # Screenshot store keys are tuples of ints and strings
+            value = json.dumps(value, separators=(',', ':'))
+        found = strings.get(value)
+        if found is None:
+            found = strings[value] = len(strings) + 1
+        return found
+
+    rated = tracker.get('rated_game')
+    trackerBytes = TRACKER.pack(tracker.get('text_channel') or 0,
+                                tracker.get('game_number', 0),
+                                -1 if rated is None else rated,
+                                tracker.get('scored_today', False),
+                                tracker.get('random_letter', False),
+                                index(tracker.get('current_letter', '')),
+                                index(''.join(tracker.get('last_letters', LAST_LETTERS))))
+    players = bytearray(PLAYER.size * len(rows))
+    offset = 0
+    for (id, name, winCount, guesses, newGuesses, registered, sentWarning, today, yesterday, grid, newGrid,
+         resetTime, timezone, messageContent, newMessageContent, imageKey, newImageKey) in rows:
+        PLAYER.pack_into(players, offset, id or 0, index(name), winCount, guesses, newGuesses, registered,
+                         sentWarning, today, yesterday, grid, newGrid, resetTime.timestamp(), index(timezone),
+                         index(messageContent), index(newMessageContent), index(imageKey), index(newImageKey))
+        offset += PLAYER.size
+    encoded = [value.encode('utf-8') for value in strings]
+    body = b''.join((trackerBytes,
+                     struct.pack(f'<I{len(encoded)}I', len(encoded), *map(len, encoded)),
+                     *encoded,
+                     players))
+    return HEADER.pack(MAGIC, VERSION, 0, len(rows), zlib.crc32(body)) + body
+
+
+def decode(buffer: bytes, factory) -> tuple:
+    '''Returns (tracker dict, players) from a snapshot, building each player with factory(name, id, resetTime)'''
+    if len(buffer) < HEADER.size:
+        raise SnapshotError('Snapshot is truncated')
+    magic, version, _, count, checksum = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise SnapshotError('Not a snapshot file')
+    reader = READERS.get(version)
+    if reader is None:
+        raise SnapshotError(f'Snapshot version {version} is newer than this bot understands ({VERSION})')
+    body = memoryview(buffer)[HEADER.size:]
+    if zlib.crc32(body) != checksum:
+        raise SnapshotError('Snapshot checksum does not match')
+    return reader(body, count, factory)
+
+
+def _read_v1(body: memoryview, count: int, factory) -> tuple:
+    textChannel, gameNumber, ratedGame, scoredToday, randomLetter, currentLetter, lastLetters = TRACKER.unpack_from(body)
+    offset = TRACKER.size
+    stringCount, = struct.unpack_from('<I', body, offset)
+    offset += 4
+    lengths = struct.unpack_from(f'<{stringCount}I', body, offset)
+    offset += 4 * stringCount
+    strings = [None]
+    for length in lengths:
+        strings.append(sys.intern(str(body[offset:offset + length], 'utf-8')))
+        offset += length
+    if len(body) - offset != PLAYER.size * count:
+        raise SnapshotError('Snapshot player block has the wrong size')
+    tracker = {'text_channel': textChannel or None,
+               'game_number': gameNumber,
+               'rated_game': None if ratedGame < 0 else ratedGame,
+               'scored_today': scoredToday,
+               'random_letter': randomLetter,
+               'current_letter': strings[currentLetter],
+               'last_letters': list(strings[lastLetters])}
+    keys = {NO_STRING: None}
+    # Players in a timezone share a reset time, so most datetimes are built once
+    resetTimes = {}
+    dayResults = tuple(DayResult)
+    players = []
+    for (id, name, winCount, guesses, newGuesses, registered, sentWarning, today, yesterday, grid, newGrid,
+         resetTime, timezone, messageContent, newMessageContent, imageKey, newImageKey) in PLAYER.iter_unpack(body[offset:]):
+        timezone = strings[timezone]
+        reset = resetTimes.get((resetTime, timezone))
+        if reset is None:
+            reset = resetTimes[resetTime, timezone] = datetime.fromtimestamp(resetTime, get_timezone(timezone))
+        player = factory(strings[name], id or None, reset)
+        player.winCount = winCount
+        player.guesses = guesses
+        player.newGuesses = newGuesses
+        player.registered = registered
+        player.sentWarning = sentWarning
+        player.today = dayResults[today]
+        player.yesterday = dayResults[yesterday]
+        player.grid = grid
+        player.newGrid = newGrid
+        player.timezone = timezone
+        player.messageContent = strings[messageContent]
+        player.newMessageContent = strings[newMessageContent]
+        if imageKey not in keys:
+            keys[imageKey] = tuple(json.loads(strings[imageKey]))
+        player.imageKey = keys[imageKey]
+        if newImageKey not in keys:
+            keys[newImageKey] = tuple(json.loads(strings[newImageKey]))
+        player.newImageKey = keys[newImageKey]
+        players.append(player)
+    return tracker, players
+
+
+# Snapshot version -> reader; a new version adds a reader rather than changing an old one
+READERS = {1: _read_v1}
+
+
+def _letters_as_list(tracker: dict, players: dict) -> None:
+    '''last_letters was saved as a dict keyed '0' to '5' '''
+    letters = tracker.get('last_letters')
+    if isinstance(letters, dict):
+        tracker['last_letters'] = [letters[str(place)] for place in range(len(letters))]
+
+
+def _added_new_guesses(tracker: dict, players: dict) -> None:
+    for entry in players.values():
+        entry.setdefault('newGuesses', 0)
+
+
+def _added_yesterday(tracker: dict, players: dict) -> None:
+    for entry in players.values():
+        entry.setdefault('completedYesterday', entry['completedToday'])
+        entry.setdefault('succeededYesterday', entry['succeededToday'])
+
+
+def _added_message_content(tracker: dict, players: dict) -> None:
+    for entry in players.values():
+        entry.setdefault('messageContent', '')
+        entry.setdefault('newMessageContent', entry['messageContent'])
+
+
+def _added_timezones(tracker: dict, players: dict) -> None:
+    for entry in players.values():
+        entry.setdefault('timezone', DEFAULT_TIMEZONE)
+        if 'resetTime' not in entry:
+            entry['resetTime'] = next_midnight(entry['timezone']).isoformat()
+        entry.setdefault('sentWarning', False)
+
+
+def _added_ids_and_grids(tracker: dict, players: dict) -> None:
+    for entry in players.values():
+        entry.setdefault('id', None)
+        entry.setdefault('grid', 0)
+        entry.setdefault('newGrid', 0)
+        entry.setdefault('imageKey', None)
+        entry.setdefault('newImageKey', None)
+
+
+# Each step brings JSON saved before one change up to the layout after it, oldest first
+JSON_MIGRATIONS = (
+    _letters_as_list,
+    _added_new_guesses,
+    _added_yesterday,
+    _added_message_content,
+    _added_timezones,
+    _added_ids_and_grids,
+)
+JSON_TRACKER_FIELDS = ('text_channel', 'game_number', 'scored_today', 'random_letter', 'current_letter',
+                       'rated_game', 'last_letters')
+
+
+def migrate_json(data: dict) -> tuple:
+    '''Splits a legacy info.json into (tracker dict, captured rows) at the current layout'''
+    tracker = {}
+    players = {}
+    for name, value in data.items():
+        if name in JSON_TRACKER_FIELDS:
+            tracker[name] = value[name] if name in value else value
+        else:
+            players[name] = value
+    for migration in JSON_MIGRATIONS:
+        migration(tracker, players)
+    if tracker.get('text_channel') is not None:
+        tracker['text_channel'] = int(tracker['text_channel'])
+    rows = []
+    for name, entry in players.items():
+        imageKey, newImageKey = entry['imageKey'], entry['newImageKey']
+        rows.append((entry['id'], name, entry['winCount'], entry['guesses'], entry['newGuesses'],
+                     entry['registered'], entry['sentWarning'],
+                     DayResult.of(entry['completedToday'], entry['succeededToday']),
+                     DayResult.of(entry['completedYesterday'], entry['succeededYesterday']),
+                     entry['grid'], entry['newGrid'], datetime.fromisoformat(entry['resetTime']), entry['timezone'],
+                     entry['messageContent'], entry['newMessageContent'],
+                     tuple(imageKey) if imageKey is not None else None,
+                     tuple(newImageKey) if newImageKey is not None else None))
+    return tracker, rows
+
+
+class SnapshotPersistence(Persistence):
+    '''Saves state as a binary snapshot, migrating from legacyFilename's JSON the first time.
+
+    write takes the (tracker, rows) pair from capture; read returns (tracker, players).
+    '''
+    def __init__(self, filename, factory, legacyFilename: str = None):
+        super().__init__(filename)
+        self.factory = factory
+        self.legacyFilename = legacyFilename
+        self.migrated = False
+
+    def read(self):
+        if os.path.exists(self.filename):
+            with open(self.filename, 'rb') as file:
+                return decode(file.read(), self.factory)
+        if self.legacyFilename is None or not os.path.exists(self.legacyFilename):
+            return None
+        with open(self.legacyFilename, 'r', encoding='utf-8') as file:
+            tracker, rows = migrate_json(json.load(file))
+        # Round trip through the binary form so both paths build players the same way
+        encoded = encode(tracker, rows)
+        atomic_write(self.filename, encoded)
+        self.migrated = True
+        return decode(encoded, self.factory)
+
+    def write(self, data = ()):
+        tracker, rows = data
+        atomic_write(self.filename, encode(tracker, rows))
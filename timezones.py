@@ -0,0 +1,88 @@
+'''Written by Cael Shoop.'''
+
+import os
+import sys
+import pytz
+from functools import lru_cache
+from datetime import date, datetime, time, timedelta
+
+DEFAULT_TIMEZONE = sys.intern(os.getenv('DEFAULT_TIMEZONE', 'US/Eastern'))
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str):
+    return pytz.timezone(name)
+
+
+def midnight(name: str, day: date) -> datetime:
+    '''Returns the local midnight in timezone name that starts day'''
+    timezone = get_timezone(name)
+    return timezone.normalize(timezone.localize(datetime.combine(day, time()), is_dst=False))
+
+
+def next_midnight(name: str, after: datetime = None) -> datetime:
+    '''Returns the first local midnight in timezone name strictly after after (default now)'''
+    if after is None:
+        after = datetime.now(get_timezone(name))
+    return midnight(name, after.astimezone(get_timezone(name)).date() + timedelta(days=1))
+
+
+def moved_reset(name: str, oldName: str, nextReset: datetime) -> datetime:
+    '''The next reset in timezone name for a player already reset today in oldName, whose next reset there is nextReset.
+
+    It is the midnight starting the same local date in the new zone, so a zone
+    further west whose midnight is still part of today does not reset them a
+    second time; if that midnight has already passed, the one after it.
+    '''
+    day = nextReset.astimezone(get_timezone(oldName)).date()
+    return max(midnight(name, day), next_midnight(name))
+
+
+class TimezoneBucket():
+    '''Players sharing a timezone, and so sharing one reset and warning time'''
+    def __init__(self, name: str, resetTime: datetime):
+        self.name = name
+        self.resetTime = resetTime
+        self.players = set()
+
+    @property
+    def warningTime(self) -> datetime:
+        return self.resetTime - timedelta(hours=1)
+
+    def advance(self, now: datetime = None) -> None:
+        '''Moves the reset to the next local midnight, skipping any that have already passed'''
+        self.resetTime = next_midnight(self.name, max(self.resetTime, now or self.resetTime))
+
+
+class TimezoneBuckets():
+    def __init__(self):
+        self.buckets = {}
+
+    def __iter__(self):
+        return iter(list(self.buckets.values()))
+
+    def get(self, name: str) -> TimezoneBucket:
+        return self.buckets.get(name)
+
+    def add(self, player, name: str, resetTime: datetime = None) -> TimezoneBucket:
+        '''Adds player to the bucket for name. A saved resetTime earlier than the bucket's pulls it forward so overdue resets still run'''
+        name = sys.intern(name)
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            bucket = TimezoneBucket(name, resetTime or next_midnight(name))
+            self.buckets[name] = bucket
+        elif resetTime is not None and resetTime < bucket.resetTime:
+            bucket.resetTime = resetTime
+        bucket.players.add(player)
+        return bucket
+
+    def remove(self, player, name: str) -> TimezoneBucket:
+        '''Removes player, returning its bucket if that left the bucket empty'''
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            return None
+        bucket.players.discard(player)
+        if not bucket.players:
+            del self.buckets[name]
+            return bucket
+        return None
@@ -0,0 +1,215 @@
+'''Written by Cael Shoop.'''
+
+import os
+import asyncio
+from time import monotonic
+from collections import OrderedDict
+from discord import Client, ClientException, Guild, HTTPException, Intents, MemberCacheFlags
+
+CACHE_MODE = os.getenv('CACHE_MODE', 'full')
+CACHE_SIZE = int(os.getenv('MEMBER_CACHE_SIZE', '10000'))
+CACHE_TTL = float(os.getenv('MEMBER_CACHE_TTL', '3600'))
+# Gateway member requests take at most 100 user ids
+BATCH_SIZE = 100
+BATCH_DELAY = 0.05
+
+
+def client_options(mode: str = CACHE_MODE) -> dict:
+    '''Client keyword arguments for a cache mode.
+
+    'full' caches every member and presence of every guild. 'light' asks only for
+    the intents the bots use and caches no members, so members are fetched on
+    demand through MemberCache and memory scales with registered players.
+    '''
+    if mode == 'full':
+        return {'intents': Intents.all()}
+    if mode != 'light':
+        raise ValueError(f'Unknown cache mode {mode}')
+    intents = Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.dm_messages = True
+    intents.message_content = True
+    return {'intents': intents,
+            'member_cache_flags': MemberCacheFlags.none(),
+            'chunk_guilds_at_startup': False}
+
+
+class ExpiringCache():
+    '''Least recently used mapping with at most maxSize entries, each dropped ttl seconds after it was stored'''
+    def __init__(self, maxSize: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires <= monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value) -> None:
+        self.entries[key] = (value, monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key) -> None:
+        self.entries.pop(key, None)
+
+
+class UserCache():
+    '''Resolves Discord user ids to User objects without scanning client.users.
+
+    Entries are filled by warm() at startup and on demand, dropped when a
+    member/user update or removal event arrives or when they expire, and a
+    miss falls back to one API fetch.
+    '''
+    def __init__(self, client: Client, maxSize: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.client = client
+        self.users = ExpiringCache(maxSize, ttl)
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def warm(self, ids, names=()) -> dict:
+        '''Caches the users with the given ids in one pass over client.users.
+
+        Also returns the users whose name is in names, for players saved before ids were stored.
+        '''
+        ids = set(ids)
+        names = set(names)
+        named = {}
+        for user in self.client.users:
+            if user.id in ids:
+                self.users.put(user.id, user)
+            elif user.name in names:
+                self.users.put(user.id, user)
+                named[user.name] = user
+        return named
+
+    def invalidate(self, id: int) -> None:
+        self.users.pop(id)
+
+    def get(self, id: int):
+        '''Returns the cached user, or the client's own cached copy (a dict lookup), or None'''
+        user = self.users.get(id)
+        if user is None:
+            user = self.client.get_user(id)
+            if user is not None:
+                self.users.put(id, user)
+        return user
+
+    async def fetch(self, id: int):
+        user = self.get(id)
+        if user is not None:
+            return user
+        try:
+            user = await self.client.fetch_user(id)
+        except HTTPException:
+            return None
+        self.users.put(id, user)
+        return user
+
+
+class MemberCache():
+    '''Resolves guild members on demand when the client does not cache them.
+
+    Misses within BATCH_DELAY of each other in one guild are coalesced into
+    gateway requests of up to BATCH_SIZE ids, so a burst of lookups (a tracker
+    hydrating, a round of warnings) costs one request per hundred players
+    rather than one each.
+    '''
+    def __init__(self, maxSize: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.members = ExpiringCache(maxSize, ttl)
+        self.pending = {}
+        self.flushes = {}
+        self.requests = 0
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def invalidate(self, guildId: int, memberId: int) -> None:
+        self.members.pop((guildId, memberId))
+
+    def get(self, guild: Guild, memberId: int):
+        '''Returns the cached member, or the guild's own cached copy, or None'''
+        member = self.members.get((guild.id, memberId))
+        if member is None:
+            member = guild.get_member(memberId)
+            if member is not None:
+                self.members.put((guild.id, memberId), member)
+        return member
+
+    async def fetch(self, guild: Guild, memberId: int):
+        '''Returns the member, or None if they are not in the guild'''
+        member = self.get(guild, memberId)
+        if member is not None:
+            return member
+        futures = self.pending.setdefault(guild.id, {})
+        future = futures.get(memberId)
+        if future is None:
+            future = futures[memberId] = asyncio.get_running_loop().create_future()
+        if guild.id not in self.flushes:
+            self.flushes[guild.id] = asyncio.create_task(self._flush(guild))
+        # Other callers wait on the same future, so one cancelled caller must not cancel it
+        return await asyncio.shield(future)
+
+    async def fetch_many(self, guild: Guild, memberIds) -> dict:
+        '''Returns {member id: member} for those of memberIds still in the guild'''
+        memberIds = list(memberIds)
+        members = await asyncio.gather(*(self.fetch(guild, memberId) for memberId in memberIds))
+        return {memberId: member for memberId, member in zip(memberIds, members) if member is not None}
+
+    async def _flush(self, guild: Guild) -> None:
+        try:
+            # Let the rest of a burst join the batch
+            await asyncio.sleep(BATCH_DELAY)
+            while self.pending.get(guild.id):
+                futures = self.pending[guild.id]
+                batch = list(futures)[:BATCH_SIZE]
+                try:
+                    members = await self._query(guild, batch)
+                except Exception:
+                    members = {}
+                for memberId in batch:
+                    future = futures.pop(memberId)
+                    if not future.done():
+                        future.set_result(members.get(memberId))
+                if not futures:
+                    del self.pending[guild.id]
+        except BaseException:
+            # Cancelled (shutdown): nobody is left to answer the waiters
+            for future in self.pending.pop(guild.id, {}).values():
+                if not future.done():
+                    future.set_result(None)
+            raise
+        finally:
+            self.flushes.pop(guild.id, None)
+
+    async def _query(self, guild: Guild, memberIds: list) -> dict:
+        self.requests += 1
+        try:
+            found = await guild.query_members(user_ids=memberIds, limit=BATCH_SIZE, cache=False)
+        except (asyncio.TimeoutError, ClientException):
+            # The gateway did not answer; fall back to one API fetch each
+            found = []
+            for memberId in memberIds:
+                self.requests += 1
+                try:
+                    found.append(await guild.fetch_member(memberId))
+                except HTTPException:
+                    pass
+        members = {}
+        for member in found:
+            members[member.id] = member
+            self.members.put((guild.id, member.id), member)
+        return members